@@ -1,3 +1,5 @@
 from .naming_agent import Name_Agent
 from .qa_agent import QAAgent
-from .deepresearch.sophon_main import Sophon
\ No newline at end of file
+from .deepresearch.sophon_main import Sophon, new_sophon_thread_id, sophon_resumable, resume_sophon
+from .deepresearch.jobs import research_jobs
+from .deepresearch.telemetry import TraceRecorder
@@ -0,0 +1,420 @@
+"""Durable SQLite checkpointer for the Sophon graph and its supervisor subgraph.
+
+SQLiteCheckpointSaver implements LangGraph's BaseCheckpointSaver on a single
+SQLite file (WAL mode, one connection per thread), so research runs survive a
+process restart and can be resumed by thread id.
+
+Storage is kept compact:
+
+- channel values are stored once per channel version (a message list that did
+  not change between two checkpoints is not written again), serialised with the
+  saver's serde (msgpack) and zlib-compressed;
+- only the newest keep_last checkpoints of every thread and namespace are kept,
+  and threads not updated for max_age seconds are deleted.
+
+Completed researcher sub-agent results are stored in a separate table keyed by
+(thread_id, tool_call_id), so a resumed run reuses them instead of researching
+the same topic again.
+"""
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Default location of the checkpoint database
+CHECKPOINT_DB_PATH = os.path.join(root_dir, "data", "checkpoints.db")
+# Checkpoints kept per thread and namespace; older ones are pruned
+CHECKPOINT_KEEP_LAST = 10
+# Threads not updated for this long (seconds) are deleted
+CHECKPOINT_MAX_AGE = 7 * 24 * 3600
+# Minimum interval (seconds) between two sweeps for expired threads
+EXPIRY_SWEEP_INTERVAL = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_created_at ON checkpoints (created_at);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS researcher_results (
+    thread_id TEXT NOT NULL,
+    tool_call_id TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, tool_call_id)
+);
+"""
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """LangGraph checkpointer backed by SQLite, with retention and researcher result reuse.
+
+    Async methods run the same SQLite operations in a worker thread.
+
+    Args:
+        db_path: Path of the SQLite database file
+        keep_last: Number of newest checkpoints kept per thread and namespace
+        max_age: Threads not updated for this many seconds are deleted (None keeps them)
+    """
+
+    def __init__(
+        self,
+        db_path: str = CHECKPOINT_DB_PATH,
+        keep_last: int = CHECKPOINT_KEEP_LAST,
+        max_age: float | None = CHECKPOINT_MAX_AGE,
+        *,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.db_path = db_path
+        self.keep_last = max(1, keep_last)
+        self.max_age = max_age
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        self.delete_expired()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ===== serialisation =====
+
+    def _dumps(self, value) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        return type_, zlib.compress(data)
+
+    def _loads(self, type_: str, blob: bytes):
+        return self.serde.loads_typed((type_, zlib.decompress(blob)))
+
+    # ===== read =====
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Get the checkpoint given by config, or the latest checkpoint of the thread."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        conn = self._connect()
+        if checkpoint_id:
+            row = conn.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+        if row is None:
+            return None
+        return self._make_tuple(conn, thread_id, checkpoint_ns, *row)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ):
+        """List checkpoints matching config and the metadata filter, newest first."""
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        conditions, params = [], []
+        if config is not None:
+            conditions.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                conditions.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            checkpoint_id = get_checkpoint_id(config)
+            if checkpoint_id:
+                conditions.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and get_checkpoint_id(before):
+            conditions.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY checkpoint_id DESC"
+        conn = self._connect()
+        remaining = limit
+        # Materialise the rows first: building each tuple runs further queries on the same connection
+        for thread_id, checkpoint_ns, *row in conn.execute(query, params).fetchall():
+            checkpoint_tuple = self._make_tuple(conn, thread_id, checkpoint_ns, *row)
+            if filter and not all(checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()):
+                continue
+            yield checkpoint_tuple
+            if remaining is not None:
+                remaining -= 1
+                if remaining <= 0:
+                    break
+
+    def _make_tuple(self, conn, thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, checkpoint_blob, metadata_type, metadata_blob) -> CheckpointTuple:
+        checkpoint = self._loads(type_, checkpoint_blob)
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            row = conn.execute(
+                "SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is not None and row[0] != "empty":
+                channel_values[channel] = self._loads(*row)
+        pending_writes = [
+            (task_id, channel, self._loads(write_type, blob))
+            for task_id, channel, write_type, blob in conn.execute(
+                "SELECT task_id, channel, type, blob FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        ]
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self._loads(metadata_type, metadata_blob),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id else None
+            ),
+            pending_writes=pending_writes,
+        )
+
+    # ===== write =====
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Store a checkpoint; only channels listed in new_versions have their values written."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        channel_values = checkpoint.get("channel_values", {})
+        blobs = []
+        for channel, version in new_versions.items():
+            if channel in channel_values:
+                type_, blob = self._dumps(channel_values[channel])
+            else:
+                type_, blob = "empty", None
+            blobs.append((thread_id, checkpoint_ns, channel, str(version), type_, blob))
+        checkpoint_type, checkpoint_blob = self._dumps({**checkpoint, "channel_values": {}})
+        metadata_type, metadata_blob = self._dumps(get_checkpoint_metadata(config, metadata))
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                    checkpoint_type, checkpoint_blob, metadata_type, metadata_blob, time.time(),
+                ),
+            )
+            self._prune(conn, thread_id, checkpoint_ns)
+        if time.time() - self._last_sweep > EXPIRY_SWEEP_INTERVAL:
+            self.delete_expired()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes, task_id: str, task_path: str = "") -> None:
+        """Store intermediate writes of a task for the checkpoint given by config."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self._dumps(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, WRITES_IDX_MAP.get(channel, idx), channel, type_, blob))
+        # Special channels (errors, interrupts) replace earlier writes; regular writes are only stored once
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        with self._connect() as conn:
+            conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def get_next_version(self, current: str | None, channel) -> str:
+        """Monotonic string versions, as used by LangGraph's in-memory saver."""
+        if current is None:
+            current_version = 0
+        elif isinstance(current, int):
+            current_version = current
+        else:
+            current_version = int(current.split(".")[0])
+        return f"{current_version + 1:032}.{random.random():016}"
+
+    # ===== retention =====
+
+    def _prune(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str):
+        """Drop all but the newest keep_last checkpoints of a namespace, with their writes and unreferenced blobs."""
+        stale = [
+            row[0] for row in conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                (thread_id, checkpoint_ns, self.keep_last),
+            )
+        ]
+        if not stale:
+            return
+        conn.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in stale],
+        )
+        conn.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in stale],
+        )
+        # Keep every channel version still referenced by a remaining checkpoint
+        referenced = set()
+        for type_, blob in conn.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ):
+            referenced.update((channel, str(version)) for channel, version in self._loads(type_, blob)["channel_versions"].items())
+        unreferenced = [
+            (thread_id, checkpoint_ns, channel, version)
+            for channel, version in conn.execute(
+                "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns),
+            ).fetchall()
+            if (channel, version) not in referenced
+        ]
+        conn.executemany(
+            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            unreferenced,
+        )
+
+    def delete_expired(self) -> int:
+        """Delete threads whose newest checkpoint is older than max_age, returning how many were deleted."""
+        self._last_sweep = time.time()
+        if self.max_age is None:
+            return 0
+        expired = [
+            row[0] for row in self._connect().execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?",
+                (time.time() - self.max_age,),
+            )
+        ]
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+        return len(expired)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete all checkpoints, writes and researcher results of a thread."""
+        with self._connect() as conn:
+            for table in ("checkpoints", "blobs", "writes", "researcher_results"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    # ===== async =====
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ):
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: [*self.list(config, filter=filter, before=before, limit=limit)]
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes, task_id: str, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # ===== researcher results =====
+
+    def get_researcher_result(self, thread_id: str, tool_call_id: str) -> dict | None:
+        """Get the stored result of a completed researcher, or None."""
+        row = self._connect().execute(
+            "SELECT result FROM researcher_results WHERE thread_id = ? AND tool_call_id = ?",
+            (thread_id, tool_call_id),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_researcher_result(self, thread_id: str, tool_call_id: str, result: dict):
+        """Store the result of a completed researcher (its compressed research and raw notes)."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO researcher_results VALUES (?, ?, ?, ?)",
+                (thread_id, tool_call_id, json.dumps(result, ensure_ascii=False), time.time()),
+            )
+
+    async def aget_researcher_result(self, thread_id: str, tool_call_id: str) -> dict | None:
+        return await asyncio.to_thread(self.get_researcher_result, thread_id, tool_call_id)
+
+    async def aput_researcher_result(self, thread_id: str, tool_call_id: str, result: dict):
+        await asyncio.to_thread(self.put_researcher_result, thread_id, tool_call_id, result)
+
+
+# Used by the Sophon graph (its supervisor subgraph checkpoints under Sophon's namespace),
+# by standalone supervisor runs and for researcher results
+research_checkpointer = SQLiteCheckpointSaver()
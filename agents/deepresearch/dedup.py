@@ -0,0 +1,191 @@
+"""Run-scoped deduplication of search sources.
+
+The same article often reaches several researcher sub-agents in one research
+run, under mirror URLs, tracking-parameter variants or slightly different page
+renderings. DedupIndex maps every search result to a source key:
+
+- URLs are canonicalised (tracking parameters, fragments, "www." and trailing
+  slashes removed, query parameters sorted);
+- raw page content is fingerprinted with a 64-bit SimHash over character
+  shingles, and pages within SIMHASH_MAX_DISTANCE bits of a known page are
+  treated as the same source.
+
+Each source key is summarised once per run; later occurrences reuse the result.
+The index for the current run is shared with all sub-agents via a ContextVar.
+"""
+import asyncio
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextvars import ContextVar
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track the visitor and never change page content. Generic names such
+# as "ref" or "from" are left alone: sites use them for content (e.g. a git ref or a date range)
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "yclid", "spm", "ref_src", "share_source"}
+TRACKING_PARAM_PREFIXES = ("utm_",)
+# Shingle length (characters) and the amount of content fingerprinted
+SHINGLE_SIZE = 5
+MAX_SIMHASH_CHARS = 10000
+# Pages whose fingerprints differ by at most this many bits are near-duplicates
+SIMHASH_MAX_DISTANCE = 3
+# Number of research runs whose indexes are kept in memory
+MAX_RUN_INDEXES = 8
+
+# Dedup index of the research run the current task belongs to
+current_dedup_index: ContextVar["DedupIndex | None"] = ContextVar("current_dedup_index", default=None)
+
+
+def canonicalize_url(url: str) -> str:
+    """Canonicalise a URL so variants of the same page compare equal.
+
+    Args:
+        url: URL as returned by the search API
+
+    Returns:
+        Canonical form without scheme, "www.", default port, fragment, tracking
+        parameters or trailing slash, with query parameters sorted
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    return urlunsplit(("", host, path, urlencode(query), "")).lstrip("/")
+
+
+def _shingles(text: str):
+    text = unicodedata.normalize("NFKC", text[:MAX_SIMHASH_CHARS]).casefold()
+    text = "".join(text.split())
+    if len(text) <= SHINGLE_SIZE:
+        return [text] if text else []
+    return (text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1))
+
+
+def simhash(text: str) -> int:
+    """Compute the 64-bit SimHash of a text over character shingles."""
+    weights = [0] * 64
+    for shingle in _shingles(text):
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            if value >> bit & 1:
+                weights[bit] += 1
+            else:
+                weights[bit] -= 1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two fingerprints."""
+    return bin(a ^ b).count("1")
+
+
+class DedupIndex:
+    """Index of the sources seen in one research run, safe to share across tasks and threads."""
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._by_url = {}
+        self._fingerprints = []
+        self._results = {}
+        self._url_duplicates = 0
+        self._content_duplicates = 0
+
+    def resolve(self, url: str, raw_content: str | None = None) -> str:
+        """Map a search result to its source key, registering it if it is new.
+
+        Args:
+            url: Result URL
+            raw_content: Raw page content, used for near-duplicate detection
+
+        Returns:
+            Canonical URL of the first equivalent source seen in this run
+        """
+        canonical = canonicalize_url(url)
+        with self._lock:
+            if canonical in self._by_url:
+                self._url_duplicates += 1
+                return self._by_url[canonical]
+        fingerprint = simhash(raw_content) if raw_content else None
+        with self._lock:
+            if canonical in self._by_url:
+                self._url_duplicates += 1
+                return self._by_url[canonical]
+            source_key = canonical
+            if fingerprint is not None:
+                for known_fingerprint, known_key in self._fingerprints:
+                    if hamming_distance(fingerprint, known_fingerprint) <= self.max_distance:
+                        source_key = known_key
+                        self._content_duplicates += 1
+                        break
+                else:
+                    self._fingerprints.append((fingerprint, canonical))
+            self._by_url[canonical] = source_key
+            return source_key
+
+    async def get_or_create(self, source_key: str, factory):
+        """Return the result computed for a source, computing it once per run.
+
+        Concurrent callers for the same source wait for the first one.
+
+        Args:
+            source_key: Key returned by resolve()
+            factory: Zero-argument callable returning a coroutine that computes the result
+        """
+        with self._lock:
+            future = self._results.get(source_key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._results[source_key] = future
+        if not is_owner:
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await factory()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            # Let a later occurrence retry instead of reusing the failure
+            with self._lock:
+                self._results.pop(source_key, None)
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("summarization was cancelled"))
+            raise
+
+    def stats(self) -> dict:
+        """Number of unique sources and of duplicates found by URL and by content."""
+        with self._lock:
+            return {
+                "sources": len(set(self._by_url.values())),
+                "url_duplicates": self._url_duplicates,
+                "content_duplicates": self._content_duplicates,
+            }
+
+
+_run_indexes = OrderedDict()
+_run_indexes_lock = threading.Lock()
+
+
+def get_run_dedup_index(thread_id: str) -> DedupIndex:
+    """Get the dedup index of a research run (keyed by its thread id), creating it on first use.
+
+    Only the most recent MAX_RUN_INDEXES runs are kept.
+    """
+    with _run_indexes_lock:
+        index = _run_indexes.get(thread_id)
+        if index is None:
+            index = DedupIndex()
+            _run_indexes[thread_id] = index
+            while len(_run_indexes) > MAX_RUN_INDEXES:
+                _run_indexes.popitem(last=False)
+        else:
+            _run_indexes.move_to_end(thread_id)
+        return index
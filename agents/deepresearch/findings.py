@@ -0,0 +1,183 @@
+"""Relevance-ranked packing of research findings for the final report.
+
+final_report_generation used to send every research note in full, so after
+several supervisor iterations the prompt could overflow the writer model's
+context. pack_findings() bounds it:
+
+1. each note is split into its body and its "来源"/"Sources" list, and the body
+   is chunked into passages of about PASSAGE_TOKENS;
+2. passages are ranked against the research brief with BM25 over CJK unigrams
+   and bigrams plus latin words;
+3. near-duplicate passages (SimHash, as used for source dedup) are dropped;
+4. the best passages are packed into the token budget and restored to their
+   original order.
+
+Citations are preserved: every note numbers its sources from [1], so cited
+numbers are remapped to one global numbering (the same URL cited by several
+notes gets one number). The sources cited by the packed passages are listed at
+the end.
+"""
+import math
+import re
+from collections import Counter
+from models import estimate_tokens
+from utils import split_into_chunks
+from dedup import canonicalize_url, simhash, hamming_distance, SIMHASH_MAX_DISTANCE
+
+# Token budget of the packed findings
+FINDINGS_TOKEN_BUDGET = 20000
+# Target size of a passage
+PASSAGE_TOKENS = 400
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_SOURCES_HEADING = re.compile(r"^\s*#*\s*\**\s*(来源|资料来源|参考来源|参考资料|sources|references)\s*\**\s*[:：]?\s*$", re.IGNORECASE)
+_SOURCE_LINE = re.compile(r"^\s*[-*]?\s*\[(\d+)\]\s*(.+?)\s*$")
+_CITATION = re.compile(r"\[(\d+(?:\s*[,，]\s*\d+)*)\]")
+_URL = re.compile(r"https?://[^\s)>\]]+")
+_CJK = re.compile(r"[一-鿿㐀-䶿豈-﫿]+")
+_LATIN_WORD = re.compile(r"[a-z0-9]+(?:[.'-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    """Index terms of a text: CJK unigrams and bigrams plus lowercased latin words."""
+    terms = []
+    for run in _CJK.findall(text):
+        terms.extend(run)
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    terms.extend(_LATIN_WORD.findall(_CJK.sub(" ", text).lower()))
+    return terms
+
+
+def split_note(note: str) -> tuple[str, dict]:
+    """Split a note into its body and its numbered source lines ({number: "title：URL"})."""
+    lines = note.splitlines()
+    sources = {}
+    body_end = len(lines)
+    for i, line in enumerate(lines):
+        if _SOURCES_HEADING.match(line):
+            body_end = i
+            break
+    for line in lines[body_end:]:
+        match = _SOURCE_LINE.match(line)
+        if match:
+            sources[int(match.group(1))] = match.group(2)
+    return "\n".join(lines[:body_end]).strip(), sources
+
+
+def _bm25_scores(passages: list[list[str]], query: list[str]) -> list[float]:
+    n = len(passages)
+    avg_length = sum(len(terms) for terms in passages) / n or 1.0
+    document_frequency = Counter(term for terms in passages for term in set(terms))
+    query_terms = set(query)
+    scores = []
+    for terms in passages:
+        counts = Counter(terms)
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term)
+            if not tf:
+                continue
+            df = document_frequency[term]
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(terms) / avg_length))
+        scores.append(score)
+    return scores
+
+
+class _CitationIndex:
+    """Global numbering of the sources cited across notes."""
+
+    def __init__(self):
+        self.numbers = {}
+        self.lines = {}
+
+    @staticmethod
+    def key(source_line: str) -> str:
+        url = _URL.search(source_line)
+        return canonicalize_url(url.group(0)) if url else source_line
+
+    def __contains__(self, source_line: str) -> bool:
+        return self.key(source_line) in self.numbers
+
+    def number(self, source_line: str) -> int:
+        key = self.key(source_line)
+        if key not in self.numbers:
+            self.numbers[key] = len(self.numbers) + 1
+            self.lines[self.numbers[key]] = source_line
+        return self.numbers[key]
+
+
+def pack_findings(notes: list[str], query: str, max_tokens: int = FINDINGS_TOKEN_BUDGET) -> str:
+    """Select the passages of the notes most relevant to query within a token budget.
+
+    Args:
+        notes: Research notes (compressed research of each researcher)
+        query: Text to rank passages against, normally the research brief
+        max_tokens: Token budget of the result, including the source list
+
+    Returns:
+        Packed findings with globally numbered citations and a "### 来源" list;
+        the notes joined unchanged if they already fit the budget
+    """
+    joined = "\n".join(notes)
+    if estimate_tokens(joined) <= max_tokens:
+        return joined
+
+    # Passages in original order: (note index, passage text, {local number: source line})
+    passages = []
+    for note_index, note in enumerate(notes):
+        body, sources = split_note(note)
+        for chunk in split_into_chunks(body, PASSAGE_TOKENS):
+            if chunk.strip():
+                passages.append((note_index, chunk.strip(), sources))
+    if not passages:
+        return ""
+
+    scores = _bm25_scores([tokenize(text) for _, text, _ in passages], tokenize(query))
+    ranking = sorted(range(len(passages)), key=lambda i: (-scores[i], i))
+
+    citations = _CitationIndex()
+    selected = {}
+    fingerprints = []
+    used_tokens = 0
+    for i in ranking:
+        note_index, text, sources = passages[i]
+        fingerprint = simhash(text)
+        if any(hamming_distance(fingerprint, known) <= SIMHASH_MAX_DISTANCE for known in fingerprints):
+            continue
+        cited = {
+            int(number) for group in _CITATION.findall(text)
+            for number in re.split(r"\s*[,，]\s*", group) if int(number) in sources
+        }
+        new_source_tokens = sum(
+            estimate_tokens(sources[number]) + 4 for number in cited
+            if sources[number] not in citations
+        )
+        tokens = estimate_tokens(text) + new_source_tokens + 2
+        if used_tokens + tokens > max_tokens:
+            continue
+        mapping = {number: citations.number(sources[number]) for number in sorted(cited)}
+
+        def renumber(match, mapping=mapping):
+            numbers = [mapping.get(int(number)) for number in re.split(r"\s*[,，]\s*", match.group(1))]
+            numbers = [str(number) for number in numbers if number is not None]
+            # Citations with no entry in the note's source list are dropped rather than misnumbered
+            return f"[{', '.join(numbers)}]" if numbers else ""
+
+        selected[i] = _CITATION.sub(renumber, text)
+        fingerprints.append(fingerprint)
+        used_tokens += tokens
+
+    sections = []
+    current_note = None
+    for i in sorted(selected):
+        note_index = passages[i][0]
+        if current_note is not None and note_index != current_note:
+            sections.append("---")
+        sections.append(selected[i])
+        current_note = note_index
+    if citations.lines:
+        sections.append("### 来源\n" + "\n".join(f"[{number}] {line}" for number, line in sorted(citations.lines.items())))
+    return "\n\n".join(sections)
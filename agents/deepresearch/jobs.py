@@ -0,0 +1,197 @@
+"""Background job runner for Sophon deep research.
+
+A research run takes up to an hour, so it must not run inside a Streamlit
+script: the script thread would be blocked, a browser refresh would lose the
+run, and concurrency would depend on the number of open tabs.
+
+ResearchJobRunner runs jobs on one background thread with its own asyncio event
+loop. At most max_concurrent_jobs runs execute at once; further jobs wait in the
+queued state. Every job gets an ID and a Sophon thread id. Its status, a
+progress event per finished graph node, the telemetry summary and the final
+report are written to a JobStore. Pages poll that store by job ID, so a job
+survives reruns and refreshes.
+
+While final_report_generation runs, its tokens are streamed ("messages" stream
+mode) and the partial report is written to the job's result field at most every
+REPORT_FLUSH_INTERVAL seconds, so pages can render it before the run ends.
+
+Jobs left unfinished by a previous process are marked interrupted at startup.
+Because Sophon checkpoints to disk, resume() continues them from their last
+checkpoint.
+"""
+import sys
+import os
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+deepresearch_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(deepresearch_dir)
+sys.path.append(root_dir)
+
+import asyncio
+import threading
+import time
+from langchain_core.messages import HumanMessage
+from sophon_main import Sophon, new_sophon_thread_id, resume_sophon
+from telemetry import TraceRecorder
+from storage import JobStore
+from storage.job_store import (
+    ACTIVE_JOB_STATUSES,
+    JOB_CANCELLED,
+    JOB_FAILED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    RESUMABLE_JOB_STATUSES,
+)
+
+# Job kind recorded in the store
+RESEARCH_JOB_KIND = "deep_research"
+# Research runs executing at the same time across all users
+MAX_CONCURRENT_JOBS = 4
+# Unfinished (queued or running) jobs allowed per user
+MAX_ACTIVE_JOBS_PER_USER = 2
+# Minimum interval (seconds) between two writes of the partially streamed report
+REPORT_FLUSH_INTERVAL = 1.0
+
+
+class ResearchJobRunner:
+    """Run Sophon research jobs on a background event loop with bounded concurrency.
+
+    Args:
+        store: Job store receiving status, progress events and results
+        max_concurrent_jobs: Maximum number of research runs executing at once
+        max_active_jobs_per_user: Maximum number of unfinished jobs per user
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        max_concurrent_jobs: int = MAX_CONCURRENT_JOBS,
+        max_active_jobs_per_user: int = MAX_ACTIVE_JOBS_PER_USER,
+    ):
+        self.store = store
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self.max_active_jobs_per_user = max_active_jobs_per_user
+        self._loop = None
+        self._semaphore = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        # Jobs of a previous process can no longer be running
+        self.store.interrupt_active_jobs()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+                threading.Thread(target=self._loop.run_forever, name="research-jobs", daemon=True).start()
+            return self._loop
+
+    def submit(self, username: str, query: str) -> dict:
+        """Queue a research job for a query and return its job record.
+
+        Raises:
+            ValueError: If the user already has max_active_jobs_per_user unfinished jobs
+        """
+        active = self.store.list_jobs(username, kind=RESEARCH_JOB_KIND, statuses=ACTIVE_JOB_STATUSES)
+        if len(active) >= self.max_active_jobs_per_user:
+            raise ValueError(f"最多同时进行 {self.max_active_jobs_per_user} 个深度研究任务，请等待已有任务完成")
+        job = self.store.create_job(RESEARCH_JOB_KIND, username, query, thread_id=new_sophon_thread_id(username))
+        self._schedule(job["id"], resume=False)
+        return job
+
+    def resume(self, job_id: str) -> dict:
+        """Queue a failed, cancelled or interrupted job again, continuing from its last checkpoint.
+
+        Raises:
+            ValueError: If the job is still queued or running, has succeeded, or does not exist
+        """
+        with self._lock:
+            # A cancelled run records its status before its future finishes
+            future = self._futures.get(job_id)
+            if (future is not None and not future.done()) or not self.store.requeue_job(job_id, RESUMABLE_JOB_STATUSES):
+                raise ValueError("任务正在运行或已经完成，无法继续研究")
+        self.store.add_event(job_id, "resume", "从中断处继续研究。")
+        self._schedule(job_id, resume=True)
+        return self.store.get_job(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job of this process; safe to call from any thread."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is None or future.done():
+            return False
+        self._loop.call_soon_threadsafe(future.cancel)
+        return True
+
+    def _schedule(self, job_id: str, resume: bool):
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._run(job_id, resume), loop)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget(job_id, future))
+
+    def _forget(self, job_id: str, future):
+        with self._lock:
+            if self._futures.get(job_id) is future:
+                del self._futures[job_id]
+
+    async def _run(self, job_id: str, resume: bool):
+        job = self.store.get_job(job_id)
+        recorder = TraceRecorder()
+        try:
+            async with self._semaphore:
+                self.store.update_job(job_id, status=JOB_RUNNING, started_at=time.time())
+                config = {"configurable": {"thread_id": job["thread_id"]}, "callbacks": [recorder]}
+                stream_mode = ["updates", "messages"]
+                if resume:
+                    stream = resume_sophon(job["thread_id"], config, stream_mode=stream_mode)
+                else:
+                    stream = Sophon.astream(
+                        {"messages": [HumanMessage(content=job["query"])]},
+                        stream_mode=stream_mode,
+                        config=config,
+                    )
+                final_report = ""
+                partial_report = ""
+                last_flush = 0.0
+                async for mode, item in stream:
+                    if mode == "messages":
+                        chunk, metadata = item
+                        if metadata.get("langgraph_node") != "final_report_generation" or not chunk.content:
+                            continue
+                        if not partial_report:
+                            self.store.add_event(job_id, "final_report_generation", "正在生成最终报告……")
+                        partial_report += chunk.content
+                        if time.monotonic() - last_flush >= REPORT_FLUSH_INTERVAL:
+                            self.store.update_job(job_id, result=partial_report)
+                            last_flush = time.monotonic()
+                        continue
+                    for node, data in item.items():
+                        self.store.add_event(job_id, node, node + "步骤执行完成。")
+                        if node == "final_report_generation":
+                            final_report = data.get("final_report", "")
+                if not final_report:
+                    # The graph ended early, e.g. clarify_with_user asked a question instead of researching
+                    final_report = await self._last_message(job["thread_id"])
+            self.store.update_job(job_id, status=JOB_SUCCEEDED, result=final_report, finished_at=time.time())
+            self.store.add_event(job_id, "done", "深度研究全部完成！")
+        except asyncio.CancelledError:
+            self.store.update_job(job_id, status=JOB_CANCELLED, result="", finished_at=time.time())
+            self.store.add_event(job_id, "cancelled", "研究已取消。")
+            raise
+        except Exception as e:
+            # A partial report of a failed run is not a result
+            self.store.update_job(job_id, status=JOB_FAILED, result="", error=repr(e), finished_at=time.time())
+            self.store.add_event(job_id, "error", f"研究失败: {e}")
+        finally:
+            if recorder.spans:
+                self.store.update_job(job_id, trace=recorder.flame_summary())
+                recorder.export_jsonl()
+
+    async def _last_message(self, thread_id: str) -> str:
+        state = await Sophon.aget_state({"configurable": {"thread_id": thread_id}})
+        messages = state.values.get("messages", [])
+        return messages[-1].content if messages else ""
+
+
+# Process-wide runner; module state survives Streamlit reruns
+research_jobs = ResearchJobRunner(JobStore(os.path.join(root_dir, "data", "jobs.db")))
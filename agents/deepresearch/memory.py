@@ -0,0 +1,97 @@
+"""Bounded supervisor memory.
+
+Every supervisor call used to send all of supervisor_messages, including the
+full compressed research of every ConductResearch call and every refined draft
+from earlier iterations, so prompt tokens grew quadratically with iterations.
+
+Research findings are now kept in an indexed note store (the research_notes
+state field). Each note has an ID, its topic, the full findings and a digest
+computed once when the note is created. compact_supervisor_messages() builds the
+supervisor prompt:
+
+- messages from the latest KEEP_RECENT_TURNS supervisor turns are sent verbatim;
+- older ConductResearch results are replaced by their note ID and digest;
+- older think_tool and refine_draft_report outputs are shortened in the same way
+  (the current draft is kept in the draft_report state field).
+
+Tool calls and their ToolMessages stay paired, so the history remains valid for
+the chat API.
+"""
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from models import estimate_tokens
+
+# Supervisor turns (an AI message and its tool results) kept verbatim
+KEEP_RECENT_TURNS = 2
+# Token budget of a note digest and of other shortened tool outputs
+NOTE_DIGEST_TOKENS = 300
+
+
+def digest_text(text: str, max_tokens: int = NOTE_DIGEST_TOKENS) -> str:
+    """Leading part of a text within a token budget, cut at line boundaries where possible."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    lines = []
+    used = 0
+    for line in text.splitlines():
+        tokens = estimate_tokens(line) + 1
+        if used + tokens > max_tokens:
+            if not lines:
+                # A single long first line: keep a proportional prefix of it
+                lines.append(line[:max(1, len(line) * max_tokens // tokens)])
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(lines).rstrip() + "\n…"
+
+
+def make_note(index: int, tool_call_id: str, topic: str, content: str) -> dict:
+    """Create a research note for a ConductResearch result.
+
+    Args:
+        index: Position of the note in the run's note store
+        tool_call_id: ID of the ConductResearch tool call that produced the findings
+        topic: Research topic of the call
+        content: Compressed research returned by the researcher
+
+    Returns:
+        Note dict with id, tool_call_id, topic, content and digest
+    """
+    return {
+        "id": f"note-{index + 1}",
+        "tool_call_id": tool_call_id,
+        "topic": topic,
+        "content": content,
+        "digest": digest_text(content),
+    }
+
+
+def compact_supervisor_messages(messages: list[BaseMessage], notes: list[dict]) -> list[BaseMessage]:
+    """Supervisor history with tool outputs of older turns replaced by digests.
+
+    Args:
+        messages: Full supervisor_messages
+        notes: Research notes of the run (research_notes state field)
+
+    Returns:
+        Messages to send to the supervisor model
+    """
+    turn_starts = [i for i, message in enumerate(messages) if isinstance(message, AIMessage)]
+    if len(turn_starts) <= KEEP_RECENT_TURNS:
+        return list(messages)
+    recent_start = turn_starts[-KEEP_RECENT_TURNS]
+    notes_by_call = {note["tool_call_id"]: note for note in notes}
+
+    compacted = []
+    for i, message in enumerate(messages):
+        if i >= recent_start or not isinstance(message, ToolMessage):
+            compacted.append(message)
+            continue
+        note = notes_by_call.get(message.tool_call_id)
+        if note is not None:
+            content = f"[{note['id']}] {note['topic']}\n{note['digest']}\n(Full findings are kept in research note {note['id']}.)"
+        elif message.name == "refine_draft_report":
+            content = "Draft report refined. The latest draft is kept in the draft report."
+        else:
+            content = digest_text(str(message.content))
+        compacted.append(ToolMessage(content=content, name=message.name, tool_call_id=message.tool_call_id))
+    return compacted
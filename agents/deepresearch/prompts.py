@@ -322,6 +322,28 @@ summarize_webpage_prompt = """
     今日日期为 {date}。
     """
 
+reduce_webpage_summaries_prompt = """
+    您的任务是把同一网页的多个片段摘要合并为一份完整的网页摘要。网页内容过长，已按原文顺序切分成若干片段并分别进行了摘要。合并后的摘要将供下游研究代理使用，因此务必保留关键细节，不遗漏核心信息。
+    以下是按原文顺序排列的片段摘要：
+    <片段摘要>{chunk_summaries}</片段摘要>
+
+    请遵循以下指南合并摘要：
+    - 识别并保留网页的主题或核心目的。
+    - 保留各片段中的关键事实、统计数据、日期、人名和地点，不要遗漏只在某一个片段中出现的重要信息。
+    - 删除片段之间重复的内容，按原文顺序组织信息。
+    - 从各片段的摘录中挑选最重要的引语或摘录，最多不超过5条。
+    - 不要添加片段摘要中没有的信息。
+
+    请按照以下格式呈现摘要：
+    ```plaintext
+    {{
+    "summary": "合并后的摘要内容，根据需要用适当的段落或项目符号组织",
+    "key_excerpts": "第一条重要引语或摘录内容，第二条重要引语或摘录内容，……最多不超过5条"
+    }}
+    ```
+    今日日期为 {date}。
+    """
+
 research_agent_prompt =  """
     您是一名研究助理，负责围绕用户输入的主题开展研究。作为背景信息，今日日期为 {date}。
     <任务>
@@ -12,6 +12,7 @@ deepresearch_dir=os.path.dirname(os.path.abspath(__file__))
 sys.path.append(deepresearch_dir)
 sys.path.append(root_dir)
 
+import asyncio
 from typing_extensions import Literal
 
 from langgraph.graph import StateGraph, START, END
@@ -21,7 +22,7 @@ from states import ResearcherState, ResearcherOutputState
 from utils import get_today_str
 from tools import think_tool, tavily_search
 from prompts import research_agent_prompt, compress_research_system_prompt, compress_research_human_message
-from models import init_model
+from models import init_model, get_provider, get_rate_limiter
 
 # ===== CONFIGURATION =====
 
@@ -31,15 +32,28 @@ tools_by_name = {tool.name: tool for tool in tools}
 max_tool_call_iterations = 5
 
 # Initialize models
-model = init_model(temperature=0.7, model_name="SF_Qwen3-8B")
+RESEARCH_MODEL_NAME = "SF_Qwen3-8B"
+model = init_model(temperature=0.7, model_name=RESEARCH_MODEL_NAME)
+# Shared per-provider token bucket, so concurrent researchers stay within the provider's rate limit
+rate_limiter = get_rate_limiter(get_provider(RESEARCH_MODEL_NAME))
 model_with_tools = model.bind_tools(tools)
 summarization_model = model
 compress_model = model
 
 
+async def ainvoke_rate_limited(runnable, messages: list):
+    """Invoke a model after taking a token from the provider's rate limiter.
+
+    Every model call of a researcher goes through here, so the token bucket is
+    acquired exactly once per request.
+    """
+    await rate_limiter.acquire_async()
+    return await runnable.ainvoke(messages)
+
+
 # ===== AGENT NODES =====
 
-def llm_call(state: ResearcherState):
+async def llm_call(state: ResearcherState):
     """Analyze current state and decide on next actions.
 
     The model analyzes the current conversation state and decides whether to:
@@ -50,27 +64,29 @@ def llm_call(state: ResearcherState):
     """
     return {
         "researcher_messages": [
-            model_with_tools.invoke(
-                [SystemMessage(content=research_agent_prompt)] + state["researcher_messages"]
+            await ainvoke_rate_limited(
+                model_with_tools,
+                [SystemMessage(content=research_agent_prompt.format(date=get_today_str()))] + state["researcher_messages"]
             )
         ],
         # Add tool call iterations to state
         "tool_call_iterations": state.get("tool_call_iterations", 0)
     }
 
-def tool_node(state: ResearcherState):
+async def tool_node(state: ResearcherState):
     """Execute all tool calls from the previous LLM response.
 
-    Executes all tool calls from the previous LLM responses.
+    Executes all tool calls from the previous LLM responses concurrently,
+    so a step takes as long as its slowest tool call.
     Returns updated state with tool execution results.
     """
     tool_calls = state["researcher_messages"][-1].tool_calls
 
-    # Execute all tool calls
-    observations = []
-    for tool_call in tool_calls:
-        tool = tools_by_name[tool_call["name"]]
-        observations.append(tool.invoke(tool_call["args"]))
+    # Execute all tool calls concurrently
+    observations = await asyncio.gather(*[
+        tools_by_name[tool_call["name"]].ainvoke(tool_call["args"])
+        for tool_call in tool_calls
+    ])
 
     # Create tool message outputs
     tool_outputs = [
@@ -89,7 +105,7 @@ def tool_node(state: ResearcherState):
 
     return {"researcher_messages": tool_outputs, "tool_call_iterations": tool_call_iterations}
 
-def compress_research(state: ResearcherState) -> dict:
+async def compress_research(state: ResearcherState) -> dict:
     """Compress research findings into a concise summary.
 
     Takes all the research messages and tool outputs and creates
@@ -98,7 +114,7 @@ def compress_research(state: ResearcherState) -> dict:
 
     system_message = compress_research_system_prompt.format(date=get_today_str())
     messages = [SystemMessage(content=system_message)] + state.get("researcher_messages", []) + [HumanMessage(content=compress_research_human_message)]
-    response = compress_model.invoke(messages)
+    response = await ainvoke_rate_limited(compress_model, messages)
 
     # Extract raw notes from tool and AI messages
     raw_notes = [
@@ -160,17 +176,14 @@ agent_builder.add_edge("tool_node", "llm_call") # Loop back for more research
 agent_builder.add_edge("compress_research", END)
 
 # Compile the agent
-researcher_agent = agent_builder.compile()
+# Researchers run concurrently inside one supervisor step, so they do not share the
+# parent's checkpointer; the supervisor stores their finished results instead
+researcher_agent = agent_builder.compile(checkpointer=False)
 
 
-if __name__ == "__main__":
-    # Draw the graph and save it to a file
-    #researcher_agent.get_graph().draw_mermaid_png(output_file_path="researcher_agent.png")
-
-    # Test the agent with a sample query
-    query = "量子计算有什么最新进展?"
-    config = {"stream_mode": "updates", "recursion_limit": 100}
-    for chunk in researcher_agent.stream({"researcher_messages": [HumanMessage(content=query)]},config=config):
+async def stream_run(query: str):
+    config = {"recursion_limit": 100}
+    async for chunk in researcher_agent.astream({"researcher_messages": [HumanMessage(content=query)]}, config=config, stream_mode="updates"):
         node, event = next(iter(chunk.items()))
         if node != "compress_research":
             print("="*30 + "节点：" + node + "="*30)
@@ -181,3 +194,11 @@ if __name__ == "__main__":
             print("="*30 + "节点：" + node + "="*30)
             print("compressed_research：" + event.get("compressed_research", ""))
             print("raw_notes：" + str(event.get("raw_notes", [])))
+
+
+if __name__ == "__main__":
+    # Draw the graph and save it to a file
+    #researcher_agent.get_graph().draw_mermaid_png(output_file_path="researcher_agent.png")
+
+    # Test the agent with a sample query
+    asyncio.run(stream_run("量子计算有什么最新进展?"))
@@ -0,0 +1,54 @@
+"""Research task scheduler for the supervisor's ConductResearch fan-out.
+
+The supervisor may emit more ConductResearch calls than max_concurrent_researchers.
+ResearchScheduler runs them on a bounded pool of worker tasks: topics are taken
+from a priority queue (higher priority first, then in call order) and at most
+max_concurrency researchers run at once. Provider rate limiting is applied by
+the researchers around each model call, not per launch.
+"""
+import asyncio
+import heapq
+
+
+class ResearchScheduler:
+    """Run research tasks with bounded concurrency and priorities.
+
+    Args:
+        max_concurrency: Maximum number of researchers running at the same time
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+
+    async def run(self, tasks: list) -> list:
+        """Run tasks and return their results in input order.
+
+        Args:
+            tasks: List of (priority, factory) pairs; factory is a zero-argument
+                callable returning the coroutine to run
+
+        Returns:
+            List of results; a task that raised has its exception in its place
+        """
+        queue = [(-priority, index) for index, (priority, _) in enumerate(tasks)]
+        heapq.heapify(queue)
+        results = [None] * len(tasks)
+
+        async def worker():
+            while queue:
+                _, index = heapq.heappop(queue)
+                try:
+                    results[index] = await tasks[index][1]()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    results[index] = e
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.max_concurrency, len(tasks)))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # If the caller is cancelled, stop the researchers still running
+            for task in workers:
+                task.cancel()
+        return results
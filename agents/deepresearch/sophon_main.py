@@ -1,5 +1,6 @@
 import sys
 import os
+import uuid
 # 添加项目根目录到 Python 路径
 root_dir=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 deepresearch_dir=os.path.dirname(os.path.abspath(__file__))
@@ -13,6 +14,9 @@ from subgraph import supervisor_agent
 from models import init_model
 from prompts import final_report_generation_with_helpfulness_insightfulness_hit_citation_prompt
 from utils import get_today_str
+from telemetry import TraceRecorder
+from checkpointer import research_checkpointer
+from findings import pack_findings
 
 
 writer_model = init_model(temperature=0.7, model_name="SF_Qwen3-8B")
@@ -26,7 +30,8 @@ async def final_report_generation(state: AgentState):
 
     notes = state.get("notes", [])
 
-    findings = "\n".join(notes)
+    # Rank note passages against the research brief and pack the best ones into a bounded budget
+    findings = pack_findings(notes, state.get("research_brief", ""))
 
     final_report_prompt = final_report_generation_with_helpfulness_insightfulness_hit_citation_prompt.format(
         research_brief=state.get("research_brief", ""),
@@ -36,11 +41,14 @@ async def final_report_generation(state: AgentState):
         user_request=state.get("user_request", "")
     )
 
-    final_report = await writer_model.ainvoke([HumanMessage(content=final_report_prompt)])
+    # Stream the report so callers using stream_mode="messages" receive it token by token
+    final_report = ""
+    async for chunk in writer_model.astream([HumanMessage(content=final_report_prompt)]):
+        final_report += chunk.content
 
     return {
-        "final_report": final_report.content, 
-        "messages": ["Here is the final report: " + final_report.content],
+        "final_report": final_report, 
+        "messages": ["Here is the final report: " + final_report],
     }
 
 
@@ -62,17 +70,65 @@ sophon_builder.add_edge("supervisor_subgraph", "final_report_generation")
 sophon_builder.add_edge("final_report_generation", END)
 
 # Compile the full workflow
-Sophon = sophon_builder.compile()
+# Checkpoints of Sophon and its supervisor subgraph go to disk, so an interrupted run
+# can be resumed by thread id; every run must pass config={"configurable": {"thread_id": ...}}
+Sophon = sophon_builder.compile(checkpointer=research_checkpointer)
 
 
-async def stream_run(query: str):
-    async for item in Sophon.astream({"messages": [HumanMessage(content=query)]},version="v1",stream_mode="updates"):
+def new_sophon_thread_id(prefix: str = "sophon") -> str:
+    """Create a thread id for a new Sophon run."""
+    return f"{prefix}_{uuid.uuid4().hex}"
+
+def sophon_resumable(thread_id: str) -> bool:
+    """Whether the thread has a stored checkpoint with nodes still to run."""
+    if not thread_id:
+        return False
+    return bool(Sophon.get_state({"configurable": {"thread_id": thread_id}}).next)
+
+def resume_sophon(thread_id: str, config: dict | None = None, stream_mode="updates"):
+    """Resume an interrupted Sophon run from its latest checkpoint.
+
+    Nodes that already finished are not run again; inside the supervisor subgraph the
+    run continues from its last iteration, and researchers that completed before the
+    interruption return their stored results.
+
+    Args:
+        thread_id: Thread id the run was started with
+        config: Extra run config (e.g. callbacks)
+        stream_mode: Stream mode passed to astream
+
+    Returns:
+        Async iterator over the streamed updates of the resumed run
+    """
+    config = dict(config or {})
+    config["configurable"] = {**config.get("configurable", {}), "thread_id": thread_id}
+    return Sophon.astream(None, config=config, stream_mode=stream_mode)
+
+
+async def stream_run(query: str, thread_id: str | None = None):
+    recorder = TraceRecorder()
+    config = {"configurable": {"thread_id": thread_id or new_sophon_thread_id()}, "callbacks": [recorder]}
+    print("thread_id: " + config["configurable"]["thread_id"])
+    if thread_id and sophon_resumable(thread_id):
+        stream = resume_sophon(thread_id, config, stream_mode=["updates", "messages"])
+    else:
+        stream = Sophon.astream({"messages": [HumanMessage(content=query)]},stream_mode=["updates", "messages"],config=config)
+    async for mode, item in stream:
+        if mode == "messages":
+            # Tokens of the final report are printed as they are generated
+            chunk, metadata = item
+            if metadata.get("langgraph_node") == "final_report_generation":
+                print(chunk.content, end="", flush=True)
+            continue
         for node, data in item.items():
             print("#"*30 + "节点：" + node + "#"*30)
-            print(data)
             if node == "final_report_generation":
-                print("="*30 + "最终报告：" + "="*30)
-                print(data.get("final_report", ""))
+                print()
+            else:
+                print(data)
+    print("="*30 + "执行耗时：" + "="*30)
+    print(recorder.flame_summary())
+    print("trace: " + recorder.export_jsonl())
     
 if __name__ == "__main__":
     # draw the graph
@@ -8,16 +8,21 @@ sys.path.append(root_dir)
 
 import operator
 import asyncio
+import uuid
 from langgraph.types import Command
 from typing import Literal, Annotated, Sequence, TypedDict
-from langchain_core.messages import BaseMessage, SystemMessage, ToolMessage, HumanMessage, filter_messages
+from langchain_core.runnables import RunnableConfig
+from langchain_core.messages import BaseMessage, SystemMessage, ToolMessage, HumanMessage
 from langgraph.graph import StateGraph,  add_messages, START, END
 from prompts import lead_researcher_with_multiple_steps_diffusion_double_check_prompt
 from utils import get_today_str
 from models import init_model
 from tools import think_tool, ConductResearch, ResearchComplete, refine_draft_report
 from research_agent import researcher_agent
-from langgraph.checkpoint.memory import InMemorySaver
+from scheduler import ResearchScheduler
+from dedup import DedupIndex, current_dedup_index, get_run_dedup_index
+from memory import make_note, compact_supervisor_messages
+from checkpointer import research_checkpointer
 
 model = init_model(temperature=0.7, model_name="SF_Qwen3-8B")
 # 定义管理者状态
@@ -39,6 +44,10 @@ class SupervisorState(TypedDict):
     raw_notes: Annotated[list[str], operator.add] = []
     # Draft report
     draft_report: str
+    # Indexed store of ConductResearch findings (see memory.make_note), in arrival order
+    research_notes: Annotated[list[dict], operator.add] = []
+    # Number of research notes already incorporated into the draft report
+    refined_findings_count: int = 0
 
 # 定义最大并发研究代理数量
 max_concurrent_researchers = 3
@@ -72,7 +81,10 @@ async def supervisor(state: SupervisorState) -> Command[Literal["supervisor_tool
         max_concurrent_research_units=max_concurrent_researchers,
         max_researcher_iterations=max_researcher_iterations
     )
-    messages = [SystemMessage(content=system_message)] + supervisor_messages
+    # Older tool outputs are sent as note digests so the prompt does not grow with every iteration
+    messages = [SystemMessage(content=system_message)] + compact_supervisor_messages(
+        supervisor_messages, state.get("research_notes", [])
+    )
 
     # Make decision about next research steps
     response = await supervisor_model_with_tools.ainvoke(messages)
@@ -85,25 +97,8 @@ async def supervisor(state: SupervisorState) -> Command[Literal["supervisor_tool
         }
     )
 
-def get_notes_from_tool_calls(messages: list[BaseMessage]) -> list[str]:
-    """Extract research notes from ToolMessage objects in supervisor message history.
-
-    This function retrieves the compressed research findings that sub-agents
-    return as ToolMessage content. When the supervisor delegates research to
-    sub-agents via ConductResearch tool calls, each sub-agent returns its
-    compressed findings as the content of a ToolMessage. This function
-    extracts all such ToolMessage content to compile the final research notes.
-
-    Args:
-        messages: List of messages from supervisor's conversation history
-
-    Returns:
-        List of research note strings extracted from ToolMessage objects
-    """
-    return [tool_msg.content for tool_msg in filter_messages(messages, include_types="tool")]
-
 # 定义执行者节点
-async def supervisor_tools(state: SupervisorState) -> Command[Literal["supervisor", "__end__"]]:
+async def supervisor_tools(state: SupervisorState, config: RunnableConfig) -> Command[Literal["supervisor", "__end__"]]:
     """Execute supervisor decisions - either conduct research or end the process.
 
     Handles:
@@ -114,6 +109,7 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
 
     Args:
         state: Current supervisor state with messages and iteration count
+        config: Run config; its thread_id keys the stored researcher results
 
     Returns:
         Command to continue supervision, end process, or handle errors
@@ -125,7 +121,9 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
     # Initialize variables for single return pattern
     tool_messages = []
     all_raw_notes = []
+    new_notes = []
     draft_report = ""
+    refined_findings_count = state.get("refined_findings_count", 0)
     next_step = "supervisor"  # Default next step
     should_end = False
 
@@ -136,6 +134,8 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
         tool_call["name"] == "ResearchComplete" 
         for tool_call in most_recent_message.tool_calls
     )
+    # The run's thread id keys the shared dedup index and the stored researcher results
+    thread_id = config.get("configurable", {}).get("thread_id")
 
     if exceeded_iterations or no_tool_calls or research_complete:
         should_end = True
@@ -170,59 +170,113 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
                     )
                 )
 
+            # Results of completed researchers are stored per tool call, so a resumed
+            # run reuses them instead of researching the same topic again
+            async def run_researcher(tool_call: dict) -> dict:
+                if thread_id and tool_call.get("id"):
+                    stored = await research_checkpointer.aget_researcher_result(thread_id, tool_call["id"])
+                    if stored is not None:
+                        return stored
+                topic = tool_call["args"]["research_topic"]
+                result = await researcher_agent.ainvoke({
+                    "researcher_messages": [HumanMessage(content=topic)],
+                    "research_topic": topic
+                })
+                if thread_id and tool_call.get("id") and "compressed_research" in result:
+                    await research_checkpointer.aput_researcher_result(thread_id, tool_call["id"], {
+                        "compressed_research": result["compressed_research"],
+                        "raw_notes": result.get("raw_notes", []),
+                    })
+                return result
+
             # Handle ConductResearch calls (asynchronous)
-            if conduct_research_calls:
-                # Launch parallel research agents
-                coros = [
-                    researcher_agent.ainvoke({
-                        "researcher_messages": [
-                            HumanMessage(content=tool_call["args"]["research_topic"])
-                        ],
-                        "research_topic": tool_call["args"]["research_topic"]
-                    }) 
+            async def run_research_wave() -> list:
+                if not conduct_research_calls:
+                    return []
+                # Share one dedup index with all researchers of this run, so each
+                # unique source is summarized once (without a thread id, within this wave only)
+                dedup_index = get_run_dedup_index(thread_id) if thread_id else DedupIndex()
+                dedup_token = current_dedup_index.set(dedup_index)
+                # Launch research agents: at most max_concurrent_researchers at a time,
+                # higher-priority topics first
+                scheduler = ResearchScheduler(max_concurrent_researchers)
+                research_tasks = [
+                    (
+                        tool_call["args"].get("priority", 0),
+                        lambda tool_call=tool_call: run_researcher(tool_call),
+                    )
                     for tool_call in conduct_research_calls
                 ]
 
                 # Wait for all research to complete
-                tool_results = await asyncio.gather(*coros)
-
-                # Format research results as tool messages
-                # Each sub-agent returns compressed research findings in result["compressed_research"]
-                # We write this compressed research as the content of a ToolMessage, which allows
-                # the supervisor to later retrieve these findings via get_notes_from_tool_calls()
-                research_tool_messages = [
-                    ToolMessage(
-                        content=result.get("compressed_research", "Error synthesizing research report"),
-                        name=tool_call["name"],
-                        tool_call_id=tool_call["id"]
-                    ) for result, tool_call in zip(tool_results, conduct_research_calls)
-                ]
-
-                tool_messages.extend(research_tool_messages)
-
-                # Aggregate raw notes from all research
-                all_raw_notes = [
-                    "\n".join(result.get("raw_notes", [])) 
+                try:
+                    tool_results = await scheduler.run(research_tasks)
+                finally:
+                    current_dedup_index.reset(dedup_token)
+                # A failed researcher reports its error instead of failing the whole wave
+                return [
+                    {"compressed_research": f"Error conducting research: {result}", "error": True} if isinstance(result, Exception) else result
                     for result in tool_results
                 ]
 
-            for tool_call in refine_report_calls: 
-              notes = get_notes_from_tool_calls(supervisor_messages)    
-              findings = "\n".join(notes)
-
-              draft_report = refine_draft_report.invoke({
-                    "research_brief": state.get("research_brief", ""),
-                    "findings": findings,
-                    "draft_report": state.get("draft_report", "")
-              })
-
-              tool_messages.append(
+            # Handle refine_draft_report calls (asynchronous, incremental)
+            async def run_refinements() -> tuple:
+                # Only notes that arrived since the last refinement are sent, together with the current draft
+                research_notes = state.get("research_notes", [])
+                new_findings = [note["content"] for note in research_notes[refined_findings_count:]]
+                current_draft = state.get("draft_report", "")
+                refine_tool_messages = []
+                for tool_call in refine_report_calls:
+                    if new_findings:
+                        current_draft = await refine_draft_report.ainvoke({
+                            "research_brief": state.get("research_brief", ""),
+                            "findings": "\n".join(new_findings),
+                            "draft_report": current_draft
+                        })
+                        new_findings = []
+                    refine_tool_messages.append(
+                        ToolMessage(
+                            content=current_draft,
+                            name=tool_call["name"],
+                            tool_call_id=tool_call["id"]
+                        )
+                    )
+                return refine_tool_messages, current_draft, len(research_notes)
+
+            # Refinement of the draft runs concurrently with the research wave
+            tool_results, (refine_tool_messages, draft_report, refined_findings_count) = await asyncio.gather(
+                run_research_wave(), run_refinements()
+            )
+
+            # Format research results as tool messages
+            # Each sub-agent returns compressed research findings in result["compressed_research"]
+            # We write this compressed research as the content of a ToolMessage for the supervisor,
+            # and store successful findings as indexed research notes for refinement and the final report
+            research_tool_messages = [
                 ToolMessage(
-                    content=draft_report,
+                    content=result.get("compressed_research", "Error synthesizing research report"),
                     name=tool_call["name"],
                     tool_call_id=tool_call["id"]
-                )
-              )
+                ) for result, tool_call in zip(tool_results, conduct_research_calls)
+            ]
+
+            note_index = len(state.get("research_notes", []))
+            for result, tool_call in zip(tool_results, conduct_research_calls):
+                if result.get("error") or "compressed_research" not in result:
+                    continue
+                new_notes.append(make_note(
+                    note_index, tool_call["id"], tool_call["args"]["research_topic"], result["compressed_research"]
+                ))
+                note_index += 1
+
+            tool_messages.extend(research_tool_messages)
+            tool_messages.extend(refine_tool_messages)
+
+            # Aggregate raw notes from all research
+            all_raw_notes = [
+                "\n".join(result.get("raw_notes", [])) 
+                for result in tool_results
+            ]
 
         except Exception as e:
             should_end = True
@@ -233,7 +287,7 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
         return Command(
             goto=next_step,
             update={
-                "notes": get_notes_from_tool_calls(supervisor_messages),
+                "notes": [note["content"] for note in state.get("research_notes", [])],
                 "research_brief": state.get("research_brief", "")
             }
         )
@@ -243,7 +297,9 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
             update={
                 "supervisor_messages": tool_messages,
                 "raw_notes": all_raw_notes,
-                "draft_report": draft_report
+                "research_notes": new_notes,
+                "draft_report": draft_report,
+                "refined_findings_count": refined_findings_count
             }
         )        
     else:
@@ -251,7 +307,8 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
             goto=next_step,
             update={
                 "supervisor_messages": tool_messages,
-                "raw_notes": all_raw_notes
+                "raw_notes": all_raw_notes,
+                "research_notes": new_notes
             }
         )
 
@@ -261,19 +318,26 @@ supervisor_builder.add_node("supervisor", supervisor)
 supervisor_builder.add_node("supervisor_tools", supervisor_tools)
 supervisor_builder.add_edge(START, "supervisor")
 #supervisor_builder.add_edge("supervisor_tools", END)
-supervisor_agent = supervisor_builder.compile(checkpointer=InMemorySaver())
+# No checkpointer of its own: inside Sophon the subgraph checkpoints under the parent's
+# namespace with the parent's saver, so a resumed Sophon run continues inside the subgraph
+supervisor_agent = supervisor_builder.compile()
+
+
+def compile_standalone_supervisor():
+    """Compile the supervisor graph with the durable checkpointer, for running it outside Sophon."""
+    return supervisor_builder.compile(checkpointer=research_checkpointer)
 
 
 async def run():
     query = "全球量子计算的最新进展"
-    thread = {"configurable": {"thread_id": "1", "recursion_limit": 50}}
-    result = await supervisor_agent.ainvoke({"supervisor_messages": [HumanMessage(content=query)]}, config=thread)
+    thread = {"configurable": {"thread_id": uuid.uuid4().hex}, "recursion_limit": 50}
+    result = await compile_standalone_supervisor().ainvoke({"supervisor_messages": [HumanMessage(content=query)]}, config=thread)
     print(result)
 
 async def stream_run():
     query = "全球量子计算的最新进展"
-    thread = {"configurable": {"thread_id": "1", "recursion_limit": 50}}
-    async for event in supervisor_agent.astream_events({"supervisor_messages": [HumanMessage(content=query)]}, config=thread):
+    thread = {"configurable": {"thread_id": uuid.uuid4().hex}, "recursion_limit": 50}
+    async for event in compile_standalone_supervisor().astream_events({"supervisor_messages": [HumanMessage(content=query)]}, config=thread):
         print(event)
 
 
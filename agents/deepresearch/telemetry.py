@@ -0,0 +1,242 @@
+"""Per-node latency and token telemetry for the Sophon deep-research graph.
+
+TraceRecorder is a LangChain callback handler. Pass it in the run config
+(config={"callbacks": [recorder]}); callbacks propagate into the
+supervisor_agent and researcher_agent subgraphs. For every graph node
+execution (identified by the "langgraph_node" metadata LangGraph attaches to
+node runs) it records a span with:
+
+- wall time (start / end / duration),
+- LLM call count with prompt and completion tokens,
+- tool calls,
+- Tavily searches and their latency (reported by tools.py through a
+  "tavily_search" custom event).
+
+LLM calls, tool calls and searches are attributed to the innermost node span
+that encloses them. A finished trace can be exported as JSONL
+(export_jsonl) and rendered as a flame-graph-style text summary
+(flame_summary), where identical node paths are merged and each line shows
+total time plus the work done directly in that node.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from langchain_core.callbacks import BaseCallbackHandler
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Directory for exported traces
+TRACE_DIR = os.path.join(root_dir, "logs", "traces")
+# Width of the time bar in the flame summary
+FLAME_BAR_WIDTH = 30
+
+
+def _new_counters() -> dict:
+    return {
+        "llm_calls": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "tool_calls": 0,
+        "tavily_calls": 0,
+        "tavily_latency": 0.0,
+    }
+
+
+class TraceRecorder(BaseCallbackHandler):
+    """Record one span per graph node execution of a run."""
+
+    # Record synchronously in the callback, without handing off to a thread pool
+    run_inline = True
+
+    def __init__(self, name: str = "sophon"):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.spans = {}
+        self._parents = {}
+        self._lock = threading.Lock()
+
+    # ===== run tree =====
+
+    def _remember_parent(self, run_id, parent_run_id):
+        with self._lock:
+            self._parents[run_id] = parent_run_id
+
+    def _enclosing_span(self, run_id) -> dict | None:
+        """Innermost node span among run_id and its ancestors."""
+        with self._lock:
+            while run_id is not None:
+                span = self.spans.get(run_id)
+                if span is not None:
+                    return span
+                run_id = self._parents.get(run_id)
+        return None
+
+    def _add(self, run_id, **counters):
+        span = self._enclosing_span(run_id)
+        if span is None:
+            return
+        with self._lock:
+            for key, value in counters.items():
+                span[key] += value
+
+    # ===== graph nodes =====
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        self._remember_parent(run_id, parent_run_id)
+        node = (metadata or {}).get("langgraph_node")
+        # Runs nested inside a node inherit its metadata; only the node's own run is named after it
+        if not node or kwargs.get("name") != node:
+            return
+        parent = self._enclosing_span(parent_run_id)
+        with self._lock:
+            self.spans[run_id] = {
+                "span_id": str(run_id),
+                "parent_span_id": parent["span_id"] if parent else None,
+                "node": node,
+                "path": (parent["path"] if parent else []) + [node],
+                "step": (metadata or {}).get("langgraph_step"),
+                "start": time.time(),
+                "end": None,
+                "duration": None,
+                "error": None,
+                **_new_counters(),
+            }
+
+    def _end_span(self, run_id, error=None):
+        with self._lock:
+            span = self.spans.get(run_id)
+            if span is None or span["end"] is not None:
+                return
+            span["end"] = time.time()
+            span["duration"] = span["end"] - span["start"]
+            if error is not None:
+                span["error"] = repr(error)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_span(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end_span(run_id, error)
+
+    # ===== LLM calls =====
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._remember_parent(run_id, parent_run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._remember_parent(run_id, parent_run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    input_tokens += usage.get("input_tokens", 0)
+                    output_tokens += usage.get("output_tokens", 0)
+        if not (input_tokens or output_tokens):
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            input_tokens = token_usage.get("prompt_tokens", 0)
+            output_tokens = token_usage.get("completion_tokens", 0)
+        self._add(run_id, llm_calls=1, input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._add(run_id, llm_calls=1)
+
+    # ===== tools and searches =====
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._remember_parent(run_id, parent_run_id)
+        self._add(run_id, tool_calls=1)
+
+    def on_custom_event(self, name, data, *, run_id, **kwargs):
+        if name == "tavily_search":
+            self._add(run_id, tavily_calls=1, tavily_latency=data.get("latency", 0.0))
+
+    # ===== export =====
+
+    def summary(self) -> dict:
+        """Totals for the whole run."""
+        with self._lock:
+            spans = list(self.spans.values())
+        totals = _new_counters()
+        for span in spans:
+            for key in totals:
+                totals[key] += span[key]
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+            "duration": time.time() - self.started_at,
+            "spans": len(spans),
+            **totals,
+        }
+
+    def export_jsonl(self, trace_dir: str = TRACE_DIR) -> str:
+        """Write the trace as JSONL (a summary line, then one line per span) and return the file path."""
+        os.makedirs(trace_dir, exist_ok=True)
+        path = os.path.join(
+            trace_dir,
+            f"{datetime.fromtimestamp(self.started_at).strftime('%Y%m%d_%H%M%S')}_{self.name}_{self.trace_id}.jsonl",
+        )
+        with self._lock:
+            spans = sorted(self.spans.values(), key=lambda span: span["start"])
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "trace", **self.summary()}, ensure_ascii=False) + "\n")
+            for span in spans:
+                f.write(json.dumps({"type": "span", "trace_id": self.trace_id, **span}, ensure_ascii=False) + "\n")
+        return path
+
+    def flame_summary(self) -> str:
+        """Render merged node paths as an indented text flame graph.
+
+        Each line: time bar, node, total wall time, execution count, and the LLM,
+        token, tool and Tavily work done directly in that node.
+        """
+        with self._lock:
+            spans = list(self.spans.values())
+        merged = {}
+        now = time.time()
+        for span in spans:
+            key = tuple(span["path"])
+            entry = merged.setdefault(key, {"duration": 0.0, "count": 0, **_new_counters()})
+            entry["duration"] += span["duration"] if span["duration"] is not None else now - span["start"]
+            entry["count"] += 1
+            for counter in _new_counters():
+                entry[counter] += span[counter]
+        if not merged:
+            return "(no graph nodes recorded)"
+
+        # Children of the same parent are listed by descending time
+        def children(prefix: tuple) -> list:
+            keys = [key for key in merged if len(key) == len(prefix) + 1 and key[:len(prefix)] == prefix]
+            return sorted(keys, key=lambda key: merged[key]["duration"], reverse=True)
+
+        total = max(sum(merged[key]["duration"] for key in children(())), 1e-9)
+        lines = []
+
+        def render(key: tuple):
+            entry = merged[key]
+            bar = "█" * max(1, round(FLAME_BAR_WIDTH * min(entry["duration"] / total, 1.0)))
+            details = []
+            if entry["llm_calls"]:
+                details.append(f"LLM×{entry['llm_calls']} {entry['input_tokens']}→{entry['output_tokens']} tok")
+            if entry["tool_calls"]:
+                details.append(f"tools×{entry['tool_calls']}")
+            if entry["tavily_calls"]:
+                details.append(f"tavily×{entry['tavily_calls']} {entry['tavily_latency']:.1f}s")
+            line = f"{'  ' * (len(key) - 1)}{bar} {key[-1]} {entry['duration']:.1f}s"
+            if entry["count"] > 1:
+                line += f" (×{entry['count']})"
+            if details:
+                line += " | " + ", ".join(details)
+            lines.append(line)
+            for child in children(key):
+                render(child)
+
+        for key in children(()):
+            render(key)
+        return "\n".join(lines)
@@ -6,25 +6,260 @@ deepresearch_dir=os.path.dirname(os.path.abspath(__file__))
 sys.path.append(deepresearch_dir)
 sys.path.append(root_dir)
 
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+import unicodedata
+import weakref
+from concurrent.futures import Future
 from dotenv import load_dotenv
-from langchain_core.tools import tool, InjectedToolArg
+from langchain_core.tools import tool, InjectedToolArg, StructuredTool
+from langchain_core.callbacks import adispatch_custom_event
 from langchain_core.messages import HumanMessage
 from typing import Annotated, Literal, List
-from utils import get_today_str
-from models import init_model
-from prompts import report_generation_with_draft_insight_prompt, summarize_webpage_prompt
+from utils import get_today_str, run_async, split_into_chunks
+from models import init_model, estimate_tokens
+from storage import KVCache
+from prompts import report_generation_with_draft_insight_prompt, summarize_webpage_prompt, reduce_webpage_summaries_prompt
 from pydantic import BaseModel, Field
-from tavily import TavilyClient
+from tavily import TavilyClient, AsyncTavilyClient
 from schemas import Summary
+from dedup import DedupIndex, canonicalize_url, current_dedup_index
 
 load_dotenv()
+logger = logging.getLogger('ChatX-DeepResearch')
 # ====== Search Functions ======
 ## Tavily Config
 tavily_client = TavilyClient(api_key=os.getenv("tavily_api_key"))
-MAX_CONTEXT_LENGTH = 250000
-model = init_model(temperature=0.7, model_name="SF_Qwen3-8B")
+async_tavily_client = AsyncTavilyClient(api_key=os.getenv("tavily_api_key"))
+# Character limit on a single page, applied before chunking so huge pages (e.g. data dumps) are
+# never tokenized in full; well above MAX_SUMMARY_CHUNKS * SUMMARY_CHUNK_TOKENS of Latin text
+MAX_CONTEXT_LENGTH = 500000
+# Maximum number of Tavily requests in flight per event loop (shared by all researchers)
+MAX_CONCURRENT_SEARCHES = 5
+# Timeout in seconds for a single Tavily query
+SEARCH_TIMEOUT = 30
+# Maximum number of webpage summarization calls in flight per event loop
+MAX_CONCURRENT_SUMMARIES = 5
+# Timeout in seconds for summarizing a single webpage
+SUMMARY_TIMEOUT = 120
+# Long pages are split into chunks of about this many tokens, summarized in parallel and then merged
+SUMMARY_CHUNK_TOKENS = 6000
+# Maximum tokens of chunk summaries merged in a single reduce call
+SUMMARY_REDUCE_TOKENS = 6000
+# Maximum chunks summarized per page; the rest of a longer page is dropped, which bounds the
+# summarization calls a single page can queue behind MAX_CONCURRENT_SUMMARIES
+MAX_SUMMARY_CHUNKS = 12
+SUMMARIZATION_MODEL_NAME = "SF_Qwen3-8B"
+model = init_model(temperature=0.7, model_name=SUMMARIZATION_MODEL_NAME)
 summarization_model = model
 
+## Summary Cache
+# Summaries are cached by (URL, page content, prompt version, model); changing the prompt invalidates old entries
+SUMMARY_PROMPT_VERSION = hashlib.sha256(
+    (summarize_webpage_prompt + reduce_webpage_summaries_prompt + str(SUMMARY_CHUNK_TOKENS) + str(MAX_SUMMARY_CHUNKS)).encode("utf-8")
+).hexdigest()[:12]
+SUMMARY_CACHE_TTL = 7 * 24 * 3600
+summary_cache = KVCache(
+    os.path.join(root_dir, "data", "cache", "summaries.db"),
+    ttl=SUMMARY_CACHE_TTL,
+    max_entries=5000,
+    max_bytes=50 * 1024 * 1024,
+)
+
+def summary_cache_key(url: str, webpage_content: str) -> str:
+    """Build the content-addressed cache key for a webpage summary."""
+    content_hash = hashlib.sha256(webpage_content.encode("utf-8")).hexdigest()
+    return hashlib.sha256(json.dumps(
+        [url, content_hash, SUMMARY_PROMPT_VERSION, SUMMARIZATION_MODEL_NAME]
+    ).encode("utf-8")).hexdigest()
+
+def _chunk_cache_key(chunk: str) -> str:
+    # Chunk summaries do not depend on the URL, so mirrors and overlapping pages share them
+    return summary_cache_key("chunk", chunk)
+
+def get_summary_cache_stats() -> dict:
+    """Get summary cache statistics: hits, misses, evictions, entries, bytes and hit_rate."""
+    return summary_cache.stats()
+
+## Search Cache
+# How long (seconds) a cached Tavily result stays fresh, per topic
+SEARCH_CACHE_FRESHNESS = {
+    "general": 24 * 3600,
+    "news": 15 * 60,
+    "finance": 15 * 60,
+}
+search_cache = KVCache(
+    os.path.join(root_dir, "data", "cache", "search.db"),
+    ttl=max(SEARCH_CACHE_FRESHNESS.values()),
+    max_entries=5000,
+    max_bytes=100 * 1024 * 1024,
+)
+# Characters kept even though they are punctuation, since they change a query's meaning (C#, R&D)
+_QUERY_KEEP_CHARS = "#&"
+# Searches currently in flight, shared across threads and event loops: cache key -> Future
+_inflight_searches = {}
+_inflight_lock = threading.Lock()
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query so trivially different spellings share a cache entry.
+
+    Applies NFKC (full-width to half-width), case folding, replaces punctuation
+    with spaces and collapses whitespace.
+    """
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = "".join(
+        " " if unicodedata.category(ch).startswith("P") and ch not in _QUERY_KEEP_CHARS else ch
+        for ch in query
+    )
+    return " ".join(query.split())
+
+def search_cache_key(query: str, max_results: int, topic: str, include_raw_content: bool) -> str:
+    """Build the cache key for a Tavily search."""
+    return hashlib.sha256(json.dumps(
+        [normalize_query(query), topic, max_results, include_raw_content]
+    ).encode("utf-8")).hexdigest()
+
+def _get_cached_search(cache_key: str, topic: str) -> dict | None:
+    cached = search_cache.get(cache_key)
+    if cached is None:
+        return None
+    entry = json.loads(cached)
+    if time.time() - entry["fetched_at"] > SEARCH_CACHE_FRESHNESS.get(topic, SEARCH_CACHE_FRESHNESS["general"]):
+        return None
+    return entry["result"]
+
+def get_search_cache_stats() -> dict:
+    """Get search cache statistics: hits, misses, evictions, entries, bytes and hit_rate."""
+    return search_cache.stats()
+
+# asyncio.Semaphore is bound to the loop it is first used on, so keep one set per loop
+_loop_semaphores = weakref.WeakKeyDictionary()
+
+def _get_loop_semaphore(name: str, limit: int) -> asyncio.Semaphore:
+    """Get the named concurrency semaphore for the running event loop."""
+    semaphores = _loop_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if name not in semaphores:
+        semaphores[name] = asyncio.Semaphore(limit)
+    return semaphores[name]
+
+async def _fetch_search(
+    query: str,
+    max_results: int,
+    topic: str,
+    include_raw_content: bool,
+    timeout: float,
+) -> dict:
+    """Call the Tavily API for a single query, bounded by the search semaphore and timeout.
+
+    The API latency is reported as a "tavily_search" custom event for run telemetry.
+    """
+    async with _get_loop_semaphore("search", MAX_CONCURRENT_SEARCHES):
+        start = time.perf_counter()
+        error = None
+        try:
+            return await asyncio.wait_for(
+                async_tavily_client.search(
+                    query,
+                    max_results=max_results,
+                    include_raw_content=include_raw_content,
+                    topic=topic
+                ),
+                timeout=timeout,
+            )
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            await _report_search(query, time.perf_counter() - start, error)
+
+async def _report_search(query: str, latency: float, error: str | None):
+    """Dispatch a "tavily_search" custom event to the callbacks of the current run, if any."""
+    try:
+        await adispatch_custom_event("tavily_search", {"query": query, "latency": latency, "error": error})
+    except RuntimeError:
+        # Called outside a runnable (e.g. tavily_search_multiple used directly): nothing to report to
+        pass
+
+async def _search_one(
+    query: str,
+    max_results: int,
+    topic: str,
+    include_raw_content: bool,
+    timeout: float,
+) -> dict:
+    """Run a single Tavily query, returning an empty result on failure or timeout.
+
+    Fresh cached results are returned without calling the API, and concurrent
+    requests for the same key wait for the first request instead of repeating it.
+    """
+    cache_key = search_cache_key(query, max_results, topic, include_raw_content)
+    cached = _get_cached_search(cache_key, topic)
+    if cached is not None:
+        return cached
+
+    with _inflight_lock:
+        future = _inflight_searches.get(cache_key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _inflight_searches[cache_key] = future
+
+    try:
+        if not is_owner:
+            # shield: a cancelled waiter must not cancel the shared request
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await _fetch_search(query, max_results, topic, include_raw_content, timeout)
+            search_cache.set(cache_key, json.dumps({"fetched_at": time.time(), "result": result}, ensure_ascii=False))
+            future.set_result(result)
+            return result
+        except Exception as e:
+            # Waiting requests see the same failure; failures are not cached
+            future.set_exception(e)
+            raise
+        finally:
+            with _inflight_lock:
+                _inflight_searches.pop(cache_key, None)
+            if not future.done():
+                future.set_exception(RuntimeError("search request was not completed"))
+    except asyncio.TimeoutError:
+        print(f"Tavily search timed out after {timeout}s: {query}")
+    except Exception as e:
+        print(f"Tavily search failed for '{query}': {str(e)}")
+    return {"query": query, "results": []}
+
+async def atavily_search_multiple(
+    search_queries: List[str], 
+    max_results: int = 3, 
+    topic: Literal["general", "news", "finance"] = "general", 
+    include_raw_content: bool = True, 
+    timeout: float = SEARCH_TIMEOUT,
+) -> List[dict]:
+    """Perform search using Tavily API for multiple queries concurrently.
+
+    Queries run in parallel (bounded by MAX_CONCURRENT_SEARCHES), so latency is
+    that of the slowest query. A query that fails or exceeds the timeout yields
+    an empty result list instead of failing the whole batch.
+
+    Args:
+        search_queries: List of search queries to execute
+        max_results: Maximum number of results per query
+        topic: Topic filter for search results
+        include_raw_content: Whether to include raw webpage content
+        timeout: Timeout in seconds for each query
+
+    Returns:
+        List of search result dictionaries, in the same order as search_queries
+    """
+    return await asyncio.gather(*[
+        _search_one(query, max_results, topic, include_raw_content, timeout)
+        for query in search_queries
+    ])
+
 def tavily_search_multiple(
     search_queries: List[str], 
     max_results: int = 3, 
@@ -33,6 +268,8 @@ def tavily_search_multiple(
 ) -> List[dict]:
     """Perform search using Tavily API for multiple queries.
 
+    Synchronous wrapper around atavily_search_multiple.
+
     Args:
         search_queries: List of search queries to execute
         max_results: Maximum number of results per query
@@ -42,22 +279,18 @@ def tavily_search_multiple(
     Returns:
         List of search result dictionaries
     """
-
-    # Execute searches sequentially. Note: yon can use AsyncTavilyClient to parallelize this step.
-    search_docs = []
-    for query in search_queries:
-        result = tavily_client.search(
-            query,
-            max_results=max_results,
-            include_raw_content=include_raw_content,
-            topic=topic
-        )
-        search_docs.append(result)
-
-    return search_docs
+    return run_async(atavily_search_multiple(
+        search_queries,
+        max_results=max_results,
+        topic=topic,
+        include_raw_content=include_raw_content,
+    ))
 
 def deduplicate_search_results(search_results: List[dict]) -> dict:
-    """Deduplicate search results by URL to avoid processing duplicate content.
+    """Deduplicate search results by canonical URL to avoid processing duplicate content.
+
+    URLs differing only in tracking parameters, fragments, "www." or a trailing
+    slash are treated as the same page.
 
     Args:
         search_results: List of search result dictionaries
@@ -66,11 +299,14 @@ def deduplicate_search_results(search_results: List[dict]) -> dict:
         Dictionary mapping URLs to unique results
     """
     unique_results = {}
+    seen = set()
 
     for response in search_results:
         for result in response['results']:
             url = result['url']
-            if url not in unique_results:
+            canonical = canonicalize_url(url)
+            if canonical not in seen:
+                seen.add(canonical)
                 unique_results[url] = result
 
     return unique_results
@@ -78,61 +314,240 @@ def deduplicate_search_results(search_results: List[dict]) -> dict:
 def process_search_results(unique_results: dict) -> dict:
     """Process search results by summarizing content where available.
 
+    Synchronous wrapper around aprocess_search_results.
+
     Args:
         unique_results: Dictionary of unique search results
 
     Returns:
         Dictionary of processed results with summaries
     """
-    summarized_results = {}
+    return run_async(aprocess_search_results(unique_results))
+
+async def aprocess_search_results(unique_results: dict, timeout: float = SUMMARY_TIMEOUT) -> dict:
+    """Process search results by summarizing all pages concurrently.
 
+    Results are resolved against the research run's dedup index (see dedup.py):
+    near-duplicate pages within this call are dropped, and a source already
+    summarized elsewhere in the run reuses that summary.
+
+    Args:
+        unique_results: Dictionary of unique search results
+        timeout: Timeout in seconds for summarizing each page
+
+    Returns:
+        Dictionary of processed results with summaries, in the original order
+    """
+    # Outside a research run, deduplicate within this call only
+    dedup_index = current_dedup_index.get() or DedupIndex()
+    sources = {}
     for url, result in unique_results.items():
+        source_key = dedup_index.resolve(url, result.get("raw_content"))
+        if source_key not in sources.values():
+            sources[url] = source_key
+    unique_results = {url: unique_results[url] for url in sources}
+
+    async def process_one(url: str, result: dict) -> str:
         # Use existing content if no raw content for summarization
         if not result.get("raw_content"):
-            content = result['content']
-        else:
-            # Summarize raw content for better processing
-            content = summarize_webpage_content(result['raw_content'][:MAX_CONTEXT_LENGTH])
-
-        summarized_results[url] = {
+            return result['content']
+        # Summarize raw content for better processing (once per source per run; cached summaries skip the LLM call)
+        if len(result['raw_content']) > MAX_CONTEXT_LENGTH:
+            logger.warning(
+                "Webpage content truncated from %d to %d characters: %s",
+                len(result['raw_content']), MAX_CONTEXT_LENGTH, url,
+            )
+        webpage_content = result['raw_content'][:MAX_CONTEXT_LENGTH]
+        try:
+            return await dedup_index.get_or_create(
+                sources[url],
+                lambda: asummarize_webpage_content(webpage_content, timeout=timeout, url=url),
+            )
+        except Exception:
+            # Failures are not stored in the dedup index, so a later occurrence of the page retries
+            return _truncate_content(webpage_content)
+
+    contents = await asyncio.gather(*[process_one(url, result) for url, result in unique_results.items()])
+
+    return {
+        url: {
             'title': result['title'],
             'content': content
         }
+        for (url, result), content in zip(unique_results.items(), contents)
+    }
+
+def _summary_messages(webpage_content: str) -> list:
+    return [
+        HumanMessage(content=summarize_webpage_prompt.format(
+            webpage_content=webpage_content, 
+            date=get_today_str()
+        ))
+    ]
+
+def _reduce_messages(summaries: List[Summary]) -> list:
+    chunk_summaries = "\n\n".join(
+        f"--- 片段 {i} ---\n摘要：{summary.summary}\n摘录：{summary.key_excerpts}"
+        for i, summary in enumerate(summaries, 1)
+    )
+    return [
+        HumanMessage(content=reduce_webpage_summaries_prompt.format(
+            chunk_summaries=chunk_summaries,
+            date=get_today_str()
+        ))
+    ]
+
+def _format_summary(summary: Summary) -> str:
+    # Format summary with clear structure
+    return (
+        f"<summary>\n{summary.summary}\n</summary>\n\n"
+        f"<key_excerpts>\n{summary.key_excerpts}\n</key_excerpts>"
+    )
 
-    return summarized_results
+class SummarizationError(Exception):
+    """Raised when no part of a webpage could be summarized."""
+
+def _truncate_content(webpage_content: str) -> str:
+    # Fallback when summarization fails: keep the beginning of the page
+    return webpage_content[:1000] + "..." if len(webpage_content) > 1000 else webpage_content
+
+def _summary_tokens(summary: Summary) -> int:
+    return estimate_tokens(summary.summary) + estimate_tokens(summary.key_excerpts)
+
+async def _invoke_summary_model(messages: list, timeout: float) -> Summary | None:
+    """Call the structured summarization model, returning None on failure or timeout."""
+    async with _get_loop_semaphore("summary", MAX_CONCURRENT_SUMMARIES):
+        try:
+            structured_model = summarization_model.with_structured_output(Summary)
+            return await asyncio.wait_for(structured_model.ainvoke(messages), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"Summarizing webpage timed out after {timeout}s")
+        except Exception as e:
+            print(f"Failed to summarize webpage: {str(e)}")
+    return None
+
+async def _asummarize_chunk(chunk: str, timeout: float) -> Summary | None:
+    """Summarize one chunk of a long page, using the per-chunk cache."""
+    cache_key = _chunk_cache_key(chunk)
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        return Summary(**json.loads(cached))
+    summary = await _invoke_summary_model(_summary_messages(chunk), timeout)
+    if summary is not None:
+        summary_cache.set(cache_key, json.dumps(
+            {"summary": summary.summary, "key_excerpts": summary.key_excerpts}, ensure_ascii=False
+        ))
+    return summary
+
+async def _areduce_summaries(summaries: List[Summary], timeout: float) -> Summary:
+    """Merge chunk summaries hierarchically until a single summary remains.
+
+    Summaries are grouped so each reduce call stays within SUMMARY_REDUCE_TOKENS;
+    groups of a level are merged in parallel. A group whose merge fails is
+    concatenated instead, so no chunk's content is dropped.
+    """
+    while len(summaries) > 1:
+        groups = []
+        group_tokens = 0
+        for summary in summaries:
+            tokens = _summary_tokens(summary)
+            if groups and group_tokens + tokens <= SUMMARY_REDUCE_TOKENS:
+                groups[-1].append(summary)
+                group_tokens += tokens
+            else:
+                groups.append([summary])
+                group_tokens = tokens
+        # Every summary exceeds the budget on its own: merge pairwise so the level still shrinks
+        if len(groups) == len(summaries):
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+
+        async def reduce_group(group: List[Summary]) -> Summary:
+            if len(group) == 1:
+                return group[0]
+            merged = await _invoke_summary_model(_reduce_messages(group), timeout)
+            if merged is not None:
+                return merged
+            return Summary(
+                summary="\n\n".join(summary.summary for summary in group),
+                key_excerpts="\n".join(summary.key_excerpts for summary in group),
+            )
+
+        summaries = list(await asyncio.gather(*[reduce_group(group) for group in groups]))
+    return summaries[0]
 
 def summarize_webpage_content(webpage_content: str) -> str:
     """Summarize webpage content using the configured summarization model.
 
+    Synchronous wrapper around asummarize_webpage_content.
+
     Args:
         webpage_content: Raw webpage content to summarize
 
     Returns:
         Formatted summary with key excerpts
+
+    Raises:
+        SummarizationError: If no part of the page could be summarized
     """
-    try:
-        # Set up structured output model for summarization
-        structured_model = summarization_model.with_structured_output(Summary)
-
-        # Generate summary
-        summary = structured_model.invoke([
-            HumanMessage(content=summarize_webpage_prompt.format(
-                webpage_content=webpage_content, 
-                date=get_today_str()
-            ))
-        ])
-
-        # Format summary with clear structure
-        formatted_summary = (
-            f"<summary>\n{summary.summary}\n</summary>\n\n"
-            f"<key_excerpts>\n{summary.key_excerpts}\n</key_excerpts>"
-        )
+    return run_async(asummarize_webpage_content(webpage_content))
 
-        return formatted_summary
+async def asummarize_webpage_content(webpage_content: str, timeout: float = SUMMARY_TIMEOUT, url: str | None = None) -> str:
+    """Summarize webpage content, splitting long pages into chunks (map-reduce).
 
-    except Exception as e:
-        print(f"Failed to summarize webpage: {str(e)}")
-        return webpage_content[:1000] + "..." if len(webpage_content) > 1000 else webpage_content
+    Pages within SUMMARY_CHUNK_TOKENS are summarized in one call. Longer pages are
+    split into token-sized chunks that are summarized in parallel (each chunk
+    summary is cached) and then merged hierarchically, so the page is covered
+    instead of overflowing the model's context. Only the first MAX_SUMMARY_CHUNKS
+    chunks are summarized. Concurrency is bounded by MAX_CONCURRENT_SUMMARIES and
+    every model call has its own timeout.
+    When url is given, the final summary is cached and a cache hit skips the LLM.
+
+    Failures raise instead of returning fallback content, so callers that cache
+    results (such as the run's dedup index) never store a fallback; the caller
+    decides what to use in place of the summary.
+
+    Args:
+        webpage_content: Raw webpage content to summarize
+        timeout: Timeout in seconds for each summarization call
+        url: Source URL of the page, used as part of the cache key
+
+    Returns:
+        Formatted summary with key excerpts
+
+    Raises:
+        SummarizationError: If no part of the page could be summarized
+    """
+    cache_key = summary_cache_key(url, webpage_content) if url else None
+    if cache_key:
+        cached = summary_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    chunks = split_into_chunks(webpage_content, SUMMARY_CHUNK_TOKENS)
+    if len(chunks) > MAX_SUMMARY_CHUNKS:
+        logger.warning(
+            "Webpage content truncated from %d to %d chunks of %d tokens: %s",
+            len(chunks), MAX_SUMMARY_CHUNKS, SUMMARY_CHUNK_TOKENS, url or "no URL given",
+        )
+        chunks = chunks[:MAX_SUMMARY_CHUNKS]
+    failed = 0
+    if len(chunks) == 1:
+        summary = await _invoke_summary_model(_summary_messages(webpage_content), timeout)
+    else:
+        chunk_summaries = await asyncio.gather(*[_asummarize_chunk(chunk, timeout) for chunk in chunks])
+        failed = sum(summary is None for summary in chunk_summaries)
+        if failed:
+            print(f"Failed to summarize {failed} of {len(chunks)} webpage chunks")
+        chunk_summaries = [summary for summary in chunk_summaries if summary is not None]
+        summary = await _areduce_summaries(chunk_summaries, timeout) if chunk_summaries else None
+
+    if summary is None:
+        raise SummarizationError(f"Failed to summarize webpage: {url or 'no URL given'}")
+    formatted_summary = _format_summary(summary)
+    # Only complete summaries are cached; partial summaries are retried next time
+    if cache_key and not failed:
+        summary_cache.set(cache_key, formatted_summary)
+    return formatted_summary
 
 def format_search_output(summarized_results: dict) -> str:
     """Format search results into a well-structured string output.
@@ -194,13 +609,16 @@ class ConductResearch(BaseModel):
     research_topic: str = Field(
         description="The topic to research. Should be a single topic, and should be described in high detail (at least a paragraph).",
     )
+    priority: int = Field(
+        default=0,
+        description="Optional scheduling priority. Topics with higher priority start first when more topics are requested than can run concurrently.",
+    )
 
 
 writer_model = model
-@tool(parse_docstring=True)
-def refine_draft_report(research_brief: Annotated[str, InjectedToolArg], 
-                        findings: Annotated[str, InjectedToolArg], 
-                        draft_report: Annotated[str, InjectedToolArg]):
+def _refine_draft_report(research_brief: Annotated[str, InjectedToolArg], 
+                         findings: Annotated[str, InjectedToolArg], 
+                         draft_report: Annotated[str, InjectedToolArg]):
     """Refine draft report
 
     Synthesizes all research findings into a comprehensive draft report
@@ -213,7 +631,12 @@ def refine_draft_report(research_brief: Annotated[str, InjectedToolArg],
     Returns:
         refined draft report
     """
+    return run_async(_arefine_draft_report(research_brief, findings, draft_report))
 
+async def _arefine_draft_report(research_brief: Annotated[str, InjectedToolArg], 
+                                findings: Annotated[str, InjectedToolArg], 
+                                draft_report: Annotated[str, InjectedToolArg]):
+    """Async implementation of the refine_draft_report tool."""
     draft_report_prompt = report_generation_with_draft_insight_prompt.format(
         research_brief=research_brief,
         findings=findings,
@@ -221,10 +644,18 @@ def refine_draft_report(research_brief: Annotated[str, InjectedToolArg],
         date=get_today_str()
     )
 
-    draft_report = writer_model.invoke([HumanMessage(content=draft_report_prompt)])
+    draft_report = await writer_model.ainvoke([HumanMessage(content=draft_report_prompt)])
 
     return draft_report.content
 
+# Supports both tool.invoke and tool.ainvoke; supervisor_tools awaits it alongside the research wave
+refine_draft_report = StructuredTool.from_function(
+    func=_refine_draft_report,
+    coroutine=_arefine_draft_report,
+    name="refine_draft_report",
+    parse_docstring=True,
+)
+
 
 #tool
 class ResearchComplete(BaseModel):
@@ -233,8 +664,7 @@ class ResearchComplete(BaseModel):
 
 
 
-@tool(parse_docstring=True)
-def tavily_search(
+def _tavily_search(
     query: str,
     max_results: Annotated[int, InjectedToolArg] = 3,
     topic: Annotated[Literal["general", "news", "finance"], InjectedToolArg] = "general",
@@ -249,8 +679,16 @@ def tavily_search(
     Returns:
         Formatted string of search results with summaries
     """
+    return run_async(_atavily_search(query, max_results=max_results, topic=topic))
+
+async def _atavily_search(
+    query: str,
+    max_results: Annotated[int, InjectedToolArg] = 3,
+    topic: Annotated[Literal["general", "news", "finance"], InjectedToolArg] = "general",
+) -> str:
+    """Async implementation of the tavily_search tool."""
     # Execute search for single query
-    search_results = tavily_search_multiple(
+    search_results = await atavily_search_multiple(
         [query],  # Convert single query to list for the internal function
         max_results=max_results,
         topic=topic,
@@ -260,14 +698,22 @@ def tavily_search(
     # Deduplicate results by URL to avoid processing duplicate content
     unique_results = deduplicate_search_results(search_results)
 
-    # Process results with summarization
-    summarized_results = process_search_results(unique_results)
+    # Process results with summarization (all pages concurrently)
+    summarized_results = await aprocess_search_results(unique_results)
 
     # Format output for consumption
     return format_search_output(summarized_results)
 
+# Supports both tool.invoke and tool.ainvoke; the async path is used by the researcher tool_node
+tavily_search = StructuredTool.from_function(
+    func=_tavily_search,
+    coroutine=_atavily_search,
+    name="tavily_search",
+    parse_docstring=True,
+)
+
 
 if __name__ == "__main__":
-    res=tavily_search("世界排名最高的乒乓球运动员是谁?")
+    res=tavily_search.invoke({"query": "世界排名最高的乒乓球运动员是谁?"})
     print(res)
 
@@ -1,4 +1,7 @@
+import asyncio
+import threading
 from datetime import datetime
+from models import estimate_tokens
 
 def get_today_str() -> str:
     """Get current date in a human-readable format.
@@ -13,4 +16,76 @@ def get_today_str() -> str:
         # Fall back to Windows format if Linux format fails
         return datetime.now().strftime("%a %b %#d, %Y")
 
+def split_into_chunks(text: str, max_tokens: int) -> list[str]:
+    """Split text into chunks of at most max_tokens (estimated), preferring line boundaries.
+
+    Args:
+        text: Text to split
+        max_tokens: Token budget per chunk
+
+    Returns:
+        List of chunks covering the whole text, in order
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for line in text.splitlines(keepends=True):
+        line_tokens = estimate_tokens(line)
+        # Lines longer than a whole chunk are cut into pieces by their average token density
+        while line_tokens > max_tokens:
+            if current:
+                chunks.append("".join(current))
+                current, current_tokens = [], 0
+            cut = max(int(len(line) * max_tokens / line_tokens), 1)
+            chunks.append(line[:cut])
+            line = line[cut:]
+            line_tokens = estimate_tokens(line)
+        if current and current_tokens + line_tokens > max_tokens:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+# Event loop shared by run_async calls made while another loop is running
+_worker_loop = None
+_worker_loop_lock = threading.Lock()
+
+def _get_worker_loop() -> asyncio.AbstractEventLoop:
+    global _worker_loop
+    with _worker_loop_lock:
+        if _worker_loop is None:
+            _worker_loop = asyncio.new_event_loop()
+            threading.Thread(target=_worker_loop.run_forever, name="run-async-worker", daemon=True).start()
+        return _worker_loop
+
+def run_async(coro):
+    """Run a coroutine to completion from synchronous code.
+
+    Uses asyncio.run when no event loop is running in the current thread;
+    otherwise submits the coroutine to one long-lived worker loop running in a
+    daemon thread, so sync wrappers can also be called from inside async code
+    without starting a thread and an event loop per call.
+
+    Args:
+        coro: Coroutine to execute
+
+    Returns:
+        The coroutine's result
+
+    Raises:
+        RuntimeError: If called from a coroutine running on the worker loop itself
+    """
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    worker_loop = _get_worker_loop()
+    if running_loop is worker_loop:
+        coro.close()
+        raise RuntimeError("run_async cannot block the worker loop it would run on")
+    return asyncio.run_coroutine_threadsafe(coro, worker_loop).result()
 
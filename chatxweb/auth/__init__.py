@@ -1 +1 @@
-from .auth_utils import init_authenticator, check_authentication, get_user_roles
\ No newline at end of file
+from .auth_utils import init_authenticator, check_authentication, get_user_roles, get_users_roles
\ No newline at end of file
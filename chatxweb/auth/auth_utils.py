@@ -6,19 +6,20 @@ root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__fil
 sys.path.append(root_dir)
 import streamlit as st
 import streamlit_authenticator as stauth
-import yaml
 import logging
 import time
-from yaml.loader import SafeLoader
+from .user_store import UserStore
 
 # 初始化日志
 logger = logging.getLogger('ChatX-auth')
 
+# 用户信息存储（配置文件变化后才重新解析，写入加锁且原子替换）
+user_store = UserStore(os.path.join(root_dir, 'config.yaml'))
+
 # 读取配置文件
 def load_config():
     try:
-        with open(os.path.join(root_dir, 'config.yaml')) as file:
-            config = yaml.load(file, Loader=SafeLoader)
+        config = user_store.config()
     except Exception as e:
         st.error(e)
         st.stop()
@@ -41,13 +42,11 @@ def init_authenticator():
 
 # 获取用户角色
 def get_user_roles(username: str):
-    config = load_config()
-    user_infos = config['credentials']['usernames'].get(username, {})
-    if 'roles' in user_infos:
-        user_roles = user_infos.get('roles', ['user'])
-    else:
-        user_roles = ['user']
-    return user_roles
+    return user_store.get_roles(username)
+
+# 批量获取用户角色
+def get_users_roles(usernames: list[str]) -> dict:
+    return user_store.get_roles_batch(usernames)
 
 # 全局登录验证：未登录则终止访问
 def check_authentication():
@@ -72,8 +71,8 @@ def check_authentication():
                     config['credentials']['usernames'][username]['email'] = email
                     config['credentials']['usernames'][username]['first_name'] = name
                     config['credentials']['usernames'][username]['last_name'] = name
-                    with open(os.path.join(root_dir, 'config.yaml'), 'w') as file:
-                        yaml.safe_dump(config, file, default_flow_style=False)
+                    # 只写入新注册的用户，避免覆盖其他会话同时进行的修改
+                    user_store.save_user(username, config['credentials']['usernames'][username])
                     tab2_info_holder.success('User registered successfully')
                     logger.info(f'用户：{username} | 注册成功: 新用户 {username} ({name}) 已成功注册，邮箱: {email}')
             except Exception as e:
@@ -0,0 +1,79 @@
+# user_store.py
+# encoding=utf-8
+"""
+用户信息缓存：config.yaml 的内存索引
+
+config.yaml 只在文件变化或写入后重新解析，解析后建立 用户名 -> 角色/资料 索引，
+角色查询不再需要每次完整解析 YAML。用户注册通过 YamlConfigStore 加锁原子写入。
+"""
+import copy
+import threading
+from storage import get_config_store, set_op
+
+# 默认角色
+DEFAULT_ROLES = ['user']
+# 用户资料中不对外暴露的字段
+PRIVATE_FIELDS = ('password',)
+
+
+class UserStore:
+    """按用户名索引的用户角色与资料缓存"""
+
+    def __init__(self, config_path: str):
+        self._file = get_config_store(config_path)
+        self._lock = threading.Lock()
+        self._version = None
+        # 用户名 -> 角色列表
+        self._roles = {}
+        # 用户名 -> 用户资料（不含密码）
+        self._profiles = {}
+
+    def _refresh(self):
+        """配置文件变化后重建用户索引"""
+        data = self._file.data()
+        with self._lock:
+            if self._version == self._file.version:
+                return
+            roles = {}
+            profiles = {}
+            usernames = ((data.get('credentials') or {}).get('usernames')) or {}
+            for username, user_infos in usernames.items():
+                user_infos = user_infos or {}
+                roles[username] = list(user_infos.get('roles') or DEFAULT_ROLES)
+                profiles[username] = {k: v for k, v in user_infos.items() if k not in PRIVATE_FIELDS}
+            self._roles = roles
+            self._profiles = profiles
+            self._version = self._file.version
+
+    def config(self) -> dict:
+        """返回完整配置的副本，调用方可以自由修改（认证器会修改凭据字典）"""
+        return copy.deepcopy(self._file.data())
+
+    def get_roles(self, username: str) -> list:
+        """查询单个用户的角色，用户不存在时返回默认角色"""
+        self._refresh()
+        return list(self._roles.get(username, DEFAULT_ROLES))
+
+    def get_roles_batch(self, usernames) -> dict:
+        """批量查询用户角色，返回 {用户名: 角色列表}"""
+        self._refresh()
+        return {username: list(self._roles.get(username, DEFAULT_ROLES)) for username in usernames}
+
+    def get_profile(self, username: str) -> dict | None:
+        """查询用户资料（不含密码），用户不存在时返回 None"""
+        self._refresh()
+        profile = self._profiles.get(username)
+        return copy.deepcopy(profile) if profile is not None else None
+
+    def get_profiles_batch(self, usernames) -> dict:
+        """批量查询用户资料，返回 {用户名: 用户资料}，不存在的用户不包含在结果中"""
+        self._refresh()
+        return {username: copy.deepcopy(self._profiles[username]) for username in usernames if username in self._profiles}
+
+    def save_user(self, username: str, user_infos: dict):
+        """新增或更新单个用户的凭据信息"""
+        self._file.update([set_op(['credentials', 'usernames', username], user_infos)])
+
+    def invalidate(self):
+        """强制下次访问时重新解析配置文件"""
+        self._file.invalidate()
@@ -0,0 +1,116 @@
+# chat_history.py
+# encoding=utf-8
+"""
+页面对话历史：会话状态与持久化存储之间的桥接
+
+每个聊天区域在 st.session_state[key] 中只保留最近加载的消息，
+消息写入 SQLite 持久化；页面每次重跑只渲染最近一页，
+需要时点击“加载更早的消息”按页从数据库读取。
+"""
+import os
+import sys
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+import streamlit as st
+from storage import ConversationStore
+
+# 每次渲染/加载的消息条数
+PAGE_SIZE = 20
+# 会话状态中最多保留的消息条数（超出部分若已合并进摘要则从内存移除）
+MAX_IN_MEMORY_MESSAGES = 200
+
+# 进程级共享的对话存储
+conversation_store = ConversationStore(os.path.join(root_dir, 'data', 'chatx.db'))
+
+
+def init_history(key: str, username: str, page: str):
+    """首次进入页面时加载用户在该聊天区域的最近一页消息"""
+    if key in st.session_state and f"{key}_conversation" in st.session_state:
+        return
+    conversation = conversation_store.get_active_conversation(username, page)
+    messages = conversation_store.load_messages(conversation["id"], limit=PAGE_SIZE)
+    st.session_state[key] = messages
+    st.session_state[f"{key}_conversation"] = conversation["id"]
+    # 会话状态中第一条消息在完整会话中的位置
+    st.session_state[f"{key}_offset"] = messages[0]["seq"] if messages else conversation["message_count"]
+    st.session_state[f"{key}_visible"] = PAGE_SIZE
+    st.session_state[f"{key}_page"] = page
+
+
+def render_history(key: str):
+    """只渲染最近 visible 条消息，更早的消息通过按钮按页加载"""
+    messages = st.session_state[key]
+    visible = st.session_state[f"{key}_visible"]
+    has_more = len(messages) > visible or st.session_state[f"{key}_offset"] > 0
+    if has_more and st.button("加载更早的消息", key=f"{key}_load_more", type="tertiary"):
+        load_more(key)
+        messages = st.session_state[key]
+        visible = st.session_state[f"{key}_visible"]
+    for message in messages[-visible:]:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+
+def load_more(key: str):
+    """多显示一页消息，内存中不够时从数据库读取更早的一页"""
+    st.session_state[f"{key}_visible"] += PAGE_SIZE
+    missing = st.session_state[f"{key}_visible"] - len(st.session_state[key])
+    offset = st.session_state[f"{key}_offset"]
+    if missing > 0 and offset > 0:
+        older = conversation_store.load_messages(
+            st.session_state[f"{key}_conversation"], before_seq=offset, limit=missing
+        )
+        if older:
+            st.session_state[key] = older + st.session_state[key]
+            st.session_state[f"{key}_offset"] = older[0]["seq"]
+
+
+def ensure_loaded(key: str, from_seq: int):
+    """确保会话状态中包含从 from_seq 开始的消息（例如尚未合并进摘要的消息），最多加载 MAX_IN_MEMORY_MESSAGES 条"""
+    offset = st.session_state[f"{key}_offset"]
+    missing = min(offset - from_seq, MAX_IN_MEMORY_MESSAGES - len(st.session_state[key]))
+    if missing > 0:
+        older = conversation_store.load_messages(
+            st.session_state[f"{key}_conversation"], before_seq=offset, limit=missing
+        )
+        if older:
+            st.session_state[key] = older + st.session_state[key]
+            st.session_state[f"{key}_offset"] = older[0]["seq"]
+
+
+def append_message(key: str, role: str, content: str, keep_from: int | None = None):
+    """追加消息到会话状态并持久化
+
+    keep_from 为会话中仍需保留在内存的最早位置（例如尚未合并进摘要的消息），
+    内存中的消息超过上限时只移除该位置之前的消息。
+    """
+    seq = conversation_store.append_message(st.session_state[f"{key}_conversation"], role, content)
+    st.session_state[key].append({"role": role, "content": content, "seq": seq})
+    messages = st.session_state[key]
+    overflow = len(messages) - MAX_IN_MEMORY_MESSAGES
+    if overflow > 0:
+        if keep_from is not None:
+            overflow = min(overflow, max(keep_from - st.session_state[f"{key}_offset"], 0))
+        if overflow > 0:
+            st.session_state[key] = messages[overflow:]
+            st.session_state[f"{key}_offset"] += overflow
+            st.session_state[f"{key}_visible"] = min(st.session_state[f"{key}_visible"], MAX_IN_MEMORY_MESSAGES)
+
+
+def reset_history(key: str, username: str):
+    """清空对话：归档当前会话并开始新会话"""
+    conversation = conversation_store.new_conversation(username, st.session_state[f"{key}_page"])
+    st.session_state[key] = []
+    st.session_state[f"{key}_conversation"] = conversation["id"]
+    st.session_state[f"{key}_offset"] = 0
+    st.session_state[f"{key}_visible"] = PAGE_SIZE
+
+
+def load_context(key: str) -> dict:
+    """读取当前会话持久化的上下文状态"""
+    return conversation_store.load_context(st.session_state[f"{key}_conversation"])
+
+
+def save_context(key: str, context: dict):
+    """持久化当前会话的上下文状态"""
+    conversation_store.save_context(st.session_state[f"{key}_conversation"], context)
@@ -0,0 +1,197 @@
+# log_analytics.py
+# encoding=utf-8
+"""
+管理员看板的增量日志统计
+
+每次打开看板时，只从上次记录的字节偏移处读取 chatx.log 新增的完整行，
+把事件累加进预聚合计数器（用户统计、功能统计、每日活跃次数），
+计数器和读取偏移一起保存在磁盘上。看板加载耗时与新增日志量相关，
+而与日志总大小无关。日志被轮转（inode 变化）或截断时从新文件开头继续读取，
+已有的计数保留。
+"""
+import json
+import os
+import re
+import sys
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+from storage import file_lock, atomic_write_text
+
+# 统计文件格式版本，统计口径变化时递增，旧的统计文件会被丢弃并重新统计
+STATS_VERSION = 1
+# 单次最多读取的新增日志字节数，超出部分下次打开看板时继续处理
+MAX_READ_BYTES = 64 * 1024 * 1024
+
+# 日志行的正则表达式模式
+login_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) -.*? - INFO - 用户：(\w+) \|登录成功: 用户 (\w+) \((.*?)\) 已成功登录系统')
+logout_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) -.*? - INFO - 用户：(\w+) \| 退出登录')
+homepage_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) -.*? - INFO - 用户：(\w+) \| 访问ChatX主页')
+chat2model_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - ChatX-Chat2Model - INFO - 用户：(\w+) \| 访问Chat2Model:.*?')
+multimodel_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - ChatX-MultiModelChat - INFO - 用户：(\w+) \| 访问MultiModelChat:.*?')
+chat2agent_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - ChatX-Chat2Agent - INFO - 用户：(\w+) \| 访问Chat2Agent:.*?')
+message_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) -.*? - INFO - 用户：(\w+) \|\s*用户.*?输入问题:.*?')
+model_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) -.*? - INFO - 用户：(\w+) \|.*?模型 ([\w-]+) 处理用户请求')
+agent_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) -.*? - INFO - 用户：(\w+) \|.*?调用 (.*?) 处理用户请求')
+
+# 同一行只可能命中这些模式之一，先用关键字过滤，避免每行都跑全部正则
+_line_keywords = ('登录成功', '退出登录', '访问', '输入问题', '处理用户请求')
+
+
+def new_stats() -> dict:
+    """新建空的统计数据：offset/inode 为日志读取位置"""
+    return {
+        'version': STATS_VERSION,
+        'offset': 0,
+        'inode': None,
+        'user_stats': {},
+        'function_stats': {
+            'Chat2Model': {'visits': 0, 'messages': 0, 'models': {}},
+            'MultiModelChat': {'visits': 0, 'messages': 0, 'models': {}},
+            'Chat2Agent': {'visits': 0, 'messages': 0, 'agents': {}}
+        },
+        'daily_user_activities': {},  # 每天每个用户的活跃次数
+    }
+
+
+def _add_activity(stats: dict, timestamp: str, username: str):
+    """统计活跃次数"""
+    date = timestamp.split(' ')[0]
+    activities = stats['daily_user_activities'].setdefault(date, {})
+    activities[username] = activities.get(username, 0) + 1
+
+
+def fold_line(stats: dict, line: str):
+    """把一行日志累加进统计数据"""
+    if not any(keyword in line for keyword in _line_keywords):
+        return
+    user_stats = stats['user_stats']
+    function_stats = stats['function_stats']
+
+    # 处理登录记录
+    login_match = login_pattern.search(line)
+    if login_match:
+        timestamp, _, username, full_name = login_match.groups()
+        if username not in user_stats:
+            user_stats[username] = {
+                'full_name': full_name,
+                'first_login': timestamp,
+                'last_login': timestamp,
+                'login_count': 0,
+                'logout_count': 0,
+                'homepage_visits': 0,
+                'chat2model_visits': 0,
+                'multimodel_visits': 0,
+                'chat2agent_visits': 0,
+                'messages': 0,
+                'models_used': []
+            }
+        user_stats[username]['login_count'] += 1
+        user_stats[username]['last_login'] = timestamp
+        _add_activity(stats, timestamp, username)
+
+    # 处理登出记录
+    logout_match = logout_pattern.search(line)
+    if logout_match:
+        timestamp, username = logout_match.groups()
+        if username in user_stats:
+            user_stats[username]['logout_count'] += 1
+        _add_activity(stats, timestamp, username)
+
+    # 处理主页访问
+    homepage_match = homepage_pattern.search(line)
+    if homepage_match:
+        timestamp, username = homepage_match.groups()
+        if username in user_stats:
+            user_stats[username]['homepage_visits'] += 1
+        _add_activity(stats, timestamp, username)
+
+    # 处理各功能页面访问
+    for pattern, visits_key, func_name in (
+        (chat2model_pattern, 'chat2model_visits', 'Chat2Model'),
+        (multimodel_pattern, 'multimodel_visits', 'MultiModelChat'),
+        (chat2agent_pattern, 'chat2agent_visits', 'Chat2Agent'),
+    ):
+        page_match = pattern.search(line)
+        if page_match:
+            timestamp, username = page_match.groups()
+            if username in user_stats:
+                user_stats[username][visits_key] += 1
+            function_stats[func_name]['visits'] += 1
+            _add_activity(stats, timestamp, username)
+
+    # 处理消息记录
+    message_match = message_pattern.search(line)
+    if message_match:
+        timestamp, username = message_match.groups()
+        if username in user_stats:
+            user_stats[username]['messages'] += 1
+            # 根据日志源判断功能类型
+            if 'Chat2Model' in line:
+                function_stats['Chat2Model']['messages'] += 1
+            elif 'MultiModelChat' in line:
+                function_stats['MultiModelChat']['messages'] += 1
+            elif 'Chat2Agent' in line:
+                function_stats['Chat2Agent']['messages'] += 1
+        _add_activity(stats, timestamp, username)
+
+    # 处理模型使用
+    model_match = model_pattern.search(line)
+    if model_match:
+        timestamp, username, model_name = model_match.groups()
+        if username in user_stats and model_name not in user_stats[username]['models_used']:
+            user_stats[username]['models_used'].append(model_name)
+        # 根据日志源判断功能类型
+        for func_name in ('Chat2Model', 'MultiModelChat'):
+            if func_name in line:
+                models = function_stats[func_name]['models']
+                models[model_name] = models.get(model_name, 0) + 1
+                break
+        _add_activity(stats, timestamp, username)
+
+    # 处理Agent使用
+    agent_match = agent_pattern.search(line)
+    if agent_match and 'Chat2Agent' in line:
+        timestamp, username, agent_name = agent_match.groups()
+        agents = function_stats['Chat2Agent']['agents']
+        agents[agent_name] = agents.get(agent_name, 0) + 1
+        _add_activity(stats, timestamp, username)
+
+
+def _load_stats(stats_path: str) -> dict:
+    try:
+        with open(stats_path, 'r', encoding='utf-8') as f:
+            stats = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return new_stats()
+    if stats.get('version') != STATS_VERSION:
+        return new_stats()
+    return stats
+
+
+def update_stats(log_path: str, stats_path: str) -> dict:
+    """读取日志新增的完整行并累加进磁盘上的统计数据，返回最新统计"""
+    with file_lock(stats_path):
+        stats = _load_stats(stats_path)
+        try:
+            log_stat = os.stat(log_path)
+        except FileNotFoundError:
+            return stats
+        # 日志被轮转或截断时从新文件开头读取
+        if stats['inode'] != log_stat.st_ino or log_stat.st_size < stats['offset']:
+            stats['inode'] = log_stat.st_ino
+            stats['offset'] = 0
+        if log_stat.st_size == stats['offset']:
+            return stats
+
+        with open(log_path, 'rb') as f:
+            f.seek(stats['offset'])
+            data = f.read(MAX_READ_BYTES)
+        # 只处理完整的行，写了一半的最后一行留到下次
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return stats
+        for line in data[:end].decode('utf-8', errors='replace').splitlines():
+            fold_line(stats, line)
+        stats['offset'] += end
+        atomic_write_text(stats_path, json.dumps(stats, ensure_ascii=False))
+        return stats
@@ -2,10 +2,10 @@
 # encoding=utf-8
 import pandas as pd
 import streamlit as st
-import re
 import logging
 import os
 from auth import check_authentication, get_user_roles
+from log_analytics import update_stats
 
 # 确保日志目录存在
 log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
@@ -98,186 +98,13 @@ if 'admin' in roles:
     with st.expander("# 管理员查看用户数据"):
         tab1, tab2 = st.tabs(["**功能统计**", "**用户统计**"])    
         
-        # 解析日志文件
-        # 读取日志文件
+        # 增量统计日志：只处理上次统计之后新增的日志行，统计结果保存在磁盘上
         log_file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs', 'chatx.log')
-        
-        # 定义正则表达式模式
-        login_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) -.*? - INFO - 用户：(\w+) \|登录成功: 用户 (\w+) \((.*?)\) 已成功登录系统')
-        logout_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) -.*? - INFO - 用户：(\w+) \| 退出登录')
-        homepage_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) -.*? - INFO - 用户：(\w+) \| 访问ChatX主页')
-        chat2model_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - ChatX-Chat2Model - INFO - 用户：(\w+) \| 访问Chat2Model:.*?')
-        multimodel_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - ChatX-MultiModelChat - INFO - 用户：(\w+) \| 访问MultiModelChat:.*?')
-        chat2agent_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - ChatX-Chat2Agent - INFO - 用户：(\w+) \| 访问Chat2Agent:.*?')
-        message_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) -.*? - INFO - 用户：(\w+) \|\s*用户.*?输入问题:.*?')
-        model_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) -.*? - INFO - 用户：(\w+) \|.*?模型 ([\w-]+) 处理用户请求')
-        agent_pattern = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) -.*? - INFO - 用户：(\w+) \|.*?调用 (.*?) 处理用户请求')
-        
-        # 初始化数据结构
-        user_stats = {}
-        function_stats = {
-            'Chat2Model': {'visits': 0, 'messages': 0, 'models': {}},
-            'MultiModelChat': {'visits': 0, 'messages': 0, 'models': {}},
-            'Chat2Agent': {'visits': 0, 'messages': 0, 'agents': {}}
-        }
-        daily_user_activities = {}  # 用于统计每天每个用户的活跃次数
-        
-        # 解析日志
-        with open(log_file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                # 处理登录记录
-                login_match = login_pattern.search(line)
-                if login_match:
-                    timestamp, username, username, full_name = login_match.groups()
-                    if username not in user_stats:
-                        user_stats[username] = {
-                            'full_name': full_name,
-                            'first_login': timestamp,
-                            'last_login': timestamp,
-                            'login_count': 0,
-                            'logout_count': 0,
-                            'homepage_visits': 0,
-                            'chat2model_visits': 0,
-                            'multimodel_visits': 0,
-                            'chat2agent_visits': 0,
-                            'messages': 0,
-                            'models_used': set()
-                        }
-                    user_stats[username]['login_count'] += 1
-                    user_stats[username]['last_login'] = timestamp
-                    # 统计活跃次数
-                    date = timestamp.split(' ')[0]
-                    if date not in daily_user_activities:
-                        daily_user_activities[date] = {}
-                    if username not in daily_user_activities[date]:
-                        daily_user_activities[date][username] = 0
-                    daily_user_activities[date][username] += 1
-                
-                # 处理登出记录
-                logout_match = logout_pattern.search(line)
-                if logout_match:
-                    timestamp, username = logout_match.groups()
-                    if username in user_stats:
-                        user_stats[username]['logout_count'] += 1
-                    # 统计活跃次数
-                    date = timestamp.split(' ')[0]
-                    if date not in daily_user_activities:
-                        daily_user_activities[date] = {}
-                    if username not in daily_user_activities[date]:
-                        daily_user_activities[date][username] = 0
-                    daily_user_activities[date][username] += 1
-                
-                # 处理主页访问
-                homepage_match = homepage_pattern.search(line)
-                if homepage_match:
-                    timestamp, username = homepage_match.groups()
-                    if username in user_stats:
-                        user_stats[username]['homepage_visits'] += 1
-                    # 统计活跃次数
-                    date = timestamp.split(' ')[0]
-                    if date not in daily_user_activities:
-                        daily_user_activities[date] = {}
-                    if username not in daily_user_activities[date]:
-                        daily_user_activities[date][username] = 0
-                    daily_user_activities[date][username] += 1
-                
-                # 处理Chat2Model访问
-                chat2model_match = chat2model_pattern.search(line)
-                if chat2model_match:
-                    timestamp, username = chat2model_match.groups()
-                    if username in user_stats:
-                        user_stats[username]['chat2model_visits'] += 1
-                    function_stats['Chat2Model']['visits'] += 1
-                    # 统计活跃次数
-                    date = timestamp.split(' ')[0]
-                    if date not in daily_user_activities:
-                        daily_user_activities[date] = {}
-                    if username not in daily_user_activities[date]:
-                        daily_user_activities[date][username] = 0
-                    daily_user_activities[date][username] += 1
-                
-                # 处理MultiModelChat访问
-                multimodel_match = multimodel_pattern.search(line)
-                if multimodel_match:
-                    timestamp, username = multimodel_match.groups()
-                    if username in user_stats:
-                        user_stats[username]['multimodel_visits'] += 1
-                    function_stats['MultiModelChat']['visits'] += 1
-                    # 统计活跃次数
-                    date = timestamp.split(' ')[0]
-                    if date not in daily_user_activities:
-                        daily_user_activities[date] = {}
-                    if username not in daily_user_activities[date]:
-                        daily_user_activities[date][username] = 0
-                    daily_user_activities[date][username] += 1
-                
-                # 处理Chat2Agent访问
-                chat2agent_match = chat2agent_pattern.search(line)
-                if chat2agent_match:
-                    timestamp, username = chat2agent_match.groups()
-                    if username in user_stats:
-                        user_stats[username]['chat2agent_visits'] += 1
-                    function_stats['Chat2Agent']['visits'] += 1
-                    # 统计活跃次数
-                    date = timestamp.split(' ')[0]
-                    if date not in daily_user_activities:
-                        daily_user_activities[date] = {}
-                    if username not in daily_user_activities[date]:
-                        daily_user_activities[date][username] = 0
-                    daily_user_activities[date][username] += 1
-                
-                # 处理消息记录
-                message_match = message_pattern.search(line)
-                if message_match:
-                    timestamp, username = message_match.groups()
-                    if username in user_stats:
-                        user_stats[username]['messages'] += 1
-                        # 根据日志源判断功能类型
-                        if 'Chat2Model' in line:
-                            function_stats['Chat2Model']['messages'] += 1
-                        elif 'MultiModelChat' in line:
-                            function_stats['MultiModelChat']['messages'] += 1
-                        elif 'Chat2Agent' in line:
-                            function_stats['Chat2Agent']['messages'] += 1
-                    # 统计活跃次数
-                    date = timestamp.split(' ')[0]
-                    if date not in daily_user_activities:
-                        daily_user_activities[date] = {}
-                    if username not in daily_user_activities[date]:
-                        daily_user_activities[date][username] = 0
-                    daily_user_activities[date][username] += 1
-                
-                # 处理模型使用
-                model_match = model_pattern.search(line)
-                if model_match:
-                    timestamp, username, model_name = model_match.groups()
-                    if username in user_stats:
-                        user_stats[username]['models_used'].add(model_name)
-                    # 根据日志源判断功能类型
-                    if 'Chat2Model' in line:
-                        function_stats['Chat2Model']['models'][model_name] = function_stats['Chat2Model']['models'].get(model_name, 0) + 1
-                    elif 'MultiModelChat' in line:
-                        function_stats['MultiModelChat']['models'][model_name] = function_stats['MultiModelChat']['models'].get(model_name, 0) + 1
-                    # 统计活跃次数
-                    date = timestamp.split(' ')[0]
-                    if date not in daily_user_activities:
-                        daily_user_activities[date] = {}
-                    if username not in daily_user_activities[date]:
-                        daily_user_activities[date][username] = 0
-                    daily_user_activities[date][username] += 1
-                
-                # 处理Agent使用
-                agent_match = agent_pattern.search(line)
-                if agent_match and 'Chat2Agent' in line:
-                    timestamp, username, agent_name = agent_match.groups()
-                    function_stats['Chat2Agent']['agents'][agent_name] = function_stats['Chat2Agent']['agents'].get(agent_name, 0) + 1
-                    # 统计活跃次数
-                    date = timestamp.split(' ')[0]
-                    if date not in daily_user_activities:
-                        daily_user_activities[date] = {}
-                    if username not in daily_user_activities[date]:
-                        daily_user_activities[date][username] = 0
-                    daily_user_activities[date][username] += 1
+        stats_file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs', 'chatx_stats.json')
+        log_stats = update_stats(log_file_path, stats_file_path)
+        user_stats = log_stats['user_stats']
+        function_stats = log_stats['function_stats']
+        daily_user_activities = log_stats['daily_user_activities']  # 每天每个用户的活跃次数
         
         # 准备用户访问表数据
         user_access_data = []
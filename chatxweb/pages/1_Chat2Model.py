@@ -4,19 +4,22 @@ ChatX UI：基于Streamlit框架的Web应用，用于与大模型进行交互。
 # encoding=utf-8
 import os
 import sys
-import time
 import logging
 
 root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(root_dir)
 
 import streamlit as st
-from models import init_model, get_available_models
+from models import init_model, get_available_models, stream_chat, ConversationContext, get_context_budget, new_context_state
 from auth import check_authentication
+from chat_history import init_history, ensure_loaded, render_history, append_message, reset_history, load_context, save_context
 
 # 初始化日志
 logger = logging.getLogger('ChatX-Chat2Model')
 
+# 流式输出时界面每秒最多刷新的次数
+RENDER_FPS = 15
+
 
 # 设置页面配置
 st.set_page_config(
@@ -110,7 +113,8 @@ with st.sidebar:
   
     # 清空对话按钮
     if st.button("清空对话", width='stretch'):
-        st.session_state["messages"] = []
+        reset_history("messages", username)
+        st.session_state["chat2model_context"] = new_context_state()
         logger.info(f'用户：{username} |用户 {st.session_state.get("username", "未知用户")} 清空了对话历史')
 
     st.markdown("---")
@@ -133,13 +137,13 @@ model_option = st.selectbox(
     width=300,
 )
 
-# 初始化会话状态
-if "messages" not in st.session_state:
-    st.session_state["messages"] = []
-# 消息大于等于200条强制清空
-if len(st.session_state["messages"]) >= 200:
-    st.session_state["messages"] = []
-    st.warning("对话轮数超过100轮，强制清空历史消息！")
+# 初始化会话状态：从对话存储加载最近一页消息
+init_history("messages", username, "chat2model")
+# 多轮对话上下文状态（早期对话摘要），随会话持久化
+if "chat2model_context" not in st.session_state:
+    st.session_state["chat2model_context"] = load_context("messages") or new_context_state()
+    # 尚未合并进摘要的消息需要参与组装上下文
+    ensure_loaded("messages", st.session_state["chat2model_context"]["covered"])
 # 初始化或更新模型选项
 if "model_option" not in st.session_state:
     st.session_state["model_option"] = model_option
@@ -159,17 +163,15 @@ st.session_state["model"] = init_model(
 # 聊天历史区域 - 创建独立的滚动容器
 model_messages_container = st.container(height=300, key="chat2model_messages_container")
 with model_messages_container:
-    # 聊天历史区域 - 按顺序显示每条消息
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+    # 聊天历史区域 - 只渲染最近一页消息，更早的消息按需加载
+    render_history("messages")
 
 ## 用户输入框
 prompt = st.chat_input("请输入您的问题...",key="main_chat_input")
 
 if prompt:
     # 添加用户消息到会话状态
-    st.session_state["messages"].append({"role": "user", "content": prompt})
+    append_message("messages", "user", prompt, keep_from=st.session_state["chat2model_context"]["covered"])
     logger.info(f'用户：{username} |用户 {st.session_state.get("username", "未知用户")} 输入问题: {prompt[:50]}... (完整长度: {len(prompt)} 字符)')
 
     with model_messages_container:
@@ -182,20 +184,30 @@ if prompt:
             message_placeholder = st.empty()
             full_response = ""
             
-            # 模拟打字效果
+            # 流式输出：模型每生成一段内容就按帧率刷新一次
             try:
                 # 调用模型获取回复
                 if st.session_state.model:
                     logger.info(f'用户：{username} |调用模型 {st.session_state["model_option"]} 处理用户请求')
-                    response = st.session_state.model.invoke(prompt)
-                    
-                    # 模拟打字效果
-                    for chunk in response.content.split(" "):
-                        full_response += chunk + " "
-                        time.sleep(0.05)
-                        message_placeholder.markdown(full_response + "▌")
-                    message_placeholder.markdown(full_response)
+                    # 在模型的 token 预算内组装多轮对话上下文（不含刚加入的本轮问题）
+                    context = ConversationContext(
+                        st.session_state.model,
+                        budget=get_context_budget(st.session_state["model_option"]),
+                        state=st.session_state["chat2model_context"],
+                    )
+                    request_messages = context.build(
+                        st.session_state["messages"][:-1], prompt, offset=st.session_state["messages_offset"]
+                    )
+                    save_context("messages", st.session_state["chat2model_context"])
+                    full_response, stream_stats = stream_chat(
+                        st.session_state.model,
+                        request_messages,
+                        on_update=lambda text, done: message_placeholder.markdown(text if done else text + "▌"),
+                        render_fps=RENDER_FPS,
+                    )
                     logger.info(f'用户：{username} |模型 {st.session_state["model_option"]} 成功返回响应 (长度: {len(full_response)} 字符)')
+                    ttft = f'{stream_stats["ttft"]:.2f}s' if stream_stats["ttft"] is not None else "N/A"
+                    logger.info(f'用户：{username} |模型 {st.session_state["model_option"]} 流式统计: 首字延迟 {ttft}, 总耗时 {stream_stats["elapsed"]:.2f}s, 输出 {stream_stats["output_tokens"]} tokens, {stream_stats["tokens_per_s"]:.1f} tokens/s')
                 else:
                     message_placeholder.error("模型初始化失败，请检查配置")
                     full_response = "模型初始化失败，请检查配置"
@@ -206,5 +218,5 @@ if prompt:
                 logger.error(f'用户：{username} |模型请求失败: {st.session_state["model_option"]} 模型处理用户请求时发生错误 - {e}')
     
     # 添加助手回复到会话状态
-    st.session_state.messages.append({"role": "assistant", "content": full_response})
+    append_message("messages", "assistant", full_response, keep_from=st.session_state["chat2model_context"]["covered"])
     
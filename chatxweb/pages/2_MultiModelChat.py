@@ -1,15 +1,22 @@
 # encoding=utf-8
-import streamlit as st
-import time
-import asyncio
+import io
 import logging
-from concurrent.futures import ThreadPoolExecutor
-from models import init_model, get_available_models
+import pandas as pd
+import streamlit as st
+from models import init_model, get_available_models, fan_out_stream, get_provider, estimate_cost, estimate_tokens
 from auth import check_authentication
+from chat_history import init_history, render_history, append_message, reset_history
 
 # 初始化日志
 logger = logging.getLogger('ChatX-MultiModelChat')
 
+# 流式输出时每列界面每秒最多刷新的次数
+RENDER_FPS = 10
+# 最多同时对比的模型数量
+MAX_COMPARE_MODELS = 20
+# 每行展示的聊天列数
+COLUMNS_PER_ROW = 3
+
 
 # 设置页面配置
 st.set_page_config(
@@ -55,24 +62,22 @@ def custom_page_style():
     st.markdown(custom_style, unsafe_allow_html=True)
 
 # 初始化列布局和状态
-def init_column(col, col_key):
+def init_column(col, col_key, model_list, index):
     with col:
         st.markdown(f"{col_key} 聊天区域")
-        # 获取可用模型列表
-        model_list = get_available_models(username).keys()
-        # 模型选择控件 - 放在容器外部，不会被滚动影响
+        # 模型选择控件 - 放在容器外部，不会被滚动影响；各列默认选择不同的模型
         model_option = st.selectbox(
             "选择模型：",
             model_list,
+            index=min(index, len(model_list) - 1) if model_list else None,
             key=f"{col_key}_model_select",
             placeholder="请选择一个模型...",
             label_visibility="visible",
             width=300,
         )
 
-        # 初始化会话状态
-        if f"{col_key}_messages" not in st.session_state:
-            st.session_state[f"{col_key}_messages"] = []
+        # 初始化会话状态：从对话存储加载该列最近一页消息
+        init_history(f"{col_key}_messages", username, f"multimodel_{col_key}")
         
         # 初始化或更新模型选项
         if f"{col_key}_model_option" not in st.session_state:
@@ -93,75 +98,108 @@ def init_column(col, col_key):
         # 聊天历史区域 - 创建独立的滚动容器
         st.session_state[f"{col_key}_messages_container"] = st.container(height=300,key=f"{col_key}_messages_container")
         with st.session_state[f"{col_key}_messages_container"]:
-            # 显示聊天历史
-            for message in st.session_state[f"{col_key}_messages"]:
-                with st.chat_message(message["role"]):
-                    st.markdown(message["content"])
-
-# 初始化线程池用于异步模型调用
-executor = ThreadPoolExecutor(max_workers=3)
-# 辅助函数：异步获取模型回复
-async def get_model_response_async(model_instance, prompt):
-    """异步获取模型回复"""
-    loop = asyncio.get_event_loop()
-    try:
-        if model_instance:
-            # 使用线程池异步调用模型
-            response = await loop.run_in_executor(
-                executor, 
-                lambda: model_instance.invoke(prompt)
-            )
-            return response.content
-        else:
-            return "模型初始化失败，请检查配置"
-    except Exception as e:
-        return f"请求失败: {e}"
+            # 显示聊天历史：只渲染最近一页，更早的消息按需加载
+            render_history(f"{col_key}_messages")
 
-# 列对话处理
-async def handle_column_chat(col, col_key, prompt):
-    with col:
-        # 添加用户消息到会话状态
-        st.session_state[f"{col_key}_messages"].append({"role": "user", "content": prompt})
-        
-        # 在聊天历史区域内显示
-        with st.session_state[f"{col_key}_messages_container"]:
-            # 显示用户消息
-            with st.chat_message("user"):
-                st.markdown(prompt)
+# 多列并发对话处理：同一问题同时分发给所有列的模型，各列独立流式刷新
+def handle_columns_chat(columns, col_keys, prompt, max_concurrency):
+    placeholders = {}
+    jobs = {}
+    providers = {}
+    results = st.session_state["multimodel_results"]
+    round_index = results[-1]["轮次"] + 1 if results else 1
+    for col, col_key in zip(columns, col_keys):
+        with col:
+            # 添加用户消息到会话状态
+            append_message(f"{col_key}_messages", "user", prompt)
             
-            # 显示助手回复
-            with st.chat_message("assistant"):
-                message_placeholder = st.empty()
-                full_response = ""
-                
-                # 模拟打字效果
-                try:
-                    # 调用模型获取回复
-                    if st.session_state[f"{col_key}_model"]:
-                        logger.info(f'用户：{username} | 用户 {st.session_state.get("username", "未知用户")} 在 {col_key} 中输入问题: {prompt[:50]}... (完整长度: {len(prompt)} 字符)')
-                        logger.info(f'用户：{username} | 调用 {col_key} 中的模型 {st.session_state[f"{col_key}_model_option"]} 处理用户请求')
-                        res_content = await get_model_response_async(
-                            st.session_state[f"{col_key}_model"], 
-                            prompt
-                        )
-                        
-                        # 模拟打字效果
-                        for chunk in res_content.split(" "):
-                            full_response += chunk + " "
-                            time.sleep(0.05)
-                            message_placeholder.markdown(full_response + "▌")
-                        message_placeholder.markdown(full_response)
-                        logger.info(f'用户：{username} | {col_key} 中的模型 {st.session_state[f"{col_key}_model_option"]} 成功返回响应 (长度: {len(full_response)} 字符)')
-                    else:
-                        message_placeholder.error("模型初始化失败，请检查配置")
-                        full_response = "模型初始化失败，请检查配置"
-                        logger.error(f'用户：{username} | {col_key} 中的模型初始化失败: 用户 {st.session_state.get("username", "未知用户")} 尝试使用 {st.session_state[f"{col_key}_model_option"]} 模型但失败')
-                except Exception as e:
-                    message_placeholder.error(f"请求失败: {e}")
-                    full_response = f"请求失败: {e}"
-                    logger.error(f'用户：{username} | {col_key} 中的模型请求失败: {st.session_state[f"{col_key}_model_option"]} 模型处理用户请求时发生错误 - {e}')
-        # 添加助手回复到会话状态
-        st.session_state[f"{col_key}_messages"].append({"role": "assistant", "content": full_response})
+            # 在聊天历史区域内显示
+            with st.session_state[f"{col_key}_messages_container"]:
+                # 显示用户消息
+                with st.chat_message("user"):
+                    st.markdown(prompt)
+                # 显示助手回复占位
+                with st.chat_message("assistant"):
+                    placeholders[col_key] = st.empty()
+
+        if st.session_state[f"{col_key}_model"]:
+            logger.info(f'用户：{username} | 用户 {st.session_state.get("username", "未知用户")} 在 {col_key} 中输入问题: {prompt[:50]}... (完整长度: {len(prompt)} 字符)')
+            logger.info(f'用户：{username} | 调用 {col_key} 中的模型 {st.session_state[f"{col_key}_model_option"]} 处理用户请求')
+            jobs[col_key] = (st.session_state[f"{col_key}_model"], prompt)
+            providers[col_key] = get_provider(st.session_state[f"{col_key}_model_option"])
+        else:
+            placeholders[col_key].error("模型初始化失败，请检查配置")
+            append_message(f"{col_key}_messages", "assistant", "模型初始化失败，请检查配置")
+            logger.error(f'用户：{username} | {col_key} 中的模型初始化失败: 用户 {st.session_state.get("username", "未知用户")} 尝试使用 {st.session_state[f"{col_key}_model_option"]} 模型但失败')
+
+    # 所有模型并发生成（受最大并发数和服务商限流约束），哪一列有新内容就刷新哪一列
+    for event, col_key, text, info in fan_out_stream(jobs, render_fps=RENDER_FPS, max_concurrency=max_concurrency, providers=providers):
+        if event == "update":
+            placeholders[col_key].markdown(text + "▌")
+        elif event == "done":
+            placeholders[col_key].markdown(text)
+            logger.info(f'用户：{username} | {col_key} 中的模型 {st.session_state[f"{col_key}_model_option"]} 成功返回响应 (长度: {len(text)} 字符)')
+            ttft = f'{info["ttft"]:.2f}s' if info["ttft"] is not None else "N/A"
+            logger.info(f'用户：{username} | {col_key} 中的模型 {st.session_state[f"{col_key}_model_option"]} 流式统计: 首字延迟 {ttft}, 总耗时 {info["elapsed"]:.2f}s, 输出 {info["output_tokens"]} tokens, {info["tokens_per_s"]:.1f} tokens/s')
+            # 添加助手回复到会话状态
+            append_message(f"{col_key}_messages", "assistant", text)
+            st.session_state["multimodel_results"].append(build_result_row(round_index, col_key, prompt, "成功", info))
+        elif event == "error":
+            placeholders[col_key].error(f"请求失败: {info}")
+            logger.error(f'用户：{username} | {col_key} 中的模型请求失败: {st.session_state[f"{col_key}_model_option"]} 模型处理用户请求时发生错误 - {info}')
+            append_message(f"{col_key}_messages", "assistant", f"请求失败: {info}")
+            st.session_state["multimodel_results"].append(build_result_row(round_index, col_key, prompt, "失败", None))
+
+# 生成对比结果表的一行：延迟、token 数和费用
+def build_result_row(round_index, col_key, prompt, status, stream_stats):
+    model_option = st.session_state[f"{col_key}_model_option"]
+    stream_stats = stream_stats or {}
+    input_tokens = stream_stats.get("input_tokens") or estimate_tokens(prompt)
+    output_tokens = stream_stats.get("output_tokens", 0)
+    cost = estimate_cost(model_option, input_tokens, output_tokens)
+    return {
+        "轮次": round_index,
+        "列": col_key,
+        "模型": model_option,
+        "状态": status,
+        "首字延迟(s)": round(stream_stats["ttft"], 3) if stream_stats.get("ttft") is not None else None,
+        "总耗时(s)": round(stream_stats["elapsed"], 3) if "elapsed" in stream_stats else None,
+        "输入tokens": input_tokens,
+        "输出tokens": output_tokens,
+        "tokens/s": round(stream_stats.get("tokens_per_s", 0.0), 1),
+        "费用(元)": round(cost, 6) if cost is not None else None,
+    }
+
+# 对比结果表：展示并支持导出 CSV/Parquet
+def show_results_grid():
+    results = st.session_state["multimodel_results"]
+    if not results:
+        return
+    with st.expander("📊 模型对比结果", expanded=True):
+        results_df = pd.DataFrame(results)
+        st.dataframe(results_df, width="stretch", hide_index=True)
+        if results_df["费用(元)"].isna().any():
+            st.caption("费用为空表示该模型未配置价格，可在模型注册页面填写输入/输出价格")
+        col_csv, col_parquet = st.columns(2)
+        col_csv.download_button(
+            label="导出CSV",
+            data=results_df.to_csv(index=False).encode("utf-8-sig"),
+            file_name="model_comparison.csv",
+            mime="text/csv",
+            width="stretch",
+        )
+        try:
+            parquet_buffer = io.BytesIO()
+            results_df.to_parquet(parquet_buffer, index=False)
+            col_parquet.download_button(
+                label="导出Parquet",
+                data=parquet_buffer.getvalue(),
+                file_name="model_comparison.parquet",
+                mime="application/octet-stream",
+                width="stretch",
+            )
+        except ImportError:
+            col_parquet.caption("导出Parquet需要安装 pyarrow")
 
 
 
@@ -218,11 +256,29 @@ with st.sidebar:
         )
     st.session_state["temperature"] = temperature
     
+    st.markdown("---")
+    # 对比模型数量和并发控制
+    column_count = st.number_input(
+        "对比模型数量：",
+        min_value=1,
+        max_value=MAX_COMPARE_MODELS,
+        value=3,
+        step=1
+    )
+    max_concurrency = st.slider(
+        "最大并发请求数：",
+        min_value=1,
+        max_value=10,
+        value=4,
+        step=1
+    )
     
     # 清空对话按钮
     if st.button("清空对话", width='stretch'):
-        for col_key in ["col1", "col2", "col3"]:
-            st.session_state[f"{col_key}_messages"] = []
+        for col_index in range(MAX_COMPARE_MODELS):
+            if f"col{col_index + 1}_messages_conversation" in st.session_state:
+                reset_history(f"col{col_index + 1}_messages", username)
+        st.session_state["multimodel_results"] = []
         logger.info(f'用户：{username} | 用户 {st.session_state.get("username", "未知用户")} 清空了多模型聊天的所有对话历史')
 
     st.markdown("---")
@@ -235,18 +291,21 @@ with st.sidebar:
 st.markdown("<h1 style='text-align: center; color: #2c3e50; margin: 0px;'>💬 MultiModelChat聊天助手</h1>", unsafe_allow_html=True)
 st.markdown("<div style='background: linear-gradient(90deg, #3498db, #2ecc71); height: 3px; margin-bottom: 10px; border-radius: 2px;'></div>", unsafe_allow_html=True)
 ## 3.2 聊天区域
-col1, col2, col3 = st.columns([1,1,1], gap="medium",border=True)
-columns = [col1, col2, col3]
-col_keys = ["col1", "col2", "col3"]
+if "multimodel_results" not in st.session_state:
+    st.session_state["multimodel_results"] = []
+col_keys = [f"col{i + 1}" for i in range(column_count)]
+columns = []
+for row_start in range(0, column_count, COLUMNS_PER_ROW):
+    columns.extend(st.columns(COLUMNS_PER_ROW, gap="medium", border=True)[:min(COLUMNS_PER_ROW, column_count - row_start)])
+# 获取可用模型列表
+model_list = list(get_available_models(username).keys())
 
-for col, col_key in zip(columns, col_keys):
-    init_column(col, col_key)
-    # 强制清空对话
-    if len(st.session_state[f"{col_key}_messages"])>=200:
-        st.session_state[f"{col_key}_messages"] = []
-        st.warning("对话轮数超过100轮，强制清空历史消息！")
+for index, (col, col_key) in enumerate(zip(columns, col_keys)):
+    init_column(col, col_key, model_list, index)
 
 ## 3.3 聊天输入框
 if prompt := st.chat_input("请输入您的问题..."):
-    for col, col_key in zip(columns, col_keys):
-        asyncio.run(handle_column_chat(col, col_key, prompt))
+    handle_columns_chat(columns, col_keys, prompt, max_concurrency)
+
+## 3.4 对比结果
+show_results_grid()
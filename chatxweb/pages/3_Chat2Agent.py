@@ -6,15 +6,16 @@ import os
 import sys
 import time
 import logging
-import asyncio
 
 root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(root_dir)
 
 import streamlit as st
 from models import init_model
-from agents import QAAgent, Name_Agent, Sophon
+from agents import QAAgent, Name_Agent, Sophon, sophon_resumable, research_jobs
 from auth import check_authentication
+from storage.job_store import ACTIVE_JOB_STATUSES, RESUMABLE_JOB_STATUSES, JOB_SUCCEEDED
+from chat_history import init_history, render_history, append_message, reset_history, load_context, save_context
 
 # 初始化日志
 logger = logging.getLogger('ChatX-Chat2Agent')
@@ -81,7 +82,7 @@ with st.sidebar:
         )
     # 清空对话按钮
     if st.button("清空对话", width='stretch'):
-        st.session_state["agent_messages"] = []
+        reset_history("agent_messages", username)
         logger.info(f'用户：{username} | 用户 {st.session_state.get("username", "未知用户")} 清空了Agent对话历史')
     
     st.markdown("---")
@@ -104,22 +105,89 @@ agent_option = st.selectbox(
 )
 if agent_option == "起网名Agent":
     st.warning("本Agent响应可能耗费20分钟左右的时间，请耐心等待。")
-elif agent_option =="深度研究Agent":
+
+# 初始化会话状态：从对话存储加载最近一页消息
+init_history("agent_messages", username, "chat2agent")
+
+# 深度研究任务在后台线程中执行，页面只按任务ID轮询进度：页面重跑、刷新浏览器都不影响任务
+RESEARCH_POLL_INTERVAL = 3
+# 最终报告流式生成期间的刷新间隔（秒）
+REPORT_POLL_INTERVAL = 1
+JOB_STATUS_LABELS = {
+    "queued": "排队中",
+    "running": "执行中",
+    "succeeded": "已完成",
+    "failed": "失败",
+    "cancelled": "已取消",
+    "interrupted": "已中断",
+}
+
+def research_job_panel(job_id: str | None, poll_interval: float | None):
+    """深度研究任务面板：显示任务进度、各节点耗时和生成中的报告，提供报告下载、取消和继续研究"""
+    job = research_jobs.store.get_job(job_id) if job_id else None
+    # 最终报告生成中：任务的 result 字段是已生成的部分报告
+    streaming_report = job["result"] if job and job["status"] in ACTIVE_JOB_STATUSES else ""
     col1, col2 = st.columns([2,1],gap="large")
     with col1:
-        with st.status("深度研究执行时间较长，大约需要30分钟至1小时。当前执行状态如下：", expanded=True) as status:
-            status.write("让我们开始研究吧，请在输入框输入您的问题。")
+        if job is None:
+            with st.status("深度研究执行时间较长，大约需要30分钟至1小时。当前执行状态如下：", expanded=True) as status:
+                status.write("让我们开始研究吧，请在输入框输入您的问题。")
+        else:
+            if job["status"] in ACTIVE_JOB_STATUSES:
+                state = "running"
+            elif job["status"] == JOB_SUCCEEDED:
+                state = "complete"
+            else:
+                state = "error"
+            label = f"深度研究任务{JOB_STATUS_LABELS[job['status']]}：{job['query'][:30]}"
+            with st.status(label, state=state, expanded=job["status"] in ACTIVE_JOB_STATUSES) as status:
+                for event in research_jobs.store.load_events(job_id):
+                    status.write(event["message"])
+                if job["trace"]:
+                    status.write("各节点执行耗时：")
+                    status.code(job["trace"], language=None)
+            if streaming_report:
+                # 增量渲染已生成的报告内容
+                with st.container(height=400, key="research_report_stream"):
+                    st.markdown(streaming_report + "▌")
     with col2:
-        btn_holder=st.empty()
-        btn_holder.download_button(label="下载报告",data="",file_name="report.md",mime="text/markdown",icon=":material/download:",disabled=True)
-
-# 初始化会话状态
-if "agent_messages" not in st.session_state:
-    st.session_state["agent_messages"] = []
-# 消息大于等于200条强制清空
-if len(st.session_state["agent_messages"]) >= 200:
-    st.session_state["agent_messages"] = []
-    st.warning("对话轮数超过100轮，强制清空历史消息！")
+        report = job["result"] if job and job["status"] == JOB_SUCCEEDED else streaming_report
+        st.download_button(label="下载报告（生成中）" if streaming_report else "下载报告",data=report,file_name="report.md",mime="text/markdown",icon=":material/download:",disabled=not report)
+        if job and job["status"] in ACTIVE_JOB_STATUSES:
+            if st.button("取消研究", icon=":material/stop:"):
+                research_jobs.cancel(job_id)
+                logger.info(f'用户：{username} | 取消深度研究任务: {job_id}')
+        elif job and job["status"] in RESUMABLE_JOB_STATUSES and sophon_resumable(job["thread_id"]):
+            # 检查点保存在磁盘上：已完成的节点和子研究结果不会重复执行
+            if st.button("继续未完成的研究", icon=":material/play_arrow:"):
+                try:
+                    research_jobs.resume(job_id)
+                    logger.info(f'用户：{username} | 继续深度研究任务: {job_id}')
+                    st.rerun()
+                except ValueError as e:
+                    # 其他页面已经继续了该任务
+                    st.warning(str(e))
+    # 报告开始流式生成后整页重跑一次，切换到更短的刷新间隔
+    if streaming_report and poll_interval != REPORT_POLL_INTERVAL:
+        st.rerun()
+    # 任务结束后把报告写入对话（多个页面同时打开时也只写入一次），并整页重跑以停止轮询
+    if job and job["status"] not in ACTIVE_JOB_STATUSES and research_jobs.store.mark_delivered(job_id):
+        if job["status"] == JOB_SUCCEEDED:
+            append_message("agent_messages", "assistant", job["result"])
+            logger.info(f'用户：{username} | 深度研究Agent 成功返回响应 (长度: {len(job["result"])} 字符)')
+        else:
+            append_message("agent_messages", "assistant", f"深度研究任务{JOB_STATUS_LABELS[job['status']]}: {job['error']}")
+            logger.error(f'用户：{username} | 深度研究任务{JOB_STATUS_LABELS[job["status"]]}: {job_id} - {job["error"]}')
+        st.rerun()
+
+if agent_option =="深度研究Agent":
+    research_job_id = load_context("agent_messages").get("research_job_id")
+    research_job = research_jobs.store.get_job(research_job_id) if research_job_id else None
+    # 只有任务未结束时才定时刷新面板，最终报告生成期间刷新更频繁
+    poll_interval = None
+    if research_job is not None and research_job["status"] in ACTIVE_JOB_STATUSES:
+        poll_interval = REPORT_POLL_INTERVAL if research_job["result"] else RESEARCH_POLL_INTERVAL
+    st.fragment(research_job_panel, run_every=poll_interval)(research_job_id, poll_interval)
 # 初始化或更新Agent选项
 if "agent_option" not in st.session_state:
     st.session_state["agent_option"] = agent_option
@@ -154,21 +222,9 @@ elif st.session_state["agent_option"] == "深度研究Agent":
 # 聊天历史区域 - 创建独立的滚动容器
 agent_messages_container = st.container(height=300, key="chat2agent_messages_container")
 with agent_messages_container:
-    # 聊天历史区域 - 按顺序显示每条消息
-    for message in st.session_state.agent_messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
-
-# 深度研究agent流式状态输出
-async def stream_run(initial_state: str):
-    final_report = ""
-    async for item in st.session_state.agent.astream(initial_state,stream_mode="updates"):
-        for node, data in item.items():
-            status.write(node + "步骤执行完成。")
-            if node == "final_report_generation":
-                final_report = data.get("final_report", "")
-                status.write("深度研究全部完成！")
-    return final_report
+    # 聊天历史区域 - 只渲染最近一页消息，更早的消息按需加载
+    render_history("agent_messages")
+
 ## 用户输入框
 if st.session_state["agent_option"] == "起网名Agent":
     prompt = st.chat_input("请输入您的姓名...",key="main_chat_input")
@@ -177,7 +233,7 @@ else:
 
 if prompt:
     # 添加用户消息到会话状态
-    st.session_state["agent_messages"].append({"role": "user", "content": prompt})
+    append_message("agent_messages", "user", prompt)
     logger.info(f'用户：{username} | 用户 {st.session_state.get("username", "未知用户")} 向 {agent_option} 输入问题: {prompt[:50]}... (完整长度: {len(prompt)} 字符)')
 
     with agent_messages_container:
@@ -211,10 +267,14 @@ if prompt:
                 if st.session_state.agent:
                     logger.info(f'用户：{username} | 调用 {agent_option} 处理用户请求')
                     if st.session_state["agent_option"] == "深度研究Agent":
-                        full_response = asyncio.run(stream_run(initial_state))
+                        # 提交到后台任务队列，进度和报告在深度研究面板中查看
+                        job = research_jobs.submit(username, prompt)
+                        context = load_context("agent_messages")
+                        context["research_job_id"] = job["id"]
+                        save_context("agent_messages", context)
+                        full_response = f"深度研究任务已提交（任务ID：{job['id'][:8]}），可在上方面板查看进度，刷新页面不影响任务执行。"
                         message_placeholder.markdown(full_response)
-                        logger.info(f'用户：{username} | {agent_option} 成功返回响应 (长度: {len(full_response)} 字符)')
-                        btn_holder.download_button(label="下载报告",data=full_response,file_name="report.md",mime="text/markdown",icon=":material/download:")
+                        logger.info(f'用户：{username} | 提交深度研究任务: {job["id"]}')
                     else:
                         result = st.session_state.agent.invoke(initial_state)
                         response = result["messages"][-1]
@@ -236,5 +296,7 @@ if prompt:
                 logger.error(f'用户：{username} | Agent请求失败: {agent_option} 处理用户请求时发生错误 - {e}')
     
     # 添加助手回复到会话状态
-    st.session_state["agent_messages"].append({"role": "assistant", "content": full_response})
-    
+    append_message("agent_messages", "assistant", full_response)
+    if st.session_state["agent_option"] == "深度研究Agent":
+        # 重跑页面，让深度研究面板开始轮询新任务
+        st.rerun()
@@ -4,14 +4,13 @@ ChatX UI：第三方模型接入配置页面
 # encoding=utf-8
 import os
 import sys
-import yaml
 import logging
-from yaml.loader import SafeLoader
 
 root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(root_dir)
 
 import streamlit as st
+from models import model_registry
 from auth import check_authentication
 
 # 初始化日志
@@ -61,23 +60,29 @@ if f'model_enroll_page_{username}' not in st.session_state:
 st.markdown("<h1 style='text-align: center; color: #2c3e50; margin: 20px 0;'>🔧 第三方模型接入配置</h1>", unsafe_allow_html=True)
 st.markdown("<div style='background: linear-gradient(90deg, #3498db, #2ecc71); height: 3px; margin-bottom: 30px; border-radius: 2px;'></div>", unsafe_allow_html=True)
 
-# 配置文件路径
-config_file = os.path.join(root_dir, 'models_config.yaml')
-
-# 读取现有配置
-def load_existing_config():
+# 读取当前用户的模型配置
+def load_user_models():
     try:
-        with open(config_file, 'r', encoding='utf-8') as f:
-            return yaml.load(f, Loader=SafeLoader)
+        return model_registry.models_of(username)
+    except KeyError:
+        return dict()
     except Exception as e:
         st.error(f"读取配置文件失败: {e}")
         return dict()
 
-# 保存配置到文件
-def save_config(new_config):
+# 保存单个模型配置（加锁原子写入，只提交增量修改）
+def save_model_config(model_key, model_config):
+    try:
+        model_registry.save_model(username, model_key, model_config)
+        return True
+    except Exception as e:
+        st.error(f"保存配置文件失败: {e}")
+        return False
+
+# 删除单个模型配置
+def delete_model_config(model_key):
     try:
-        with open(config_file, 'w', encoding='utf-8') as f:
-            yaml.dump(new_config, f, default_flow_style=False, allow_unicode=True)
+        model_registry.delete_model(username, model_key)
         return True
     except Exception as e:
         st.error(f"保存配置文件失败: {e}")
@@ -113,6 +118,8 @@ with col1:
         with st.expander("高级配置"):
             temperature = st.slider("温度参数", 0.0, 2.0, 0.7, 0.1)
             max_tokens = st.number_input("最大令牌数", 1, 100000, 64000, 1000)
+            input_price = st.number_input("输入价格（元/百万tokens）", 0.0, 1000.0, 0.0, 0.1)
+            output_price = st.number_input("输出价格（元/百万tokens）", 0.0, 1000.0, 0.0, 0.1)
             description = st.text_area("模型描述", placeholder="简要描述这个模型的特点和用途")
         
         # 提交按钮
@@ -122,16 +129,9 @@ with col1:
             if not model_name or not display_name or not api_key or not model_id:
                 st.error("请填写必填字段：模型名称、显示名称、API Key和模型ID")
             else:
-                # 加载现有配置
-                existing_config = load_existing_config()
-                
-                # 确保models配置部分存在
-                if "models" not in existing_config:
-                    existing_config["models"] = {}
-                
                 # 添加新模型配置
                 keystr= f"PRIVATE_{model_name}"
-                existing_config["models"][username] = {keystr: {
+                model_config = {
                     "display_name": display_name,
                     "provider": model_provider,
                     "api_key": api_key,
@@ -139,11 +139,13 @@ with col1:
                     "model_id": model_id,
                     "temperature": temperature,
                     "max_tokens": max_tokens,
+                    "input_price": input_price,
+                    "output_price": output_price,
                     "description": description
-                }}
+                }
                 
                 # 保存配置
-                if save_config(existing_config):
+                if save_model_config(keystr, model_config):
                     st.success(f"模型 {display_name} 配置成功！")
                     logger.info(f'用户：{username} | 添加新模型: 成功添加模型 {model_name} ({display_name})')
                     # 重置表单
@@ -156,10 +158,10 @@ with col2:
     st.markdown("<h3 style='color: #34495e;'>已配置模型</h3>", unsafe_allow_html=True)
     
     # 加载现有配置
-    existing_config = load_existing_config()
+    user_models = load_user_models()
     
-    if "models" in existing_config and existing_config["models"]:
-        for model_name, model_config in existing_config["models"].get(username, {}).items():
+    if user_models:
+        for model_name, model_config in user_models.items():
             with st.expander(f"{model_config['display_name']} ({model_name})"):
                 col_info1, col_info2 = st.columns([2, 1])
                 
@@ -170,6 +172,8 @@ with col2:
                         st.markdown(f"**API Base URL**: {model_config['base_url']}")
                     st.markdown(f"**温度参数**: {model_config['temperature']}")
                     st.markdown(f"**最大令牌数**: {model_config['max_tokens']}")
+                    if model_config.get('input_price') or model_config.get('output_price'):
+                        st.markdown(f"**价格（元/百万tokens）**: 输入 {model_config.get('input_price', 0)} / 输出 {model_config.get('output_price', 0)}")
                     if model_config['description']:
                         st.markdown(f"**描述**: {model_config['description']}")
                 
@@ -177,8 +181,7 @@ with col2:
                     # 删除按钮
                     if st.button("删除模型", key=f"delete_{model_name}", type="secondary", width="stretch"):
                         # 删除模型配置
-                        del existing_config["models"][username][model_name]
-                        if save_config(existing_config):
+                        if delete_model_config(model_name):
                             st.success(f"模型 {model_config['display_name']} 已删除！")
                             logger.info(f'用户：{username} | 删除模型: 成功删除模型 {model_name} ({model_config["display_name"]})')
                             st.rerun()
@@ -194,8 +197,8 @@ with st.expander("查看详细说明"):
     ### 如何使用已添加的模型
     
     1. **添加模型后**：
-       - 配置会自动保存到 `config.yaml` 文件
-       - 您需要重启应用才能在聊天界面看到新添加的模型
+       - 配置会自动保存到 `models_config.yaml` 文件
+       - 刷新聊天页面即可在模型列表中看到新添加的模型
     
     2. **在聊天界面使用**：
        - 打开 Chat2Model 或 MultiModelChat 页面
@@ -1 +1,7 @@
-from .models import init_model, get_available_models
\ No newline at end of file
+from .models import init_model, get_available_models
+from .model_pool import get_model_pool_stats
+from .model_utils import model_registry, estimate_tokens, estimate_cost
+from .model_stream import stream_chat, astream_chat
+from .model_fanout import fan_out_stream
+from .rate_limit import get_provider, get_rate_limiter
+from .model_context import ConversationContext, get_context_budget, new_context_state
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+多轮对话上下文管理：在 token 预算内组装历史消息
+
+最近的对话轮次原样保留（滑动窗口），滑出窗口的早期轮次合并进一份摘要。
+摘要和已摘要的消息位置保存在会话状态中，每轮只把新滑出窗口的消息增量
+合并进摘要，不会每次都重新总结全部历史。
+"""
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from .model_utils import estimate_tokens, get_custom_model_config
+
+# 各模型用于历史上下文的 token 预算（不含模型输出）
+MODEL_CONTEXT_BUDGETS = {
+    "SF_Qwen3-8B": 16000,
+    "SF_DeepSeek-R1-8B": 16000,
+    "SF_GLM-4-9B": 16000,
+    "ZP_GLM-4.7-Flash": 32000,
+    "ZP_GLM-4-Flash-250414": 32000,
+}
+# 未配置模型的默认预算
+DEFAULT_CONTEXT_BUDGET = 8000
+# 摘要的最大长度（字符）
+MAX_SUMMARY_CHARS = 1500
+
+summarize_history_prompt = """请将以下对话内容合并进已有的对话摘要，生成一份新的摘要。
+要求：
+- 保留用户的目标、偏好、已确认的事实、关键数据和尚未解决的问题；
+- 省略寒暄和重复内容，不要编造对话中没有的信息；
+- 使用与对话相同的语言，长度不超过{max_chars}字。
+
+已有摘要：
+{summary}
+
+新增对话：
+{conversation}
+
+请直接输出新的摘要："""
+
+
+def get_context_budget(model_name: str) -> int:
+    """获取模型的历史上下文预算，自定义模型可在配置中填写 context_budget"""
+    if model_name and model_name.startswith("PRIVATE_"):
+        item = get_custom_model_config(model_name) or {}
+        return int(item.get("context_budget") or DEFAULT_CONTEXT_BUDGET)
+    return MODEL_CONTEXT_BUDGETS.get(model_name, DEFAULT_CONTEXT_BUDGET)
+
+
+def new_context_state() -> dict:
+    """新建上下文状态：summary 为早期对话摘要，covered 为已合并进摘要的消息条数"""
+    return {"summary": "", "covered": 0}
+
+
+def _to_message(message: dict):
+    if message["role"] == "user":
+        return HumanMessage(content=message["content"])
+    return AIMessage(content=message["content"])
+
+
+class ConversationContext:
+    """按 token 预算组装多轮对话请求"""
+
+    def __init__(self, summarizer_model, budget: int = DEFAULT_CONTEXT_BUDGET, state: dict | None = None):
+        self.summarizer_model = summarizer_model
+        self.budget = budget
+        self.state = state if state is not None else new_context_state()
+
+    def build(self, history: list, prompt: str, offset: int = 0) -> list:
+        """组装本轮请求的消息列表
+
+        Args:
+            history: 本轮之前的历史消息 [{"role": ..., "content": ...}]
+            prompt: 本轮用户输入
+            offset: history[0] 在完整会话中的位置（历史只加载了一部分时使用）
+
+        Returns:
+            [摘要系统消息] + 窗口内历史消息 + 本轮用户消息
+        """
+        covered = max(self.state["covered"] - offset, 0)
+        window_start = self._window_start(history, covered, prompt)
+        # 摘要失败时不推进 covered，下一轮重试合并这些消息
+        if window_start > covered and self._summarize(history[covered:window_start]):
+            self.state["covered"] = offset + window_start
+
+        messages = []
+        if self.state["summary"]:
+            messages.append(SystemMessage(content=f"以下是之前对话的摘要，请结合摘要理解用户的问题：\n{self.state['summary']}"))
+        messages.extend(_to_message(message) for message in history[window_start:])
+        messages.append(HumanMessage(content=prompt))
+        return messages
+
+    def _window_start(self, history: list, covered: int, prompt: str) -> int:
+        """从最新消息往前累加，返回预算内能保留的最早消息位置"""
+        remaining = self.budget - estimate_tokens(prompt) - estimate_tokens(self.state["summary"])
+        start = len(history)
+        for index in range(len(history) - 1, covered - 1, -1):
+            remaining -= estimate_tokens(history[index]["content"])
+            if remaining < 0:
+                break
+            start = index
+        # 不从助手回复开始，避免把一轮问答拆开
+        while start < len(history) and history[start]["role"] != "user":
+            start += 1
+        return start
+
+    def _summarize(self, evicted: list) -> bool:
+        """把滑出窗口的消息增量合并进摘要，成功返回 True，失败时保留原摘要"""
+        if not evicted or self.summarizer_model is None:
+            return False
+        conversation = "\n".join(
+            f'{"用户" if message["role"] == "user" else "助手"}：{message["content"]}' for message in evicted
+        )
+        try:
+            response = self.summarizer_model.invoke(summarize_history_prompt.format(
+                max_chars=MAX_SUMMARY_CHARS,
+                summary=self.state["summary"] or "（无）",
+                conversation=conversation,
+            ))
+            self.state["summary"] = str(response.content)[:MAX_SUMMARY_CHARS * 2]
+            return True
+        except Exception as e:
+            print(f"对话摘要生成失败: {e}")
+            return False
@@ -0,0 +1,100 @@
+"""
+多模型并发调用：同一问题同时分发给多个模型，各模型的流式输出独立返回
+
+所有请求共用一个进程级线程池，页面重跑时不会重复创建线程池；
+每个模型在工作线程中流式生成，主线程（Streamlit 脚本线程）按事件刷新界面，
+总耗时取决于最慢的模型，而不是各模型耗时之和。
+对比大量模型时，可限制单次分发的最大并发数，并按服务商令牌桶限流。
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .model_stream import StreamRecorder, DEFAULT_RENDER_FPS
+from .rate_limit import get_rate_limiter
+
+# 进程级线程池的最大线程数（所有会话共享）
+FANOUT_MAX_WORKERS = 16
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_fanout_executor() -> ThreadPoolExecutor:
+    """获取进程级共享线程池，首次调用时创建"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="chatx-fanout")
+        return _executor
+
+
+def _stream_one(key, model, messages, events, cancelled, render_fps, provider):
+    """流式调用单个模型，把增量文本和结束事件放入事件队列"""
+    if provider:
+        get_rate_limiter(provider).acquire()
+    events.put(("start", key, "", None))
+    recorder = StreamRecorder(
+        on_update=lambda text, done: None if done else events.put(("update", key, text, None)),
+        render_fps=render_fps,
+    )
+    try:
+        for chunk in model.stream(messages):
+            if cancelled.is_set():
+                break
+            recorder.add(chunk)
+        text = recorder.finish()
+        events.put(("done", key, text, recorder.stats()))
+    except Exception as e:
+        events.put(("error", key, recorder.text, e))
+
+
+def _stream_worker(pending_jobs, events, cancelled, render_fps, providers):
+    """工作线程：依次从待处理队列取出模型请求执行，直到队列为空"""
+    while True:
+        try:
+            key, (model, messages) = pending_jobs.get_nowait()
+        except queue.Empty:
+            return
+        if cancelled.is_set():
+            events.put(("error", key, "", RuntimeError("请求已取消")))
+            continue
+        _stream_one(key, model, messages, events, cancelled, render_fps, providers.get(key))
+
+
+def fan_out_stream(jobs: dict, render_fps: float = DEFAULT_RENDER_FPS, max_concurrency: int | None = None, providers: dict | None = None):
+    """并发流式调用多个模型，按到达顺序产出事件
+
+    Args:
+        jobs: {标识: (模型实例, 输入消息)}
+        render_fps: 每个模型的界面刷新帧率
+        max_concurrency: 本次分发同时进行的最大请求数，None 表示不限制
+        providers: {标识: 服务商}，指定后按服务商令牌桶限流
+
+    Yields:
+        (事件类型, 标识, 当前文本, 附加信息)：
+        - ("start", key, "", None)：模型取得并发名额，开始请求
+        - ("update", key, text, None)：模型输出了新内容
+        - ("done", key, text, stats)：模型完成，stats 为流式统计信息
+        - ("error", key, text, exception)：模型调用失败
+    """
+    events = queue.Queue()
+    cancelled = threading.Event()
+    pending_jobs = queue.Queue()
+    for item in jobs.items():
+        pending_jobs.put(item)
+    # 只启动 max_concurrency 个工作线程，每个线程串行处理队列中的请求
+    workers = min(max_concurrency or len(jobs), len(jobs))
+    executor = get_fanout_executor()
+    for _ in range(workers):
+        executor.submit(_stream_worker, pending_jobs, events, cancelled, render_fps, providers or {})
+
+    pending = set(jobs)
+    try:
+        while pending:
+            event = events.get()
+            if event[0] in ("done", "error"):
+                pending.discard(event[1])
+            yield event
+    finally:
+        # 调用方提前退出（例如页面重跑）时通知工作线程停止生成
+        cancelled.set()
@@ -0,0 +1,86 @@
+"""
+模型客户端缓存池：进程内共享已创建的对话模型客户端
+
+Streamlit 每次重跑页面脚本都会调用 init_model()，如果每次都新建客户端，
+就会重复创建 HTTP 连接池并重新进行 TLS 握手。这里按
+(provider, base_url, model_id, api_key 哈希, temperature, max_tokens)
+缓存客户端实例，相同配置的请求复用同一个客户端及其空闲连接。
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+# 缓存池默认容量（不同配置的客户端数量上限）
+DEFAULT_POOL_SIZE = 32
+
+
+def make_client_key(provider, base_url, model_id, api_key, temperature, max_tokens):
+    """生成客户端缓存键，api_key 只保存哈希值，避免明文驻留在缓存键中"""
+    api_key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    return (provider, base_url or "", model_id, api_key_hash, float(temperature), int(max_tokens))
+
+
+class ModelClientPool:
+    """按配置缓存模型客户端，超出容量时按 LRU 策略淘汰最久未使用的客户端"""
+
+    def __init__(self, max_size: int = DEFAULT_POOL_SIZE):
+        self.max_size = max_size
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_or_create(self, key, factory):
+        """获取缓存中的客户端，不存在时调用 factory() 创建并放入缓存"""
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self._hits += 1
+                return client
+            self._misses += 1
+
+        # 在锁外创建客户端，避免慢速初始化阻塞其他会话
+        client = factory()
+        if client is None:
+            return None
+
+        with self._lock:
+            # 其他线程可能已抢先创建，优先使用已缓存的实例以共享连接
+            existing = self._clients.get(key)
+            if existing is not None:
+                self._clients.move_to_end(key)
+                return existing
+            self._clients[key] = client
+            while len(self._clients) > self.max_size:
+                # 被淘汰的客户端可能仍被某个会话持有，不主动关闭，由垃圾回收释放连接
+                self._clients.popitem(last=False)
+                self._evictions += 1
+        return client
+
+    def clear(self):
+        """清空缓存池"""
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self) -> dict:
+        """返回缓存命中统计：命中数、未命中数、淘汰数、存活客户端数"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "live_clients": len(self._clients),
+                "hit_rate": self._hits / total if total else 0.0,
+            }
+
+
+# 进程级共享的客户端缓存池
+model_pool = ModelClientPool()
+
+
+def get_model_pool_stats() -> dict:
+    """获取模型客户端缓存池统计信息"""
+    return model_pool.stats()
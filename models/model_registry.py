@@ -0,0 +1,98 @@
+"""
+自定义模型注册表：models_config.yaml 的内存索引
+
+配置文件只在 inode/mtime 变化时重新解析，解析后按用户和 PRIVATE_* 模型名
+建立索引，init_model 和模型下拉列表都可以 O(1) 查询，不再在每轮对话中解析 YAML。
+模型的增删通过 YamlConfigStore 加锁原子写入，只提交增量操作。
+"""
+import threading
+from storage import get_config_store, set_op, delete_op
+
+
+class ModelRegistry:
+    """按用户和模型名索引的自定义模型注册表"""
+
+    def __init__(self, config_path: str):
+        self._file = get_config_store(config_path)
+        self._lock = threading.Lock()
+        self._version = None
+        # 用户 -> {模型名: 模型参数}
+        self._by_owner = {}
+        # 模型名 -> (用户, 模型参数)
+        self._by_key = {}
+        # 用户(None 表示全部) -> {模型名: model_id}，按版本缓存
+        self._mappings = {}
+
+    def _refresh(self):
+        """配置文件变化后重建索引"""
+        data = self._file.data()
+        with self._lock:
+            if self._version == self._file.version:
+                return
+            by_owner = {}
+            by_key = {}
+            for owner, models in (data.get('models') or {}).items():
+                models = models or {}
+                by_owner[owner] = models
+                for key, params in models.items():
+                    by_key[key] = (owner, params)
+            self._by_owner = by_owner
+            self._by_key = by_key
+            self._mappings = {}
+            self._version = self._file.version
+
+    def owners(self) -> list:
+        """返回所有注册了自定义模型的用户"""
+        self._refresh()
+        return list(self._by_owner.keys())
+
+    def models_of(self, owner: str) -> dict:
+        """返回指定用户的模型配置 {模型名: 模型参数}，用户不存在时抛出 KeyError"""
+        self._refresh()
+        return dict(self._by_owner[owner])
+
+    def all_models(self) -> dict:
+        """返回所有用户的模型配置 {用户: {模型名: 模型参数}}"""
+        self._refresh()
+        return {owner: dict(models) for owner, models in self._by_owner.items()}
+
+    def get(self, model_name: str) -> dict | None:
+        """按 PRIVATE_* 模型名查询模型参数"""
+        self._refresh()
+        entry = self._by_key.get(model_name)
+        return dict(entry[1]) if entry else None
+
+    def owner_of(self, model_name: str) -> str | None:
+        """按模型名查询模型所属用户"""
+        self._refresh()
+        entry = self._by_key.get(model_name)
+        return entry[0] if entry else None
+
+    def model_id_mapping(self, owner: str | None = None) -> dict:
+        """返回 {模型名: model_id} 映射，owner 为 None 时返回全部用户的模型"""
+        self._refresh()
+        with self._lock:
+            mapping = self._mappings.get(owner)
+            if mapping is None:
+                if owner is None:
+                    items = [(key, params) for key, (_, params) in self._by_key.items()]
+                else:
+                    items = self._by_owner.get(owner, {}).items()
+                mapping = {
+                    key: (params or {}).get('model_id', key.replace("PRIVATE_", ""))
+                    for key, params in items
+                }
+                self._mappings[owner] = mapping
+            return dict(mapping)
+
+    def save_model(self, owner: str, model_name: str, params: dict):
+        """新增或更新用户的模型配置"""
+        self._file.update([set_op(['models', owner, model_name], params)])
+
+    def delete_model(self, owner: str, model_name: str):
+        """删除用户的模型配置"""
+        self._file.update([delete_op(['models', owner, model_name])])
+
+    def invalidate(self):
+        """强制下次访问时重新加载配置文件"""
+        self._file.invalidate()
@@ -0,0 +1,107 @@
+"""
+流式对话：边生成边渲染模型回复，并记录首字延迟与生成速度
+"""
+import time
+
+# 默认界面刷新帧率（每秒最多刷新占位组件的次数）
+DEFAULT_RENDER_FPS = 15
+
+
+def chunk_text(chunk) -> str:
+    """提取流式消息块中的文本内容"""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, str):
+                parts.append(block)
+            elif isinstance(block, dict) and block.get("type") == "text":
+                parts.append(block.get("text", ""))
+        return "".join(parts)
+    return ""
+
+
+class StreamRecorder:
+    """累积流式输出，按帧率节流界面刷新，并统计首字延迟和 tokens/s"""
+
+    def __init__(self, on_update=None, render_fps: float = DEFAULT_RENDER_FPS):
+        self.on_update = on_update
+        self.frame_interval = 1.0 / render_fps if render_fps and render_fps > 0 else 0.0
+        self.text = ""
+        self.chunks = 0
+        self.input_tokens = None
+        self.output_tokens = None
+        self.start_time = time.perf_counter()
+        self.first_token_time = None
+        self.end_time = None
+        self._last_render = 0.0
+
+    def add(self, chunk):
+        """追加一个消息块，距离上次刷新超过帧间隔时回调 on_update"""
+        text = chunk_text(chunk)
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage:
+            if usage.get("input_tokens"):
+                self.input_tokens = (self.input_tokens or 0) + usage["input_tokens"]
+            if usage.get("output_tokens"):
+                self.output_tokens = (self.output_tokens or 0) + usage["output_tokens"]
+        if not text:
+            return
+        now = time.perf_counter()
+        if self.first_token_time is None:
+            self.first_token_time = now
+        self.text += text
+        self.chunks += 1
+        if self.on_update and now - self._last_render >= self.frame_interval:
+            self._last_render = now
+            self.on_update(self.text, False)
+
+    def finish(self) -> str:
+        """结束流式输出，最后刷新一次完整内容并返回全文"""
+        self.end_time = time.perf_counter()
+        if self.on_update:
+            self.on_update(self.text, True)
+        return self.text
+
+    def stats(self) -> dict:
+        """返回本次请求的统计：首字延迟、总耗时、输入/输出 token 数、生成速度
+
+        服务端未返回输入 token 数时 input_tokens 为 None。
+        """
+        end_time = self.end_time or time.perf_counter()
+        # 服务端未返回用量时，以消息块数量近似 token 数
+        tokens = self.output_tokens if self.output_tokens else self.chunks
+        ttft = self.first_token_time - self.start_time if self.first_token_time else None
+        generation_time = end_time - self.first_token_time if self.first_token_time else 0.0
+        return {
+            "ttft": ttft,
+            "elapsed": end_time - self.start_time,
+            "input_tokens": self.input_tokens,
+            "output_tokens": tokens,
+            "tokens_per_s": tokens / generation_time if generation_time > 0 else 0.0,
+        }
+
+
+def stream_chat(model, messages, on_update=None, render_fps: float = DEFAULT_RENDER_FPS):
+    """流式调用模型，返回 (完整回复, 统计信息)
+
+    Args:
+        model: 对话模型实例
+        messages: 输入消息，可以是字符串或消息列表
+        on_update: 刷新回调 on_update(当前全文, 是否结束)
+        render_fps: 界面刷新帧率
+    """
+    recorder = StreamRecorder(on_update, render_fps)
+    for chunk in model.stream(messages):
+        recorder.add(chunk)
+    return recorder.finish(), recorder.stats()
+
+
+async def astream_chat(model, messages, on_update=None, render_fps: float = DEFAULT_RENDER_FPS):
+    """stream_chat 的异步版本"""
+    recorder = StreamRecorder(on_update, render_fps)
+    async for chunk in model.astream(messages):
+        recorder.add(chunk)
+    return recorder.finish(), recorder.stats()
@@ -1,10 +1,11 @@
 import os
+import re
 import sys
+import math
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(root_dir)
-import yaml
-from yaml.loader import SafeLoader
 from chatxweb.auth import get_user_roles
+from .model_registry import ModelRegistry
 
 # ChatX 内置模型
 ## 1. 硅基流动
@@ -34,34 +35,66 @@ zp_model_mapping = {
 ## 3. 自定义模型
 ### 3.1 自定义模型配置文件路径
 custom_model_config_path = os.path.join(os.path.dirname(__file__), '..', 'models_config.yaml')
-### 3.2 加载自定义模型配置
+### 3.2 自定义模型注册表（配置文件变化时才重新解析）
+model_registry = ModelRegistry(custom_model_config_path)
+### 3.3 加载自定义模型配置
 def load_custom_model_config(username: str | None = None):
     try:
-        with open(custom_model_config_path, 'r', encoding='utf-8') as f:
-            res = yaml.load(f, Loader=SafeLoader)
         roles = get_user_roles(username)
         if 'admin' in roles or username == None:
-            d =[]
-            for item in res.get('models', {}).values():
-                d.append(item)
-            return d
+            return list(model_registry.all_models().values())
         else:
-            d =[]
-            for key,value in res.get('models', {})[username].items():
-                    d.append({key:value})
-            return d
+            return [{key: value} for key, value in model_registry.models_of(username).items()]
     except Exception as e:
         print(f"加载自定义模型配置文件失败: {e}")
         return []
-### 3.3 自定义模型映射
+### 3.4 自定义模型映射
 def get_custom_model_mapping(username: str|None = None):
-    res=load_custom_model_config(username)
-    custom_model_mapping = {}
-    if res:
-        for i in res:
-            for model_name, model_params in i.items():
-                custom_model_mapping[model_name] = model_params.get('model_id', model_name.replace("PRIVATE_", ""))
-    return custom_model_mapping
+    try:
+        roles = get_user_roles(username)
+        if 'admin' in roles or username == None:
+            return model_registry.model_id_mapping()
+        else:
+            return model_registry.model_id_mapping(username)
+    except Exception as e:
+        print(f"加载自定义模型配置文件失败: {e}")
+        return {}
+### 3.5 查询单个自定义模型配置
+def get_custom_model_config(model_name: str):
+    try:
+        return model_registry.get(model_name)
+    except Exception as e:
+        print(f"加载自定义模型配置文件失败: {e}")
+        return None
+
+## 4. 模型价格
+### 4.1 内置模型价格（元/百万 tokens，输入, 输出）：以上内置模型均为平台的免费模型
+builtin_model_pricing = {name: (0.0, 0.0) for name in {**sf_model_mapping, **zp_model_mapping}}
+### 4.2 查询模型价格：内置模型查价格表，自定义模型读取配置中的 input_price/output_price；价格未知时返回 None
+def get_model_pricing(model_name: str):
+    if model_name in builtin_model_pricing:
+        return builtin_model_pricing[model_name]
+    if model_name and model_name.startswith("PRIVATE_"):
+        item = get_custom_model_config(model_name) or {}
+        if "input_price" in item or "output_price" in item:
+            return float(item.get("input_price") or 0), float(item.get("output_price") or 0)
+    return None
+### 4.3 估算单次请求费用（元），价格未知时返回 None
+def estimate_cost(model_name: str, input_tokens: int, output_tokens: int) -> float | None:
+    pricing = get_model_pricing(model_name)
+    if pricing is None:
+        return None
+    input_price, output_price = pricing
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+## 5. token 数估算（不依赖分词器：中日韩字符按 1 个 token，其余字符按 4 个字符 1 个 token）
+_cjk_pattern = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]')
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk = len(_cjk_pattern.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
 
 
 # 测试
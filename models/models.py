@@ -4,7 +4,8 @@
 import os
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
-from .model_utils import sf_model_mapping, zp_model_mapping, load_custom_model_config,get_custom_model_mapping
+from .model_utils import sf_model_mapping, zp_model_mapping, get_custom_model_config, get_custom_model_mapping
+from .model_pool import model_pool, make_client_key
 
 load_dotenv()
 
@@ -13,58 +14,42 @@ load_dotenv()
 def init_model(temperature=0.7, model_name="SF_Qwen3-8B"):
     try:
         mark = model_name.split("_")[0]
+        provider = "openai"
+        max_tokens = 64000
         if mark == "SF":
             model_id = sf_model_mapping.get(model_name, model_name.replace("SF_", ""))
-            model = init_chat_model(
-                api_key = os.getenv("sf_api_key"),
-                base_url = os.getenv("sf_api_url"),
-                model = model_id,
-                model_provider = "openai",
-                temperature = temperature,
-                max_tokens = 64000,
-            )
+            api_key = os.getenv("sf_api_key")
+            base_url = os.getenv("sf_api_url")
         elif mark == "ZP":
             model_id = zp_model_mapping.get(model_name, model_name.replace("ZP_", ""))
-            model = init_chat_model(
-                api_key = os.getenv("zp_api_key"),
-                base_url = os.getenv("zp_api_url"),
-                model = model_id,
-                model_provider = "openai",
-                temperature = temperature,
-                max_tokens = 64000,
-            )
+            api_key = os.getenv("zp_api_key")
+            base_url = os.getenv("zp_api_url")
         elif mark == "PRIVATE":
-            all_user_models = load_custom_model_config()
             model_id = model_name.replace("PRIVATE_", "")
-            private_api_key = ""
-            private_api_url = ""
-            provider = "openai"
-            max_tokens = 64000
-            for item in all_user_models:
-                if item.get("model_name") == model_name:
-                    model_id = item.get("model_id", model_name.replace("PRIVATE_", ""))
-                    private_api_key = item.get("api_key","")
-                    private_api_url = item.get("base_url","")
-                    provider = item.get("provider","openai")
-                    max_tokens = item.get("max_tokens", 64000)
-                    break
-            model = init_chat_model(
-                api_key = private_api_key,
-                base_url = private_api_url,
-                model = model_id,
-                model_provider = provider,
-                temperature = temperature,
-                max_tokens = max_tokens,
-            )
+            api_key = ""
+            base_url = ""
+            item = get_custom_model_config(model_name)
+            if item:
+                model_id = item.get("model_id", model_id)
+                api_key = item.get("api_key","")
+                base_url = item.get("base_url","")
+                provider = item.get("provider","openai")
+                max_tokens = item.get("max_tokens", 64000)
         else:
-            model = init_chat_model(
-                api_key = os.getenv("sf_api_key"),
-                base_url = os.getenv("sf_api_url"),
-                model = model_name,
-                model_provider = "openai",
-                temperature = temperature,
-                max_tokens = 64000,
-            )
+            model_id = model_name
+            api_key = os.getenv("sf_api_key")
+            base_url = os.getenv("sf_api_url")
+
+        # 相同配置的客户端在进程内共享，页面重跑时复用已建立的连接
+        key = make_client_key(provider, base_url, model_id, api_key, temperature, max_tokens)
+        model = model_pool.get_or_create(key, lambda: init_chat_model(
+            api_key = api_key,
+            base_url = base_url,
+            model = model_id,
+            model_provider = provider,
+            temperature = temperature,
+            max_tokens = max_tokens,
+        ))
         return model
     except Exception as e:
         print(f"模型初始化失败: {e}")
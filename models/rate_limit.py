@@ -0,0 +1,75 @@
+"""
+按模型服务商限流：令牌桶算法
+
+同一服务商的免费额度通常有每分钟请求数限制，多模型对比或并发研究时
+先从对应服务商的令牌桶取令牌再发请求，避免触发服务商限流。
+"""
+import asyncio
+import threading
+import time
+
+# 各服务商的限流配置：(每秒补充的令牌数, 桶容量)
+PROVIDER_RATE_LIMITS = {
+    "SF": (2.0, 5),
+    "ZP": (1.0, 3),
+    "PRIVATE": (5.0, 10),
+}
+# 未配置服务商的默认限流
+DEFAULT_RATE_LIMIT = (2.0, 5)
+
+
+class TokenBucket:
+    """线程安全的令牌桶，同时支持同步和异步等待"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens: float) -> float:
+        """尝试取出令牌，成功返回 0，否则返回还需等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        """阻塞直到取到令牌"""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0):
+        """异步等待直到取到令牌"""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_provider(model_name: str) -> str:
+    """根据模型名前缀（SF_/ZP_/PRIVATE_）判断服务商"""
+    return (model_name or "").split("_")[0] or "SF"
+
+
+def get_rate_limiter(provider: str) -> TokenBucket:
+    """获取服务商对应的进程级共享令牌桶"""
+    with _buckets_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            rate, capacity = PROVIDER_RATE_LIMITS.get(provider, DEFAULT_RATE_LIMIT)
+            bucket = _buckets[provider] = TokenBucket(rate, capacity)
+        return bucket
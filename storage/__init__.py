@@ -0,0 +1,4 @@
+from .yaml_store import CachedYamlFile, YamlConfigStore, get_config_store, file_lock, file_signature, atomic_write_text, set_op, delete_op
+from .conversation_store import ConversationStore
+from .kv_cache import KVCache
+from .job_store import JobStore
@@ -0,0 +1,167 @@
+"""
+对话持久化存储：SQLite（WAL 模式）
+
+按 用户 + 页面 组织会话，消息只追加写入；历史按页倒序加载，
+页面重跑时只需渲染最近一页消息，重启应用后对话仍然保留。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# 每页加载的消息条数
+DEFAULT_PAGE_SIZE = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    page TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    context TEXT NOT NULL DEFAULT '{}',
+    message_count INTEGER NOT NULL DEFAULT 0,
+    archived INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_page
+    ON conversations (username, page, archived, updated_at);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_conversation_seq
+    ON messages (conversation_id, seq);
+"""
+
+
+class ConversationStore:
+    """对话存储，每个线程使用独立的 SQLite 连接"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ====== 会话 ======
+
+    def get_active_conversation(self, username: str, page: str) -> dict:
+        """获取用户在某页面最近的未归档会话，不存在时新建"""
+        row = self._connect().execute(
+            "SELECT * FROM conversations WHERE username = ? AND page = ? AND archived = 0 "
+            "ORDER BY updated_at DESC LIMIT 1",
+            (username, page),
+        ).fetchone()
+        if row is not None:
+            return dict(row)
+        return self.new_conversation(username, page, archive_current=False)
+
+    def new_conversation(self, username: str, page: str, archive_current: bool = True) -> dict:
+        """新建会话，默认把用户在该页面的当前会话归档（历史仍保留）"""
+        now = time.time()
+        conversation = {
+            "id": uuid.uuid4().hex,
+            "username": username,
+            "page": page,
+            "title": "",
+            "context": "{}",
+            "message_count": 0,
+            "archived": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        with self._write_lock, self._connect() as conn:
+            if archive_current:
+                conn.execute(
+                    "UPDATE conversations SET archived = 1 WHERE username = ? AND page = ? AND archived = 0",
+                    (username, page),
+                )
+            conn.execute(
+                "INSERT INTO conversations (id, username, page, title, context, message_count, archived, created_at, updated_at) "
+                "VALUES (:id, :username, :page, :title, :context, :message_count, :archived, :created_at, :updated_at)",
+                conversation,
+            )
+        return conversation
+
+    def list_conversations(self, username: str, page: str, limit: int = DEFAULT_PAGE_SIZE) -> list:
+        """按最近更新时间列出用户在某页面的会话"""
+        rows = self._connect().execute(
+            "SELECT id, title, message_count, archived, created_at, updated_at FROM conversations "
+            "WHERE username = ? AND page = ? ORDER BY updated_at DESC LIMIT ?",
+            (username, page, limit),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    # ====== 消息 ======
+
+    def append_message(self, conversation_id: str, role: str, content: str) -> int:
+        """追加一条消息，返回消息在会话中的序号（从 0 开始）"""
+        now = time.time()
+        conn = self._connect()
+        with self._write_lock, conn:
+            # 立即获取写锁，避免多个进程读到相同的序号
+            conn.execute("BEGIN IMMEDIATE")
+            seq = conn.execute(
+                "SELECT message_count FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO messages (conversation_id, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                (conversation_id, seq, role, content, now),
+            )
+            if seq == 0 and role == "user":
+                conn.execute("UPDATE conversations SET title = ? WHERE id = ?", (content[:50], conversation_id))
+            conn.execute(
+                "UPDATE conversations SET message_count = ?, updated_at = ? WHERE id = ?",
+                (seq + 1, now, conversation_id),
+            )
+        return seq
+
+    def load_messages(self, conversation_id: str, before_seq: int | None = None, limit: int = DEFAULT_PAGE_SIZE) -> list:
+        """按页加载消息：返回序号小于 before_seq 的最近 limit 条消息（按时间正序）"""
+        if before_seq is None:
+            rows = self._connect().execute(
+                "SELECT seq, role, content FROM messages WHERE conversation_id = ? ORDER BY seq DESC LIMIT ?",
+                (conversation_id, limit),
+            ).fetchall()
+        else:
+            rows = self._connect().execute(
+                "SELECT seq, role, content FROM messages WHERE conversation_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (conversation_id, before_seq, limit),
+            ).fetchall()
+        return [{"role": row["role"], "content": row["content"], "seq": row["seq"]} for row in reversed(rows)]
+
+    # ====== 上下文状态 ======
+
+    def save_context(self, conversation_id: str, context: dict):
+        """保存会话的上下文状态（例如早期对话摘要）"""
+        with self._write_lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE conversations SET context = ? WHERE id = ?",
+                (json.dumps(context, ensure_ascii=False), conversation_id),
+            )
+
+    def load_context(self, conversation_id: str) -> dict:
+        """读取会话的上下文状态"""
+        row = self._connect().execute(
+            "SELECT context FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        return json.loads(row["context"]) if row and row["context"] else {}
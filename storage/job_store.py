@@ -0,0 +1,170 @@
+"""
+后台任务存储：SQLite（WAL 模式）
+
+记录长时间运行的任务（例如深度研究）的状态、结果和逐步的进度事件。
+任务在后台线程中执行，页面只需按任务 ID 轮询这里的记录，
+因此页面重跑、刷新浏览器都不会影响任务；服务重启后未完成的任务标记为已中断。
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_INTERRUPTED = "interrupted"
+# 尚未结束的任务状态
+ACTIVE_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+# 可以从检查点继续执行的任务状态
+RESUMABLE_JOB_STATUSES = (JOB_FAILED, JOB_CANCELLED, JOB_INTERRUPTED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    username TEXT NOT NULL,
+    query TEXT NOT NULL,
+    thread_id TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    result TEXT NOT NULL DEFAULT '',
+    error TEXT NOT NULL DEFAULT '',
+    trace TEXT NOT NULL DEFAULT '',
+    delivered INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_username ON jobs (username, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    node TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id, id);
+"""
+
+
+class JobStore:
+    """任务存储，每个线程使用独立的 SQLite 连接"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ====== 任务 ======
+
+    def create_job(self, kind: str, username: str, query: str, thread_id: str = "") -> dict:
+        """新建一个排队中的任务"""
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "username": username,
+            "query": query,
+            "thread_id": thread_id,
+            "status": JOB_QUEUED,
+            "created_at": now,
+            "updated_at": now,
+        }
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, username, query, thread_id, status, created_at, updated_at) "
+                "VALUES (:id, :kind, :username, :query, :thread_id, :status, :created_at, :updated_at)",
+                job,
+            )
+        return self.get_job(job["id"])
+
+    def get_job(self, job_id: str) -> dict | None:
+        """按 ID 读取任务，不存在时返回 None"""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_jobs(self, username: str, kind: str | None = None, statuses: tuple | None = None, limit: int = 20) -> list:
+        """按创建时间倒序列出用户的任务，可按类型和状态过滤"""
+        query = "SELECT * FROM jobs WHERE username = ?"
+        params = [username]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        if statuses:
+            query += f" AND status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._connect().execute(query, params).fetchall()]
+
+    def update_job(self, job_id: str, **fields):
+        """更新任务字段（status、result、error、trace、started_at、finished_at 等）"""
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = :{name}" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = :id", {**fields, "id": job_id})
+
+    def requeue_job(self, job_id: str, statuses: tuple = RESUMABLE_JOB_STATUSES) -> bool:
+        """任务处于 statuses 之一时重新排队并清空上次的结果；状态不符时不修改并返回 False
+
+        检查和更新在同一条 UPDATE 语句中完成，并发的重复请求只有一个会成功。
+        """
+        with self._connect() as conn:
+            return conn.execute(
+                f"UPDATE jobs SET status = ?, result = '', error = '', finished_at = NULL, delivered = 0, updated_at = ? "
+                f"WHERE id = ? AND status IN ({', '.join('?' * len(statuses))})",
+                (JOB_QUEUED, time.time(), job_id, *statuses),
+            ).rowcount == 1
+
+    def mark_delivered(self, job_id: str) -> bool:
+        """标记任务结果已交付给用户；只有第一次调用返回 True，用于保证结果只写入对话一次"""
+        with self._connect() as conn:
+            return conn.execute("UPDATE jobs SET delivered = 1 WHERE id = ? AND delivered = 0", (job_id,)).rowcount == 1
+
+    def interrupt_active_jobs(self) -> int:
+        """把上一个进程遗留的未结束任务标记为已中断，返回任务数"""
+        now = time.time()
+        with self._connect() as conn:
+            return conn.execute(
+                f"UPDATE jobs SET status = ?, finished_at = ?, updated_at = ? "
+                f"WHERE status IN ({', '.join('?' * len(ACTIVE_JOB_STATUSES))})",
+                (JOB_INTERRUPTED, now, now, *ACTIVE_JOB_STATUSES),
+            ).rowcount
+
+    # ====== 进度事件 ======
+
+    def add_event(self, job_id: str, node: str, message: str):
+        """追加一条进度事件"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job_events (job_id, node, message, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, node, message, now),
+            )
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (now, job_id))
+
+    def load_events(self, job_id: str, limit: int = 100) -> list:
+        """按时间正序返回任务最近 limit 条进度事件"""
+        rows = self._connect().execute(
+            "SELECT node, message, created_at FROM job_events WHERE job_id = ? ORDER BY id DESC LIMIT ?",
+            (job_id, limit),
+        ).fetchall()
+        return [dict(row) for row in reversed(rows)]
@@ -0,0 +1,131 @@
+"""
+持久化键值缓存：SQLite（WAL 模式），支持过期时间（TTL）、LRU 淘汰和容量上限
+
+用于缓存开销较大的计算结果（例如网页摘要），多个进程、线程共享同一个缓存文件。
+命中/未命中次数按进程统计，可通过 stats() 查看命中率。
+"""
+import os
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_accessed_at ON cache (accessed_at);
+"""
+
+
+class KVCache:
+    """SQLite 键值缓存，每个线程使用独立的连接
+
+    Args:
+        db_path: 缓存文件路径
+        ttl: 条目的有效期（秒），None 表示不过期
+        max_entries: 最多保留的条目数，超出时淘汰最久未访问的条目
+        max_bytes: 缓存值的总大小上限（字节），超出时淘汰最久未访问的条目
+    """
+
+    def __init__(self, db_path: str, ttl: float | None = None, max_entries: int = 10000, max_bytes: int = 100 * 1024 * 1024):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def get(self, key: str) -> str | None:
+        """读取缓存，不存在或已过期时返回 None"""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+            self._count("_misses")
+            return None
+        with conn:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count("_hits")
+        return row[0]
+
+    def set(self, key: str, value: str):
+        """写入缓存，并按过期时间和容量上限淘汰旧条目"""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._evict(conn, now)
+
+    def delete(self, key: str):
+        """删除一个缓存条目"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        evicted = 0
+        if self.ttl is not None:
+            evicted += conn.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl,)).rowcount
+        entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if entries > self.max_entries or total_bytes > self.max_bytes:
+            # 从最久未访问的条目开始淘汰，直到满足条数和大小上限
+            excess_entries = max(entries - self.max_entries, 0)
+            excess_bytes = max(total_bytes - self.max_bytes, 0)
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+                if excess_entries <= 0 and excess_bytes <= 0:
+                    break
+                victims.append((key,))
+                excess_entries -= 1
+                excess_bytes -= size
+            conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+            evicted += len(victims)
+        if evicted:
+            self._count("_evictions", evicted)
+
+    def clear(self):
+        """清空缓存"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache")
+
+    def stats(self) -> dict:
+        """返回本进程的命中统计和缓存当前的条目数、大小"""
+        entries, total_bytes = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        with self._stats_lock:
+            hits, misses, evictions = self._hits, self._misses, self._evictions
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "entries": entries,
+            "bytes": total_bytes,
+            "hit_rate": hits / total if total else 0.0,
+        }
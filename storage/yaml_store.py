@@ -0,0 +1,302 @@
+"""
+YAML 配置文件存储：变更检测缓存 + 加锁的原子写入 + 变更日志
+
+页面每次渲染都会读取 models_config.yaml 和 config.yaml，直接解析文件的开销
+会随配置规模线性增长。CachedYamlFile 只在文件发生变化时重新解析，
+其余时间直接返回内存中的解析结果。
+
+YamlConfigStore 在此基础上提供写入能力：
+- 写入时持有文件锁（同进程线程锁 + 跨进程 flock），避免并发会话互相覆盖；
+- 先写临时文件再 os.replace 原子替换，读者不会读到写了一半的文件；
+- 每次写入的增量操作追加到 <文件名>.journal，其他进程发现文件变化时
+  优先回放变更日志，而不是重新解析整个 YAML 文件。
+"""
+import copy
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+import yaml
+from yaml.loader import SafeLoader
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，仅使用进程内线程锁
+    fcntl = None
+
+# 变更日志超过该条数后清空重写，避免无限增长
+MAX_JOURNAL_ENTRIES = 200
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def file_signature(path: str):
+    """获取文件签名 (inode, mtime_ns, size)，文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _thread_lock_for(path: str) -> threading.Lock:
+    with _thread_locks_guard:
+        lock = _thread_locks.get(path)
+        if lock is None:
+            lock = _thread_locks[path] = threading.Lock()
+        return lock
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False):
+    """对 path 加锁：shared=True 为读锁，否则为写锁
+
+    锁文件为 <path>.lock；写锁同时持有进程内线程锁，
+    在没有 fcntl 的平台上退化为仅进程内互斥。
+    """
+    thread_lock = None if shared else _thread_lock_for(path)
+    if thread_lock is not None:
+        thread_lock.acquire()
+    lock_file = None
+    try:
+        if fcntl is not None:
+            lock_file = open(path + '.lock', 'a')
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        if lock_file is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            lock_file.close()
+        if thread_lock is not None:
+            thread_lock.release()
+
+
+def atomic_write_text(path: str, text: str):
+    """先写同目录临时文件再原子替换，避免读者读到写了一半的文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# ====== 增量操作 ======
+
+def set_op(path: list, value) -> dict:
+    """设置操作：把 path 指向的节点设置为 value，中间节点不存在时自动创建"""
+    return {"op": "set", "path": list(path), "value": value}
+
+
+def delete_op(path: list) -> dict:
+    """删除操作：删除 path 指向的节点，节点不存在时忽略"""
+    return {"op": "delete", "path": list(path)}
+
+
+def apply_ops(data: dict, ops: list) -> dict:
+    """在 data 上依次应用增量操作（原地修改），返回 data"""
+    for op in ops:
+        *parents, leaf = op["path"]
+        node = data
+        missing = False
+        for key in parents:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                if op["op"] == "delete":
+                    missing = True
+                    break
+                child = node[key] = {}
+            node = child
+        if missing:
+            continue
+        if op["op"] == "set":
+            node[leaf] = copy.deepcopy(op["value"])
+        elif op["op"] == "delete":
+            node.pop(leaf, None)
+        else:
+            raise ValueError(f"未知的配置操作: {op['op']}")
+    return data
+
+
+class CachedYamlFile:
+    """带变更检测的 YAML 文件缓存
+
+    data() 返回解析后的配置字典，调用方不应直接修改返回值；
+    version 在每次内容变化后递增，依赖方可据此判断是否需要重建索引。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.version = 0
+        self._data = {}
+        self._signature = None
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def data(self) -> dict:
+        """返回最新的配置内容，仅在文件发生变化时重新解析"""
+        with self._lock:
+            signature = file_signature(self.path)
+            if not self._loaded or signature != self._signature:
+                self._reload(signature)
+            return self._data
+
+    def invalidate(self):
+        """强制下次访问时重新解析文件"""
+        with self._lock:
+            self._loaded = False
+
+    def _reload(self, signature):
+        if signature is None:
+            data = {}
+        else:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = yaml.load(f, Loader=SafeLoader) or {}
+        self._data = data
+        self._signature = signature
+        self._loaded = True
+        self.version += 1
+
+
+class YamlConfigStore(CachedYamlFile):
+    """支持加锁原子写入和增量同步的 YAML 配置存储
+
+    YAML 文件始终是完整的配置内容：每次 update() 都在写锁内把新内容
+    原子写回 YAML 文件，然后向 <文件名>.journal 追加一行
+    {"ops": 增量操作, "base": 写入前的文件签名, "sig": 写入后的文件签名}。
+    变更日志只用于让其他进程的读者跳过重新解析：读者按签名链依次回放
+    新增的日志行，链条衔接到当前 YAML 文件签名时才采用回放结果；
+    链条断开（例如手工编辑了 YAML 文件）时直接重新解析 YAML，
+    不会把旧日志回放到改动后的文件上。
+
+    同一文件应通过 get_config_store() 获取共享实例，
+    这样本进程的写入无需重新解析即可被所有读者看到。
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.journal_path = path + '.journal'
+        # 已读取的变更日志位置（最后一个完整行的末尾）和条数
+        self._journal_offset = 0
+        self._journal_entries = 0
+
+    def data(self) -> dict:
+        with self._lock:
+            if self._loaded and file_signature(self.path) == self._signature:
+                return self._data
+            with file_lock(self.path, shared=True):
+                self._sync()
+            return self._data
+
+    def update(self, ops: list) -> dict:
+        """加写锁后应用增量操作、原子写回 YAML 文件并记录变更日志，返回更新后的配置"""
+        with self._lock, file_lock(self.path):
+            self._sync()
+            data = apply_ops(copy.deepcopy(self._data), ops)
+            atomic_write_text(self.path, yaml.safe_dump(data, default_flow_style=False, allow_unicode=True))
+            signature = file_signature(self.path)
+            self._append_journal(ops, self._signature, signature)
+            self._data = data
+            self._signature = signature
+            self._loaded = True
+            self.version += 1
+            return data
+
+    def _sync(self):
+        """持锁状态下把内存内容同步到磁盘最新状态：能衔接上变更日志时回放，否则重新解析"""
+        signature = file_signature(self.path)
+        if self._loaded and signature == self._signature:
+            return
+        if not (self._loaded and self._replay_journal(signature)):
+            self._reload(signature)
+            self._journal_offset, self._journal_entries = self._journal_tail()
+
+    def _replay_journal(self, signature) -> bool:
+        """回放上次同步之后追加的变更日志，回放结果对应当前 YAML 文件时返回 True
+
+        每行日志的 base 必须等于上一步的文件签名，最后一行的 sig 必须等于
+        YAML 文件当前的签名；日志被清空、行损坏或 YAML 被外部修改时返回 False。
+        只读取以换行结尾的完整行，写入中途崩溃留下的半行在下一次写入时截掉。
+        """
+        try:
+            with open(self.journal_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < self._journal_offset:
+                    return False
+                f.seek(self._journal_offset)
+                content = f.read()
+        except FileNotFoundError:
+            return False
+        end = content.rfind(b'\n') + 1
+        data = copy.deepcopy(self._data)
+        known = self._signature
+        entries = 0
+        for line in content[:end].splitlines():
+            try:
+                entry = json.loads(line)
+                if _as_signature(entry["base"]) != known:
+                    return False
+                apply_ops(data, entry["ops"])
+                known = _as_signature(entry["sig"])
+            except (ValueError, KeyError, TypeError):
+                return False
+            entries += 1
+        if known != signature:
+            return False
+        self._data = data
+        self._signature = signature
+        self._journal_offset += end
+        self._journal_entries += entries
+        self.version += 1
+        return True
+
+    def _journal_tail(self):
+        """返回变更日志最后一个完整行的末尾位置和完整行数"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return 0, 0
+        end = content.rfind(b'\n') + 1
+        return end, content.count(b'\n', 0, end)
+
+    def _append_journal(self, ops: list, base, signature):
+        """持写锁状态下追加一条变更日志：先截掉崩溃遗留的半行，超过条数上限时清空日志"""
+        if self._journal_entries >= MAX_JOURNAL_ENTRIES:
+            self._journal_offset = 0
+            self._journal_entries = 0
+        entry = {"ops": ops, "base": base, "sig": signature}
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+        with open(self.journal_path, 'ab') as f:
+            f.truncate(self._journal_offset)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_offset += len(line)
+        self._journal_entries += 1
+
+
+def _as_signature(value):
+    """把变更日志中 JSON 形式的文件签名还原为元组"""
+    return tuple(value) if value is not None else None
+
+
+_stores = {}
+_stores_guard = threading.Lock()
+
+
+def get_config_store(path: str) -> YamlConfigStore:
+    """获取 path 对应的进程内共享配置存储"""
+    key = os.path.abspath(path)
+    with _stores_guard:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = YamlConfigStore(key)
+        return store
@@ -0,0 +1,258 @@
+"""
+测试深度研究的 SQLite checkpointer：存取往返、中间写入、保留策略、断点续跑和研究结果复用
+"""
+import os
+import sys
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(root_dir, 'agents', 'deepresearch'))
+sys.path.append(root_dir)
+
+import asyncio
+import operator
+from typing import Annotated, TypedDict
+import pytest
+
+pytest.importorskip('langgraph')
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import StateGraph, START, END
+from checkpointer import SQLiteCheckpointSaver
+
+
+@pytest.fixture
+def saver(tmp_path):
+    return SQLiteCheckpointSaver(str(tmp_path / 'checkpoints.db'), keep_last=3)
+
+
+def thread_config(thread_id='t1', checkpoint_ns=''):
+    return {'configurable': {'thread_id': thread_id, 'checkpoint_ns': checkpoint_ns}}
+
+
+def put_checkpoint(saver, config, values: dict, new_versions: dict, versions: dict, step: int):
+    checkpoint = empty_checkpoint()
+    checkpoint['channel_values'] = values
+    checkpoint['channel_versions'] = versions
+    return saver.put(config, checkpoint, {'source': 'loop', 'step': step}, new_versions)
+
+
+def blob_count(saver):
+    return saver._connect().execute('SELECT COUNT(*) FROM blobs').fetchone()[0]
+
+
+def test_put_get_round_trip(saver):
+    v1 = saver.get_next_version(None, None)
+    first = put_checkpoint(saver, thread_config(), {'notes': ['a'], 'brief': '量子计算'}, {'notes': v1, 'brief': v1}, {'notes': v1, 'brief': v1}, 0)
+    v2 = saver.get_next_version(v1, None)
+    # brief 未变化，只写入 notes 的新版本
+    second = put_checkpoint(saver, first, {'notes': ['a', 'b'], 'brief': '量子计算'}, {'notes': v2}, {'notes': v2, 'brief': v1}, 1)
+    assert blob_count(saver) == 3
+
+    latest = saver.get_tuple(thread_config())
+    assert latest.config['configurable']['checkpoint_id'] == second['configurable']['checkpoint_id']
+    assert latest.checkpoint['channel_values'] == {'notes': ['a', 'b'], 'brief': '量子计算'}
+    assert latest.metadata['step'] == 1
+    assert latest.parent_config['configurable']['checkpoint_id'] == first['configurable']['checkpoint_id']
+
+    earlier = saver.get_tuple(first)
+    assert earlier.checkpoint['channel_values'] == {'notes': ['a'], 'brief': '量子计算'}
+    assert saver.get_tuple(thread_config('missing')) is None
+
+
+def test_list_filters_and_limits(saver):
+    config = thread_config()
+    versions = {}
+    for step in range(3):
+        version = saver.get_next_version(versions.get('x'), None)
+        versions = {'x': version}
+        config = put_checkpoint(saver, config, {'x': step}, versions, versions, step)
+
+    steps = [checkpoint.metadata['step'] for checkpoint in saver.list(thread_config())]
+    assert steps == [2, 1, 0]
+    assert [c.metadata['step'] for c in saver.list(thread_config(), limit=1)] == [2]
+    assert [c.metadata['step'] for c in saver.list(thread_config(), before=config)] == [1, 0]
+    assert [c.metadata['step'] for c in saver.list(thread_config(), filter={'step': 1})] == [1]
+
+    async def alist():
+        return [c.metadata['step'] async for c in saver.alist(thread_config(), limit=2)]
+    assert asyncio.run(alist()) == [2, 1]
+
+
+def test_put_writes(saver):
+    v1 = saver.get_next_version(None, None)
+    config = put_checkpoint(saver, thread_config(), {'x': 1}, {'x': v1}, {'x': v1}, 0)
+    saver.put_writes(config, [('notes', 'a'), ('notes', 'b')], task_id='task-1')
+    # 普通写入重复提交时保留第一次的结果
+    saver.put_writes(config, [('notes', 'changed'), ('notes', 'b')], task_id='task-1')
+    # 错误等特殊通道的写入会覆盖之前的记录
+    saver.put_writes(config, [('__error__', 'first')], task_id='task-2')
+    saver.put_writes(config, [('__error__', 'second')], task_id='task-2')
+
+    pending = saver.get_tuple(config).pending_writes
+    assert ('task-1', 'notes', 'a') in pending
+    assert ('task-1', 'notes', 'b') in pending
+    assert ('task-2', '__error__', 'second') in pending
+    assert len(pending) == 3
+
+
+def test_prune_keeps_newest_checkpoints_and_referenced_blobs(saver):
+    config = thread_config()
+    v1 = saver.get_next_version(None, None)
+    config = put_checkpoint(saver, config, {'brief': 'b', 'x': 0}, {'brief': v1, 'x': v1}, {'brief': v1, 'x': v1}, 0)
+    version = v1
+    for step in range(1, 6):
+        version = saver.get_next_version(version, None)
+        config = put_checkpoint(saver, config, {'brief': 'b', 'x': step}, {'x': version}, {'brief': v1, 'x': version}, step)
+    # 另一个命名空间（例如子图）单独计数
+    put_checkpoint(saver, thread_config(checkpoint_ns='sub:1'), {'y': 1}, {'y': v1}, {'y': v1}, 0)
+
+    assert [c.metadata['step'] for c in saver.list(thread_config(checkpoint_ns=''))] == [5, 4, 3]
+    assert len(list(saver.list(thread_config(checkpoint_ns='sub:1')))) == 1
+    # brief 仍被保留的检查点引用；x 只保留最近 3 个版本
+    assert blob_count(saver) == 1 + 3 + 1
+    assert saver.get_tuple(thread_config()).checkpoint['channel_values'] == {'brief': 'b', 'x': 5}
+
+
+def test_delete_expired_and_delete_thread(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / 'checkpoints.db'), max_age=None)
+    v1 = saver.get_next_version(None, None)
+    for thread_id in ('old', 'new'):
+        put_checkpoint(saver, thread_config(thread_id), {'x': 1}, {'x': v1}, {'x': v1}, 0)
+        saver.put_researcher_result(thread_id, 'call-1', {'compressed_research': 'r'})
+    saver._connect().execute("UPDATE checkpoints SET created_at = 0 WHERE thread_id = 'old'")
+    saver._connect().commit()
+
+    saver.max_age = 3600
+    assert saver.delete_expired() == 1
+    assert saver.get_tuple(thread_config('old')) is None
+    assert saver.get_researcher_result('old', 'call-1') is None
+    assert saver.get_tuple(thread_config('new')) is not None
+
+    saver.delete_thread('new')
+    assert saver.get_tuple(thread_config('new')) is None
+    assert blob_count(saver) == 0
+
+
+def test_researcher_results(saver):
+    assert saver.get_researcher_result('t1', 'call-1') is None
+    result = {'compressed_research': '发现', 'raw_notes': ['原始笔记']}
+    asyncio.run(saver.aput_researcher_result('t1', 'call-1', result))
+    assert asyncio.run(saver.aget_researcher_result('t1', 'call-1')) == result
+    assert saver.get_researcher_result('t2', 'call-1') is None
+
+
+class SubState(TypedDict):
+    log: Annotated[list, operator.add]
+    n: int
+
+
+class ParentState(TypedDict):
+    log: Annotated[list, operator.add]
+    n: int
+    done: str
+
+
+def build_graph(saver, calls: dict, fail_at: int | None):
+    async def step(state: SubState):
+        calls['step'] += 1
+        if fail_at is not None and state['n'] == fail_at:
+            raise RuntimeError('crash')
+        return {'log': [state['n']], 'n': state['n'] + 1}
+
+    sub_builder = StateGraph(SubState)
+    sub_builder.add_node('step', step)
+    sub_builder.add_edge(START, 'step')
+    sub_builder.add_conditional_edges('step', lambda state: END if state['n'] >= 5 else 'step')
+    # 与 supervisor_agent 一样不带自己的 checkpointer，使用父图的命名空间
+    subgraph = sub_builder.compile()
+
+    async def prepare(state: ParentState):
+        calls['prepare'] += 1
+        return {'n': 0}
+
+    async def finish(state: ParentState):
+        return {'done': f"n={state['n']}"}
+
+    builder = StateGraph(ParentState)
+    builder.add_node('prepare', prepare)
+    builder.add_node('sub', subgraph)
+    builder.add_node('finish', finish)
+    builder.add_edge(START, 'prepare')
+    builder.add_edge('prepare', 'sub')
+    builder.add_edge('sub', 'finish')
+    builder.add_edge('finish', END)
+    return builder.compile(checkpointer=saver)
+
+
+def test_resume_from_latest_checkpoint(tmp_path):
+    db_path = str(tmp_path / 'checkpoints.db')
+    config = {'configurable': {'thread_id': 'run-1'}}
+    calls = {'prepare': 0, 'step': 0}
+
+    graph = build_graph(SQLiteCheckpointSaver(db_path), calls, fail_at=3)
+    with pytest.raises(RuntimeError):
+        asyncio.run(graph.ainvoke({'log': []}, config))
+    assert graph.get_state(config).next == ('sub',)
+
+    # 模拟进程重启：新的 saver 实例读取同一个数据库，从子图内最新的检查点继续
+    resumed = build_graph(SQLiteCheckpointSaver(db_path), calls, fail_at=None)
+    result = asyncio.run(resumed.ainvoke(None, config))
+    assert result['done'] == 'n=5'
+    assert result['log'] == [0, 1, 2, 3, 4]
+    assert calls == {'prepare': 1, 'step': 4 + 2}
+
+
+@pytest.fixture
+def subgraph_module(saver, monkeypatch):
+    # 模型和搜索客户端只在导入时创建，不会真正发起请求
+    for name, value in (('sf_api_key', 'test'), ('sf_api_url', 'http://localhost'),
+                        ('zp_api_key', 'test'), ('zp_api_url', 'http://localhost'),
+                        ('tavily_api_key', 'test')):
+        if not os.getenv(name):
+            monkeypatch.setenv(name, value)
+    try:
+        import subgraph
+    except ImportError as e:
+        pytest.skip(f'深度研究依赖未安装: {e}')
+    monkeypatch.setattr(subgraph, 'research_checkpointer', saver)
+    return subgraph
+
+
+def test_supervisor_tools_reuses_stored_researcher_results(subgraph_module, saver, monkeypatch):
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    invoked = []
+
+    class FakeResearcher:
+        async def ainvoke(self, state):
+            invoked.append(state['research_topic'])
+            return {'compressed_research': f"findings for {state['research_topic']}", 'raw_notes': ['raw']}
+
+    monkeypatch.setattr(subgraph_module, 'researcher_agent', FakeResearcher())
+    state = {
+        'supervisor_messages': [
+            HumanMessage(content='brief'),
+            AIMessage(content='', tool_calls=[
+                {'name': 'ConductResearch', 'args': {'research_topic': 'topic A'}, 'id': 'call-a'},
+                {'name': 'ConductResearch', 'args': {'research_topic': 'topic B'}, 'id': 'call-b'},
+            ]),
+        ],
+        'research_brief': 'brief',
+        'research_iterations': 0,
+    }
+    config = {'configurable': {'thread_id': 'run-1'}}
+    # 第一次运行前 topic A 的结果已保存（例如崩溃前已完成）
+    saver.put_researcher_result('run-1', 'call-a', {'compressed_research': 'stored findings', 'raw_notes': ['stored']})
+
+    command = asyncio.run(subgraph_module.supervisor_tools(state, config))
+    assert invoked == ['topic B']
+    contents = [message.content for message in command.update['supervisor_messages']]
+    assert contents == ['stored findings', 'findings for topic B']
+    assert [note['tool_call_id'] for note in command.update['research_notes']] == ['call-a', 'call-b']
+    assert saver.get_researcher_result('run-1', 'call-b')['compressed_research'] == 'findings for topic B'
+
+    # 续跑时重新执行该节点，两个研究都直接复用
+    asyncio.run(subgraph_module.supervisor_tools(state, config))
+    assert invoked == ['topic B']
+
+    # 其他运行不会复用
+    asyncio.run(subgraph_module.supervisor_tools(state, {'configurable': {'thread_id': 'run-2'}}))
+    assert invoked == ['topic B', 'topic A', 'topic B']
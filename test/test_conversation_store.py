@@ -0,0 +1,135 @@
+"""
+测试对话存储的按序号分页、上下文读写，以及页面对话历史的分页加载
+"""
+import os
+import sys
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+sys.path.append(os.path.join(root_dir, 'chatxweb'))
+
+import threading
+import pytest
+from storage import ConversationStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ConversationStore(str(tmp_path / 'chatx.db'))
+
+
+def fill(store, conversation_id, count):
+    for i in range(count):
+        store.append_message(conversation_id, 'user' if i % 2 == 0 else 'assistant', f'消息{i}')
+
+
+def test_append_returns_consecutive_seq(store):
+    conversation = store.get_active_conversation('monkey', 'Chat2Model')
+    assert [store.append_message(conversation['id'], 'user', str(i)) for i in range(3)] == [0, 1, 2]
+    # 第一条用户消息作为会话标题
+    assert store.get_active_conversation('monkey', 'Chat2Model')['title'] == '0'
+    assert store.get_active_conversation('monkey', 'Chat2Model')['message_count'] == 3
+
+
+def test_load_messages_pages_backwards_by_seq(store):
+    conversation_id = store.get_active_conversation('monkey', 'Chat2Model')['id']
+    fill(store, conversation_id, 45)
+
+    latest = store.load_messages(conversation_id, limit=20)
+    assert [m['seq'] for m in latest] == list(range(25, 45))
+    assert latest[-1]['content'] == '消息44'
+
+    older = store.load_messages(conversation_id, before_seq=latest[0]['seq'], limit=20)
+    assert [m['seq'] for m in older] == list(range(5, 25))
+
+    oldest = store.load_messages(conversation_id, before_seq=older[0]['seq'], limit=20)
+    assert [m['seq'] for m in oldest] == list(range(0, 5))
+    assert oldest[0] == {'role': 'user', 'content': '消息0', 'seq': 0}
+
+    assert store.load_messages(conversation_id, before_seq=0) == []
+
+
+def test_concurrent_appends_get_unique_seq(store):
+    conversation_id = store.get_active_conversation('monkey', 'Chat2Model')['id']
+    threads = [threading.Thread(target=fill, args=(store, conversation_id, 10)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    messages = store.load_messages(conversation_id, limit=100)
+    assert [m['seq'] for m in messages] == list(range(40))
+
+
+def test_new_conversation_archives_current(store):
+    first = store.get_active_conversation('monkey', 'Chat2Model')
+    fill(store, first['id'], 3)
+    second = store.new_conversation('monkey', 'Chat2Model')
+
+    assert store.get_active_conversation('monkey', 'Chat2Model')['id'] == second['id']
+    assert store.load_messages(second['id']) == []
+    # 归档的会话历史仍保留
+    assert len(store.load_messages(first['id'])) == 3
+    archived = {c['id']: c['archived'] for c in store.list_conversations('monkey', 'Chat2Model')}
+    assert archived == {first['id']: 1, second['id']: 0}
+    # 其他用户和页面互不影响
+    assert store.get_active_conversation('yuyang', 'Chat2Model')['id'] not in archived
+    assert store.get_active_conversation('monkey', 'Chat2Agent')['id'] not in archived
+
+
+def test_context_round_trip(store):
+    conversation_id = store.get_active_conversation('monkey', 'Chat2Model')['id']
+    assert store.load_context(conversation_id) == {}
+
+    context = {'summary': '早期对话摘要', 'summarized_until': 12}
+    store.save_context(conversation_id, context)
+    assert store.load_context(conversation_id) == context
+
+    # 新的存储实例（例如重启后）读到相同的上下文
+    reopened = ConversationStore(store.db_path)
+    assert reopened.load_context(conversation_id) == context
+    assert store.load_context('missing') == {}
+
+
+@pytest.fixture
+def history(store, monkeypatch):
+    st = pytest.importorskip('streamlit')
+    import chat_history
+    monkeypatch.setattr(chat_history, 'conversation_store', store)
+    monkeypatch.setattr(st, 'session_state', {})
+    return chat_history
+
+
+def test_history_loads_latest_page_then_older(history, store):
+    conversation_id = store.get_active_conversation('monkey', 'Chat2Model')['id']
+    fill(store, conversation_id, 50)
+    session = history.st.session_state
+
+    history.init_history('messages', 'monkey', 'Chat2Model')
+    assert [m['seq'] for m in session['messages']] == list(range(30, 50))
+    assert session['messages_offset'] == 30
+
+    history.load_more('messages')
+    assert [m['seq'] for m in session['messages']] == list(range(10, 50))
+    assert session['messages_offset'] == 10
+
+    history.load_more('messages')
+    assert session['messages_offset'] == 0
+    assert len(session['messages']) == 50
+
+
+def test_history_append_trims_memory_and_keeps_context(history, store, monkeypatch):
+    monkeypatch.setattr(history, 'MAX_IN_MEMORY_MESSAGES', 5)
+    history.init_history('messages', 'monkey', 'Chat2Model')
+    session = history.st.session_state
+    for i in range(8):
+        history.append_message('messages', 'user', f'消息{i}')
+
+    assert [m['seq'] for m in session['messages']] == [3, 4, 5, 6, 7]
+    assert session['messages_offset'] == 3
+    assert len(store.load_messages(session['messages_conversation'])) == 8
+
+    history.save_context('messages', {'summary': '摘要'})
+    assert history.load_context('messages') == {'summary': '摘要'}
+
+    history.reset_history('messages', 'monkey')
+    assert session['messages'] == []
+    assert history.load_context('messages') == {}
@@ -0,0 +1,124 @@
+"""
+测试最终报告的研究发现打包：BM25 相关性排序、token 预算和引用重新编号
+"""
+import os
+import sys
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(root_dir, 'agents', 'deepresearch'))
+sys.path.append(root_dir)
+
+import re
+import pytest
+
+try:
+    import findings
+    from findings import pack_findings, split_note, tokenize
+    from models import estimate_tokens
+except ImportError as e:
+    pytest.skip(f'models 依赖未安装: {e}', allow_module_level=True)
+
+FILLER = [
+    'Regional weather patterns shifted during the spring season with heavy rainfall recorded.',
+    'Local football clubs announced new training schedules for the youth academy programme.',
+    'Museum attendance rose after the renovation of the east wing and the sculpture garden.',
+    'Railway maintenance closed several stations on weekends throughout the autumn months.',
+    'Farmers reported a strong harvest of apples and pears across the northern valleys.',
+    'The city council debated parking fees for the downtown shopping district again.',
+]
+
+
+@pytest.fixture(autouse=True)
+def small_passages(monkeypatch):
+    # 每行约 20 个 token，按行切分成段落
+    monkeypatch.setattr(findings, 'PASSAGE_TOKENS', 30)
+
+
+def make_note(paragraphs: list[str], sources: dict) -> str:
+    lines = ['## 研究发现', *paragraphs, '', '### 来源']
+    lines += [f'[{number}] {line}' for number, line in sources.items()]
+    return '\n'.join(lines)
+
+
+def cited_sources(packed: str) -> dict:
+    """返回 {正文中的引用编号: 来源行}，并检查每个引用都出现在来源列表中"""
+    body, sources = split_note(packed)
+    cited = {int(n) for group in re.findall(r'\[(\d+(?:\s*,\s*\d+)*)\]', body) for n in group.split(',')}
+    assert cited <= set(sources)
+    return sources
+
+
+def test_empty_findings():
+    assert pack_findings([], 'quantum computing', max_tokens=100) == ''
+    assert pack_findings([], 'quantum computing', max_tokens=0) == ''
+
+
+def test_notes_within_budget_are_unchanged():
+    notes = [make_note(['Quantum error correction improved [1].'], {1: 'Lab news：https://a.example/qec'})]
+    assert pack_findings(notes, 'quantum', max_tokens=10000) == notes[0]
+
+
+def test_relevant_passages_ranked_first_within_budget():
+    relevant = 'Quantum computing hardware reached a new qubit fidelity record with superconducting qubits [1].'
+    paragraphs = FILLER * 3 + [relevant] + FILLER * 3
+    note = make_note(paragraphs, {1: 'Qubit report：https://a.example/qubits'})
+    budget = 60
+    packed = pack_findings([note], 'quantum computing qubit fidelity', max_tokens=budget)
+
+    assert 'qubit fidelity record' in packed
+    assert estimate_tokens(packed) <= budget
+    assert cited_sources(packed) == {1: 'Qubit report：https://a.example/qubits'}
+
+
+@pytest.mark.parametrize('budget', [40, 80, 150, 300])
+def test_budget_is_respected(budget):
+    notes = [
+        make_note([f'{line} Quantum note {i} [1].' for line in FILLER] * 2, {1: f'Source {i}：https://s{i}.example/page'})
+        for i in range(4)
+    ]
+    packed = pack_findings(notes, 'quantum note', max_tokens=budget)
+    assert packed
+    assert estimate_tokens(packed) <= budget
+
+
+def test_citations_are_renumbered_to_the_right_sources():
+    first = make_note(
+        ['量子纠错取得突破，逻辑比特错误率下降 [1]。', '超导量子芯片扩展到一千比特 [2]。', *FILLER * 2],
+        {1: '纠错论文：https://arxiv.example/qec', 2: '芯片新闻：https://news.example/chip?utm_source=x'},
+    )
+    second = make_note(
+        ['离子阱量子计算机实现长相干时间 [1]。', '超导量子芯片的良率同步提升 [2]。', *FILLER * 2],
+        {1: '离子阱报告：https://ions.example/report', 2: '芯片新闻：https://news.example/chip'},
+    )
+    packed = pack_findings([first, second], '量子 纠错 超导 芯片 离子阱', max_tokens=220)
+    sources = cited_sources(packed)
+
+    def source_of(sentence: str) -> list[str]:
+        line = next(line for line in packed.splitlines() if sentence in line)
+        numbers = re.search(r'\[(\d+(?:,\s*\d+)*)\]', line).group(1)
+        return [sources[int(n)] for n in numbers.split(',')]
+
+    assert source_of('量子纠错取得突破') == ['纠错论文：https://arxiv.example/qec']
+    assert source_of('离子阱量子计算机') == ['离子阱报告：https://ions.example/report']
+    # 两篇笔记引用同一个 URL（仅追踪参数不同），合并为同一个编号
+    assert source_of('一千比特') == source_of('良率同步提升')
+    assert len(sources) == 3
+    # 编号从 1 开始连续
+    assert sorted(sources) == [1, 2, 3]
+
+
+def test_citation_without_source_entry_is_dropped():
+    note = make_note(['Quantum advantage claims were disputed [1][7].', *FILLER * 4], {1: 'Review：https://r.example/'})
+    packed = pack_findings([note], 'quantum advantage', max_tokens=60)
+    assert '[7]' not in packed
+    assert cited_sources(packed) == {1: 'Review：https://r.example/'}
+
+
+def test_near_duplicate_passages_are_dropped():
+    passage = 'Quantum annealing systems solved the logistics benchmark faster than classical solvers this year.'
+    notes = [make_note([passage, *FILLER * 2], {}), make_note([passage, *FILLER * 2], {})]
+    packed = pack_findings(notes, 'quantum annealing logistics benchmark', max_tokens=120)
+    assert packed.count('Quantum annealing systems') == 1
+
+
+def test_tokenize_mixes_cjk_bigrams_and_latin_words():
+    assert tokenize('量子计算 GPU-based') == ['量', '子', '计', '算', '量子', '子计', '计算', 'gpu-based']
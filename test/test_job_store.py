@@ -0,0 +1,68 @@
+"""
+测试后台任务存储：按状态重新排队、遗留任务标记为中断和结果只交付一次
+"""
+import os
+import sys
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+import threading
+import pytest
+from storage import JobStore
+from storage.job_store import JOB_CANCELLED, JOB_FAILED, JOB_INTERRUPTED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'jobs.db'))
+
+
+@pytest.mark.parametrize('status', [JOB_FAILED, JOB_CANCELLED, JOB_INTERRUPTED])
+def test_requeue_resumable_job(store, status):
+    job = store.create_job('deep_research', 'monkey', '量子计算')
+    store.update_job(job['id'], status=status, result='部分报告', error='boom', finished_at=1.0, delivered=1)
+
+    assert store.requeue_job(job['id'])
+    job = store.get_job(job['id'])
+    assert (job['status'], job['result'], job['error'], job['finished_at'], job['delivered']) == (JOB_QUEUED, '', '', None, 0)
+    # 已经重新排队，重复请求不再生效
+    assert not store.requeue_job(job['id'])
+
+
+@pytest.mark.parametrize('status', [JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED])
+def test_requeue_refuses_active_or_succeeded_job(store, status):
+    job = store.create_job('deep_research', 'monkey', '量子计算')
+    store.update_job(job['id'], status=status, result='报告')
+    assert not store.requeue_job(job['id'])
+    assert store.get_job(job['id'])['status'] == status
+    assert store.get_job(job['id'])['result'] == '报告'
+    assert not store.requeue_job('missing')
+
+
+def test_concurrent_requeue_succeeds_once(store):
+    job = store.create_job('deep_research', 'monkey', '量子计算')
+    store.update_job(job['id'], status=JOB_INTERRUPTED)
+    results = []
+
+    def worker():
+        results.append(store.requeue_job(job['id']))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+
+
+def test_interrupt_active_jobs_and_deliver_once(store):
+    queued = store.create_job('deep_research', 'monkey', 'a')
+    running = store.create_job('deep_research', 'monkey', 'b')
+    done = store.create_job('deep_research', 'monkey', 'c')
+    store.update_job(running['id'], status=JOB_RUNNING)
+    store.update_job(done['id'], status=JOB_SUCCEEDED)
+
+    assert store.interrupt_active_jobs() == 2
+    assert [store.get_job(job['id'])['status'] for job in (queued, running, done)] == [JOB_INTERRUPTED, JOB_INTERRUPTED, JOB_SUCCEEDED]
+    assert store.mark_delivered(done['id'])
+    assert not store.mark_delivered(done['id'])
@@ -0,0 +1,142 @@
+"""
+测试持久化键值缓存：过期时间、LRU 淘汰顺序和多线程并发访问
+"""
+import os
+import sys
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+import threading
+import pytest
+from storage import KVCache
+from storage import kv_cache
+
+
+class FakeClock:
+    """可手动拨动的时钟，保证访问时间的先后顺序确定"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(kv_cache, 'time', clock)
+    return clock
+
+
+def test_set_get_delete(tmp_path):
+    cache = KVCache(str(tmp_path / 'cache.db'))
+    assert cache.get('a') is None
+    cache.set('a', '网页摘要')
+    assert cache.get('a') == '网页摘要'
+    cache.set('a', 'updated')
+    assert cache.get('a') == 'updated'
+    cache.delete('a')
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 2, 0)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_ttl_expiry(tmp_path, clock):
+    cache = KVCache(str(tmp_path / 'cache.db'), ttl=60)
+    cache.set('old', 'x')
+    clock.advance(30)
+    cache.set('new', 'y')
+    clock.advance(20)
+    assert cache.get('old') == 'x'
+
+    # 读取不会延长有效期：有效期从写入时间算起
+    clock.advance(20)
+    assert cache.get('old') is None
+    assert cache.get('new') == 'y'
+
+    # 下一次写入时清理已过期的条目
+    cache.set('other', 'z')
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_eviction_by_entries(tmp_path, clock):
+    cache = KVCache(str(tmp_path / 'cache.db'), max_entries=3)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, key)
+        clock.advance(1)
+    # 访问 a 后，最久未访问的是 b
+    assert cache.get('a') == 'a'
+    clock.advance(1)
+
+    cache.set('d', 'd')
+    assert cache.get('b') is None
+    clock.advance(1)
+
+    # 访问顺序：a 最早，其次是 d，c 刚被访问
+    cache.get('c')
+    clock.advance(1)
+    cache.set('e', 'e')
+    assert cache.get('a') is None
+    assert [cache.get(key) for key in ('c', 'd', 'e')] == ['c', 'd', 'e']
+    assert cache.stats()['evictions'] == 2
+
+
+def test_lru_eviction_by_bytes(tmp_path, clock):
+    cache = KVCache(str(tmp_path / 'cache.db'), max_bytes=10)
+    cache.set('a', '1234')
+    clock.advance(1)
+    cache.set('b', '1234')
+    clock.advance(1)
+    cache.get('a')
+    clock.advance(1)
+
+    cache.set('c', '1234')
+    assert cache.get('b') is None
+    assert cache.get('a') == '1234'
+    assert cache.stats()['bytes'] == 8
+
+    # 多字节字符按 UTF-8 编码后的字节数计算
+    cache.set('d', '摘要摘')
+    stats = cache.stats()
+    assert stats['bytes'] <= 10
+    assert cache.get('d') == '摘要摘'
+
+
+def test_entries_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    KVCache(path).set('a', 'x')
+    assert KVCache(path).get('a') == 'x'
+
+
+def test_concurrent_thread_access(tmp_path):
+    cache = KVCache(str(tmp_path / 'cache.db'), max_entries=50)
+    errors = []
+
+    def worker(worker_id):
+        try:
+            for i in range(40):
+                key = f'{worker_id}-{i}'
+                cache.set(key, key * 3)
+                value = cache.get(key)
+                # 其他线程的写入可能已经把该条目淘汰
+                assert value is None or value == key * 3
+                cache.get(f'{(worker_id + 1) % 8}-{i}')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    stats = cache.stats()
+    assert stats['entries'] <= 50
+    assert stats['hits'] + stats['misses'] == 8 * 40 * 2
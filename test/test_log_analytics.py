@@ -0,0 +1,99 @@
+"""
+测试管理员看板的增量日志统计：增量读取、写了一半的最后一行、日志轮转和截断
+"""
+import os
+import sys
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+sys.path.append(os.path.join(root_dir, 'chatxweb'))
+
+import json
+from log_analytics import update_stats
+
+LOGIN = "2026-01-23 00:33:34,401 - ChatX-auth - INFO - 用户：monkey |登录成功: 用户 monkey (大圣 sun) 已成功登录系统\n"
+CHAT2MODEL = "2026-01-23 00:40:55,070 - ChatX-Chat2Model - INFO - 用户：monkey | 访问Chat2Model: 用户 monkey (大圣 sun)进入Chat2Model页面\n"
+MESSAGE = "2026-01-23 00:41:22,607 - ChatX-Chat2Model - INFO - 用户：monkey |用户 monkey 输入问题: 你好\n"
+MODEL = "2026-01-23 00:41:23,125 - ChatX-Chat2Model - INFO - 用户：monkey |调用模型 Qwen3 处理用户请求\n"
+NEXT_DAY_LOGIN = "2026-01-24 09:00:00,000 - ChatX-auth - INFO - 用户：monkey |登录成功: 用户 monkey (大圣 sun) 已成功登录系统\n"
+
+
+def write_log(path, text, mode='a'):
+    with open(path, mode, encoding='utf-8') as f:
+        f.write(text)
+
+
+def test_incremental_update(tmp_path):
+    log_path, stats_path = str(tmp_path / 'chatx.log'), str(tmp_path / 'stats.json')
+    write_log(log_path, LOGIN + CHAT2MODEL)
+    stats = update_stats(log_path, stats_path)
+    assert stats['user_stats']['monkey']['login_count'] == 1
+    assert stats['function_stats']['Chat2Model']['visits'] == 1
+    assert stats['offset'] == os.path.getsize(log_path)
+
+    write_log(log_path, MESSAGE + MODEL)
+    stats = update_stats(log_path, stats_path)
+    assert stats['user_stats']['monkey']['messages'] == 1
+    assert stats['function_stats']['Chat2Model']['models'] == {'Qwen3': 1}
+    assert stats['daily_user_activities'] == {'2026-01-23': {'monkey': 4}}
+    # 没有新增日志时不重复统计
+    assert update_stats(log_path, stats_path) == stats
+    # 统计结果持久化在磁盘上
+    with open(stats_path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == stats
+
+
+def test_partial_last_line_is_deferred(tmp_path):
+    log_path, stats_path = str(tmp_path / 'chatx.log'), str(tmp_path / 'stats.json')
+    write_log(log_path, LOGIN + MESSAGE[:30])
+    stats = update_stats(log_path, stats_path)
+    assert stats['offset'] == len(LOGIN.encode('utf-8'))
+    assert stats['user_stats']['monkey']['messages'] == 0
+
+    # 半行写完后只统计一次
+    write_log(log_path, MESSAGE[30:])
+    stats = update_stats(log_path, stats_path)
+    assert stats['user_stats']['monkey']['messages'] == 1
+    assert stats['offset'] == os.path.getsize(log_path)
+
+
+def test_only_partial_line_keeps_offset(tmp_path):
+    log_path, stats_path = str(tmp_path / 'chatx.log'), str(tmp_path / 'stats.json')
+    write_log(log_path, LOGIN[:20])
+    stats = update_stats(log_path, stats_path)
+    assert stats['offset'] == 0
+    assert stats['user_stats'] == {}
+
+
+def test_rotated_log_is_read_from_start(tmp_path):
+    log_path, stats_path = str(tmp_path / 'chatx.log'), str(tmp_path / 'stats.json')
+    write_log(log_path, LOGIN + CHAT2MODEL + MESSAGE)
+    update_stats(log_path, stats_path)
+
+    # 轮转：旧文件改名，新文件的 inode 不同，即使新文件更大也从开头读取
+    os.rename(log_path, log_path + '.1')
+    write_log(log_path, NEXT_DAY_LOGIN * 5, mode='w')
+    stats = update_stats(log_path, stats_path)
+    assert stats['inode'] == os.stat(log_path).st_ino
+    assert stats['user_stats']['monkey']['login_count'] == 6
+    # 已有的计数保留
+    assert stats['user_stats']['monkey']['messages'] == 1
+    assert stats['daily_user_activities']['2026-01-24'] == {'monkey': 5}
+
+
+def test_truncated_log_is_read_from_start(tmp_path):
+    log_path, stats_path = str(tmp_path / 'chatx.log'), str(tmp_path / 'stats.json')
+    write_log(log_path, LOGIN + CHAT2MODEL + MESSAGE)
+    update_stats(log_path, stats_path)
+
+    # 原地截断（inode 不变，文件变小）
+    write_log(log_path, NEXT_DAY_LOGIN, mode='w')
+    stats = update_stats(log_path, stats_path)
+    assert stats['offset'] == len(NEXT_DAY_LOGIN.encode('utf-8'))
+    assert stats['user_stats']['monkey']['login_count'] == 2
+    assert stats['function_stats']['Chat2Model']['visits'] == 1
+
+
+def test_missing_log_returns_saved_stats(tmp_path):
+    stats = update_stats(str(tmp_path / 'missing.log'), str(tmp_path / 'stats.json'))
+    assert stats['offset'] == 0
+    assert stats['user_stats'] == {}
@@ -0,0 +1,192 @@
+"""
+测试 YamlConfigStore 的原子写入、变更日志回放、手工编辑和崩溃恢复
+"""
+import os
+import sys
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+import multiprocessing
+import threading
+import yaml
+from storage import yaml_store
+from storage.yaml_store import YamlConfigStore, set_op, delete_op
+
+
+def write_config(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(data, f, allow_unicode=True)
+
+
+def read_config(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+def journal_lines(store):
+    with open(store.journal_path, 'rb') as f:
+        return f.read().splitlines()
+
+
+def _process_writer(path, worker, count):
+    store = YamlConfigStore(path)
+    for i in range(count):
+        store.update([set_op(['models', f'p{worker}-{i}'], i)])
+
+
+def test_update_rewrites_yaml(tmp_path):
+    path = str(tmp_path / 'config.yaml')
+    write_config(path, {'models': {'a': 1}})
+    store = YamlConfigStore(path)
+
+    store.update([set_op(['models', 'b'], 2)])
+    assert read_config(path) == {'models': {'a': 1, 'b': 2}}
+    store.update([delete_op(['models', 'a'])])
+    assert read_config(path) == {'models': {'b': 2}}
+    assert len(journal_lines(store)) == 2
+    assert store.data() == {'models': {'b': 2}}
+    assert YamlConfigStore(path).data() == {'models': {'b': 2}}
+
+
+def test_reader_replays_journal_without_reparsing(tmp_path, monkeypatch):
+    path = str(tmp_path / 'config.yaml')
+    write_config(path, {'models': {}})
+    reader = YamlConfigStore(path)
+    writer = YamlConfigStore(path)
+    assert reader.data() == {'models': {}}
+    version = reader.version
+
+    def fail_reload(signature):
+        raise AssertionError('不应重新解析 YAML 文件')
+    monkeypatch.setattr(reader, '_reload', fail_reload)
+
+    writer.update([set_op(['models', 'a'], 1)])
+    assert reader.data() == {'models': {'a': 1}}
+    assert reader.version == version + 1
+
+    writer.update([set_op(['models', 'b'], 2)])
+    writer.update([delete_op(['models', 'a'])])
+    assert reader.data() == {'models': {'b': 2}}
+    assert reader.version == version + 2
+
+
+def test_manual_edit_is_not_undone_by_journal(tmp_path):
+    path = str(tmp_path / 'config.yaml')
+    write_config(path, {'usernames': {}})
+    store = YamlConfigStore(path)
+    reader = YamlConfigStore(path)
+    store.update([set_op(['usernames', 'alice'], {'name': 'Alice'})])
+    store.update([set_op(['usernames', 'bob'], {'name': 'Bob'})])
+    assert reader.data()['usernames'].keys() == {'alice', 'bob'}
+
+    # 管理员手工编辑 YAML 删除 bob，之后再通过页面添加 carol
+    config = read_config(path)
+    del config['usernames']['bob']
+    write_config(path, config)
+    store.update([set_op(['usernames', 'carol'], {'name': 'Carol'})])
+
+    expected = {'alice', 'carol'}
+    assert read_config(path)['usernames'].keys() == expected
+    assert store.data()['usernames'].keys() == expected
+    # 读者的签名链在手工编辑处断开，重新解析 YAML 而不是回放旧日志
+    assert reader.data()['usernames'].keys() == expected
+    assert YamlConfigStore(path).data()['usernames'].keys() == expected
+
+
+def test_manual_edit_without_later_update(tmp_path):
+    path = str(tmp_path / 'config.yaml')
+    write_config(path, {'models': {}})
+    store = YamlConfigStore(path)
+    store.update([set_op(['models', 'a'], 1)])
+    write_config(path, {'models': {'manual': 1}})
+    assert store.data() == {'models': {'manual': 1}}
+    assert YamlConfigStore(path).data() == {'models': {'manual': 1}}
+
+
+def test_crash_leaves_partial_journal_line(tmp_path):
+    path = str(tmp_path / 'config.yaml')
+    write_config(path, {'models': {}})
+    YamlConfigStore(path).update([set_op(['models', 'a'], 1)])
+    reader = YamlConfigStore(path)
+    reader.data()
+    # 模拟 YAML 已写回、日志只写了半行时崩溃
+    write_config(path, {'models': {'a': 1, 'b': 2}})
+    with open(path + '.journal', 'ab') as f:
+        f.write(b'{"ops": [{"op": "set", "path": ["models", "b"]')
+
+    assert reader.data() == {'models': {'a': 1, 'b': 2}}
+    store = YamlConfigStore(path)
+    assert store.data() == {'models': {'a': 1, 'b': 2}}
+
+    # 下一次写入截掉半行，日志保持逐行完整
+    store.update([set_op(['models', 'c'], 3)])
+    assert len(journal_lines(store)) == 2
+    assert reader.data() == {'models': {'a': 1, 'b': 2, 'c': 3}}
+    assert YamlConfigStore(path).data() == {'models': {'a': 1, 'b': 2, 'c': 3}}
+
+
+def test_corrupt_journal_falls_back_to_yaml(tmp_path):
+    path = str(tmp_path / 'config.yaml')
+    write_config(path, {'models': {}})
+    reader = YamlConfigStore(path)
+    reader.data()
+    YamlConfigStore(path).update([set_op(['models', 'a'], 1)])
+    with open(path + '.journal', 'wb') as f:
+        f.write(b'not json\n')
+    assert reader.data() == {'models': {'a': 1}}
+
+
+def test_journal_is_cleared_after_max_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(yaml_store, 'MAX_JOURNAL_ENTRIES', 3)
+    path = str(tmp_path / 'config.yaml')
+    write_config(path, {'models': {}})
+    store = YamlConfigStore(path)
+    reader = YamlConfigStore(path)
+    reader.data()
+
+    for i in range(3):
+        store.update([set_op(['models', f'm{i}'], i)])
+    assert len(journal_lines(store)) == 3
+    store.update([set_op(['models', 'm3'], 3)])
+    assert len(journal_lines(store)) == 1
+
+    expected = {'models': {f'm{i}': i for i in range(4)}}
+    assert read_config(path) == expected
+    assert reader.data() == expected
+    store.update([delete_op(['models', 'm0'])])
+    assert reader.data() == {'models': {f'm{i}': i for i in range(1, 4)}}
+
+
+def test_concurrent_thread_writers(tmp_path):
+    path = str(tmp_path / 'config.yaml')
+    write_config(path, {'models': {}})
+    # 每个线程使用独立实例，互斥只依赖文件锁
+    stores = [YamlConfigStore(path) for _ in range(4)]
+
+    def writer(worker):
+        for i in range(25):
+            stores[worker].update([set_op(['models', f't{worker}-{i}'], i)])
+
+    threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    models = YamlConfigStore(path).data()['models']
+    assert len(models) == 100
+    assert all(stores[0].data() == store.data() for store in stores)
+
+
+def test_concurrent_process_writers(tmp_path):
+    path = str(tmp_path / 'config.yaml')
+    write_config(path, {'models': {}})
+    processes = [multiprocessing.Process(target=_process_writer, args=(path, worker, 20)) for worker in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    models = YamlConfigStore(path).data()['models']
+    assert models == {f'p{worker}-{i}': i for worker in range(3) for i in range(20)}